@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ArrozcascaraConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'arrozcascara'
+
+    def ready(self):
+        # Registrar los receptores de señales; versiones va antes que eventos
+        # porque los eventos leen la versión ya incrementada
+        from . import signals, cacheo, versiones, eventos  # noqa: F401
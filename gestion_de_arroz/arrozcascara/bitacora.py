@@ -0,0 +1,219 @@
+"""Bitácora estructurada: eventos en JSON escritos fuera del hilo de la petición.
+
+Los módulos registran eventos con nombre y datos mediante ``evento()``. El
+manejador ``ManejadorEnCola`` solo pone el registro en una cola; un hilo
+(QueueListener) lo convierte a JSON y lo escribe, así la petición no espera
+a la salida estándar ni al disco.
+
+BitacoraMiddleware decide al comienzo de cada petición si se registran sus
+eventos, con la fracción de BITACORA_MUESTREO de la vista, y al final
+registra la petición con su duración. Las advertencias y errores se
+registran siempre.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger('arrozcascara.peticiones')
+
+# Atributos propios de LogRecord, que no se copian como datos del evento
+_ATRIBUTOS_DEL_REGISTRO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class _Peticion:
+    """Datos de la petición en curso que se agregan a cada evento"""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.vista = None
+        self.muestreada = True
+
+
+# Es un objeto mutable en una variable de contexto: process_view puede correr
+# en otro hilo bajo ASGI y solo modifica el objeto
+_peticion_actual = ContextVar('peticion_bitacora', default=None)
+
+
+def muestreo(vista):
+    """Fracción de peticiones de la vista cuyos eventos se registran"""
+    fracciones = getattr(settings, 'BITACORA_MUESTREO', {})
+    return fracciones.get(vista, fracciones.get('*', 1.0))
+
+
+def muestreada():
+    """Si los eventos informativos de la petición en curso se registran"""
+    peticion = _peticion_actual.get()
+    return peticion is None or peticion.muestreada
+
+
+def evento(log, nivel, nombre, **datos):
+    """Registra un evento con datos estructurados.
+
+    No hace nada, ni siquiera armar el registro, si el nivel está desactivado
+    o la petición no fue muestreada. Quien prepara datos costosos puede
+    comprobar antes ``activo(log, nivel)``.
+    """
+    if activo(log, nivel):
+        log.log(nivel, nombre, extra={'datos': datos}, stacklevel=2)
+
+
+def activo(log, nivel):
+    return log.isEnabledFor(nivel) and (nivel >= logging.WARNING or muestreada())
+
+
+class FiltroContexto(logging.Filter):
+    """Agrega el id y la vista de la petición y descarta lo no muestreado.
+
+    Corre en el hilo que registra el evento, antes de pasarlo a la cola.
+    """
+
+    def filter(self, record):
+        peticion = _peticion_actual.get()
+        if peticion is None:
+            return True
+        if not peticion.muestreada and record.levelno < logging.WARNING:
+            return False
+        record.request_id = peticion.request_id
+        record.vista = peticion.vista
+        return True
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por evento"""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'evento': record.getMessage(),
+        }
+        for atributo in ('request_id', 'vista'):
+            valor = getattr(record, atributo, None)
+            if valor:
+                datos[atributo] = valor
+        datos.update(getattr(record, 'datos', None) or {})
+        # Campos de extra=... de otros registros (por ejemplo los de Django)
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_DEL_REGISTRO and clave not in datos and clave not in ('datos', 'request'):
+                datos[clave] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        if record.stack_info:
+            datos['pila'] = self.formatStack(record.stack_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ManejadorEnCola(QueueHandler):
+    """Encola los registros; un hilo los escribe en ``archivo`` o en stderr.
+
+    El formato que se le asigne (por ejemplo FormatoJSON en LOGGING) lo
+    aplica el hilo que escribe.
+    """
+
+    def __init__(self, archivo=None, tamano_cola=10000):
+        super().__init__(queue.Queue(tamano_cola))
+        self.destino = WatchedFileHandler(archivo, encoding='utf-8') if archivo else logging.StreamHandler(sys.stderr)
+        self.descartados = 0
+        self._listener = QueueListener(self.queue, self.destino, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        self.destino.setFormatter(fmt)
+
+    def prepare(self, record):
+        """Deja el registro listo para otro hilo sin darle formato todavía"""
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # El objeto request no se puede usar desde otro hilo
+        record.__dict__.pop('request', None)
+        return record
+
+    def enqueue(self, record):
+        # Si el escritor no da abasto se pierden eventos antes que frenar las peticiones
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            # Escribe lo que quede en la cola antes de terminar
+            listener.stop()
+            self.destino.close()
+        super().close()
+
+
+class BitacoraMiddleware:
+    """Identifica la petición, aplica el muestreo de la vista y registra su duración"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        token = self._comenzar(request)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self._registrar(request, response, inicio)
+        finally:
+            _peticion_actual.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = self._comenzar(request)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self._registrar(request, response, inicio)
+        finally:
+            _peticion_actual.reset(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        peticion = _peticion_actual.get()
+        if peticion is not None and request.resolver_match:
+            peticion.vista = request.resolver_match.view_name
+            peticion.muestreada = random.random() < muestreo(peticion.vista)
+
+    def _comenzar(self, request):
+        # Se respeta el id que ponga un proxy para poder seguir la petición
+        return _peticion_actual.set(_Peticion((request.headers.get('X-Request-ID') or '')[:64] or uuid.uuid4().hex[:16]))
+
+    def _registrar(self, request, response, inicio):
+        response['X-Request-ID'] = _peticion_actual.get().request_id
+        evento(
+            logger, logging.WARNING if response.status_code >= 500 else logging.INFO, 'peticion',
+            metodo=request.method,
+            ruta=request.path,
+            estado=response.status_code,
+            # En las respuestas en streaming es el tiempo hasta el primer byte
+            duracion_ms=round((time.perf_counter() - inicio) * 1000, 1),
+        )
@@ -0,0 +1,78 @@
+"""Caché de consultas frecuentes con claves versionadas.
+
+Cada grupo de datos tiene un número de versión guardado en la base de datos
+(VersionDatos); las claves incluyen las versiones de los grupos de los que
+dependen, así que invalidar un grupo es solo incrementar su versión. Como la
+versión no vive en la caché, la invalidación llega a todos los procesos
+aunque cada uno tenga su propia caché en memoria local.
+
+Las versiones se leen de la misma base que los datos: con una réplica
+atrasada la clave es la de la versión que tiene la réplica, y lo calculado
+con ella no queda guardado bajo la versión nueva.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import receiver
+
+from . import versiones
+from .models import Representante
+from .signals import facturas_modificadas, representantes_modificados
+
+PREFIJO = 'arrozcascara'
+FACTURAS = 'facturas'
+REPRESENTANTES = 'representantes'
+
+
+def _tiempo():
+    return getattr(settings, 'ARROZCASCARA_CACHE_TIMEOUT', 300)
+
+
+def _nombre_version(grupo):
+    return f'cache:{grupo}'
+
+
+def version(grupo):
+    return versiones.de_grupos([_nombre_version(grupo)])[_nombre_version(grupo)]
+
+
+def invalidar(*grupos):
+    for grupo in grupos:
+        versiones.incrementar(_nombre_version(grupo))
+
+
+def obtener(nombre, grupos, calcular):
+    """Devuelve el valor en caché o lo calcula y lo guarda"""
+    # Una sola consulta por las versiones de todos los grupos
+    actuales = versiones.de_grupos([_nombre_version(grupo) for grupo in grupos]) if grupos else {}
+    clave = f'{PREFIJO}:{nombre}:{".".join(str(valor) for valor in actuales.values())}'
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, _tiempo())
+    return valor
+
+
+def huella(datos):
+    """Texto corto y estable para usar parámetros como parte de una clave"""
+    return hashlib.md5(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def lista_representantes():
+    """Representantes ordenados por nombre, para los selectores de las páginas"""
+    return obtener(
+        'representantes', [REPRESENTANTES],
+        lambda: list(Representante.objects.all().order_by('nombre_completo'))
+    )
+
+
+@receiver(facturas_modificadas)
+def _invalidar_facturas(sender, **kwargs):
+    invalidar(FACTURAS)
+
+
+@receiver(representantes_modificados)
+def _invalidar_representantes(sender, **kwargs):
+    invalidar(REPRESENTANTES)
@@ -0,0 +1,238 @@
+"""Columnas de las hojas de facturas: encabezados y conversión de valores.
+
+La importación y la vista previa usan este módulo, así que reconocen las
+mismas columnas y convierten los valores igual. Los valores se convierten
+por bloques y columna por columna: cada valor distinto de la columna se
+convierte y se valida una sola vez por bloque.
+"""
+import re
+from itertools import repeat
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fechas import LectorFechas
+from .models import Factura
+
+# Encabezados de una columna con el nombre y la cédula juntos, como
+# 'JUAN PÉREZ (00100000001)'; se separa en los dos campos
+NOMBRE_CON_CEDULA = ['cedula/nombes', 'cedula/nombres', 'cédula/nombres', 'nombre/cedula', 'nombres/cedula']
+
+# Posibles encabezados de cada campo; settings.ARROZCASCARA_COLUMNAS_IMPORTACION
+# puede agregar alias, por ejemplo {'representante': ['promotor']}
+COLUMNAS = {
+    'numero_factura': ['factura', 'numero', 'n°', 'no'],
+    'cedula': ['cedula', 'cédula', 'id', 'identificacion'],
+    'nombre': ['nombre', 'cliente', *NOMBRE_CON_CEDULA],
+    'sacos': ['sacos', 'cantidad'],
+    'variedad': ['variedad', 'tipo', 'arroz'],
+    'fecha': ['fecha'],
+    'representante': ['representante', 'representate', 'vendedor', 'agente', 'suplidor'],
+}
+
+COLUMNAS_REQUERIDAS = ['numero_factura', 'cedula', 'nombre', 'sacos', 'variedad']
+
+# Campo de la hoja -> campo de texto de Factura, en el orden en que se validan
+CAMPOS_TEXTO = {
+    'numero_factura': 'numero_factura',
+    'cedula': 'cedula',
+    'nombre': 'nombre_cliente',
+    'variedad': 'variedad',
+}
+
+
+def alias_columnas():
+    """Alias de cada campo, con los de la configuración primero"""
+    extra = getattr(settings, 'ARROZCASCARA_COLUMNAS_IMPORTACION', {})
+    return {campo: [*extra.get(campo, []), *nombres] for campo, nombres in COLUMNAS.items()}
+
+
+_PALABRA = re.compile(r'[\w°]+')
+
+
+def _contiene_palabras(palabras, alias):
+    """El alias aparece como una o varias palabras completas y seguidas del encabezado"""
+    buscadas = _PALABRA.findall(alias)
+    largo = len(buscadas)
+    return largo > 0 and any(palabras[i:i + largo] == buscadas for i in range(len(palabras) - largo + 1))
+
+
+def mapear_columnas(encabezados, columnas=None):
+    """Asigna a cada campo el índice de su columna, priorizando coincidencias exactas.
+
+    Si no hay una exacta basta con que el alias sea una palabra completa del
+    encabezado ('Cantidad de sacos'), pero no parte de una palabra: 'no' no
+    reconoce 'Nombre'.
+    """
+    columnas = columnas or alias_columnas()
+    normalizados = [str(h).strip().lower() if h is not None else '' for h in encabezados]
+    palabras = [_PALABRA.findall(encabezado) for encabezado in normalizados]
+    indices = {}
+    usados = set()
+
+    for exacta in (True, False):
+        for campo, nombres in columnas.items():
+            if campo in indices:
+                continue
+            for i, encabezado in enumerate(normalizados):
+                if not encabezado or i in usados:
+                    continue
+                if any(encabezado == n if exacta else _contiene_palabras(palabras[i], n) for n in nombres):
+                    indices[campo] = i
+                    usados.add(i)
+                    break
+
+    # Sin columna propia, la cédula se toma de la columna combinada con el nombre
+    if 'cedula' not in indices and 'nombre' in indices and normalizados[indices['nombre']] in NOMBRE_CON_CEDULA:
+        indices['cedula'] = indices['nombre']
+    return indices
+
+
+def _texto(valor):
+    """Convierte una celda a texto sin el '.0' que openpyxl agrega a los enteros"""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def convertir_textos(celdas):
+    """Textos de la columna: los textos solo se recortan y los demás valores
+    (números, fechas) se convierten una vez por valor distinto del bloque"""
+    memoria = {}
+    return [
+        celda.strip() if type(celda) is str
+        else memoria[celda] if celda in memoria
+        else memoria.setdefault(celda, _texto(celda))
+        for celda in celdas
+    ]
+
+
+# Cédula con o sin guiones, entre paréntesis o no, al final del nombre
+_CEDULA_EN_NOMBRE = re.compile(r'\(?\s*(\d[\d-]{5,}\d)\s*\)?')
+
+
+def separar_nombre_y_cedula(textos):
+    """Listas (nombres, cédulas) de una columna con los dos datos juntos; '' si falta la cédula"""
+    nombres, cedulas = [], []
+    memoria = {}
+    for texto in textos:
+        if texto not in memoria:
+            coincidencias = list(_CEDULA_EN_NOMBRE.finditer(texto))
+            if coincidencias:
+                cedula = coincidencias[-1]
+                nombre = ' '.join(f'{texto[:cedula.start()]} {texto[cedula.end():]}'.split())
+                memoria[texto] = (nombre, cedula.group(1))
+            else:
+                memoria[texto] = (texto, '')
+        nombre, cedula = memoria[texto]
+        nombres.append(nombre)
+        cedulas.append(cedula)
+    return nombres, cedulas
+
+
+def _entero(celda):
+    try:
+        return int(float(celda))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def convertir_enteros(celdas):
+    """Enteros de la columna; None donde la celda no es un número"""
+    valores = []
+    memoria = {}
+    for celda in celdas:
+        tipo = type(celda)
+        if tipo is int:
+            valores.append(celda)
+        elif tipo is float and celda == celda and abs(celda) != float('inf'):
+            valores.append(int(celda))
+        else:
+            # Textos y otros tipos: una conversión por valor distinto
+            if celda not in memoria:
+                memoria[celda] = _entero(celda)
+            valores.append(memoria[celda])
+    return valores
+
+
+def _columna(columnas, indices, campo, alto):
+    i = indices.get(campo)
+    return columnas[i] if i is not None else tuple(repeat(None, alto))
+
+
+def convertir_bloque(filas, indices, fechas=None, variedad=None):
+    """Convierte un bloque de filas de la hoja columna por columna.
+
+    Devuelve ({campo: valores}, {posición en el bloque: error}) con el
+    primer error de cada fila, en el mismo orden en que se validan los
+    campos al crear la factura. ``fechas`` es el LectorFechas del archivo,
+    para que el formato de la columna se detecte una sola vez. ``variedad``
+    se usa en las filas sin variedad, o en todas si la hoja no tiene la columna.
+    """
+    alto = len(filas)
+    ancho = max(indices.values()) + 1
+    # Transponer con zip; las filas cortas se completan con None
+    columnas = list(zip(*(
+        fila if len(fila) >= ancho else tuple(fila) + (None,) * (ancho - len(fila))
+        for fila in filas
+    )))
+
+    valores = {}
+    errores = {}
+
+    separados = {}
+    if indices.get('cedula') is not None and indices['cedula'] == indices.get('nombre'):
+        separados['nombre'], separados['cedula'] = separar_nombre_y_cedula(
+            convertir_textos(columnas[indices['nombre']])
+        )
+
+    for campo, campo_factura in CAMPOS_TEXTO.items():
+        if campo in separados:
+            textos = separados[campo]
+        else:
+            textos = convertir_textos(_columna(columnas, indices, campo, alto))
+        if campo == 'variedad' and variedad:
+            textos = [texto or variedad for texto in textos]
+        limite = Factura._meta.get_field(campo_factura).max_length
+        # Se revisan los valores distintos; las filas solo se recorren si alguno no es válido
+        invalidos = {texto for texto in set(textos) if not texto or len(texto) > limite}
+        if invalidos:
+            for posicion, texto in enumerate(textos):
+                if texto not in invalidos:
+                    continue
+                if not texto:
+                    errores.setdefault(posicion, f'El campo {campo_factura} está vacío')
+                else:
+                    errores.setdefault(posicion, f'El campo {campo_factura} supera {limite} caracteres')
+        valores[campo] = textos
+
+    celdas = _columna(columnas, indices, 'sacos', alto)
+    sacos = convertir_enteros(celdas)
+    for posicion, cantidad in enumerate(sacos):
+        if cantidad is None:
+            errores.setdefault(posicion, f'Cantidad de sacos no válida: {celdas[posicion]}')
+        elif cantidad <= 0:
+            errores.setdefault(posicion, 'La cantidad de sacos debe ser mayor a 0')
+    valores['sacos'] = sacos
+
+    if 'fecha' in indices:
+        celdas = columnas[indices['fecha']]
+        convertidas = (fechas or LectorFechas()).convertir(celdas)
+        for posicion, fecha in enumerate(convertidas):
+            if fecha is not None:
+                continue
+            if celdas[posicion] is None or not str(celdas[posicion]).strip():
+                errores.setdefault(posicion, 'La fecha está vacía')
+            else:
+                errores.setdefault(posicion, f'Fecha no válida: {celdas[posicion]}')
+    else:
+        # La columna de fecha es opcional; sin ella las facturas se registran
+        # hoy, en la zona horaria del proyecto y no la del servidor
+        convertidas = [timezone.localdate()] * alto
+    valores['fecha'] = convertidas
+
+    # El representante lo resuelve la importación contra los registrados
+    valores['representante'] = list(_columna(columnas, indices, 'representante', alto))
+    return valores, errores
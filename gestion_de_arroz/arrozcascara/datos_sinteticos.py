@@ -0,0 +1,168 @@
+"""Datos sintéticos de cosechas de arroz para pruebas de rendimiento.
+
+Genera representantes y facturas con distribuciones parecidas a las reales:
+dos cosechas por año, unas pocas variedades que concentran la mayoría de las
+entregas, productores que entregan varias veces por temporada, cédulas de 11
+dígitos con su dígito verificador y las facturas viejas casi siempre pagadas.
+Con la misma semilla se generan los mismos datos.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from openpyxl import Workbook
+
+from . import resumen
+from .models import Representante, Factura
+from .signals import facturas_modificadas, representantes_modificados, enviar_despues_de_confirmar
+
+TAMANO_LOTE = 2000
+
+# Variedad y peso relativo de las entregas
+VARIEDADES = [('Puita', 40), ('Jaragua', 22), ('Guri', 15), ('Sabina', 13), ('Robusta', 10)]
+
+NOMBRES = [
+    'Juan', 'José', 'Luis', 'Carlos', 'Manuel', 'Pedro', 'Rafael', 'Francisco', 'Ramón', 'Miguel',
+    'María', 'Ana', 'Rosa', 'Carmen', 'Juana', 'Altagracia', 'Mercedes', 'Josefina', 'Yolanda', 'Ramona',
+]
+APELLIDOS = [
+    'Pérez', 'Rodríguez', 'Martínez', 'García', 'Fernández', 'Gómez', 'Díaz', 'Reyes', 'Santos', 'Jiménez',
+    'Rosario', 'Peña', 'Núñez', 'Vásquez', 'Castillo', 'Almonte', 'Tavárez', 'Polanco', 'Cruz', 'Ureña',
+]
+MUNICIPIOS = ['Cotuí', 'Bonao', 'San Francisco de Macorís', 'Nagua', 'Mao', 'Montecristi', 'Villa Riva', 'Pimentel']
+
+# Meses de las dos cosechas del año y su peso relativo
+MESES_COSECHA = [(4, 2), (5, 4), (6, 3), (10, 2), (11, 4), (12, 2)]
+
+# Precio por saco en pesos dominicanos de las facturas pagadas
+PRECIOS_SACO = (Decimal('1800'), Decimal('2600'))
+
+# Las facturas con más días que esto están pagadas con esta probabilidad
+DIAS_PARA_PAGO = 45
+PROBABILIDAD_PAGO = 0.9
+
+
+def cedula(aleatorio):
+    """Cédula de 11 dígitos con prefijo de municipio y dígito verificador Luhn"""
+    base = f'{aleatorio.randint(1, 130):03d}{aleatorio.randint(0, 9999999):07d}'
+    suma = 0
+    for posicion, digito in enumerate(map(int, base)):
+        producto = digito * (1 if posicion % 2 == 0 else 2)
+        suma += producto // 10 + producto % 10
+    return base + str((10 - suma % 10) % 10)
+
+
+def _nombre(aleatorio):
+    return f'{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}'
+
+
+def _fechas_de_cosecha(aleatorio, hasta, anios):
+    meses, pesos = zip(*MESES_COSECHA)
+    while True:
+        anio = hasta.year - aleatorio.randrange(anios)
+        fecha = date(anio, aleatorio.choices(meses, pesos)[0], aleatorio.randint(1, 28))
+        if fecha <= hasta:
+            # Se entrega menos los domingos
+            if fecha.weekday() == 6 and aleatorio.random() < 0.7:
+                continue
+            yield fecha
+
+
+def _productores(aleatorio, cantidad, representantes):
+    """Productores con cédula y nombre fijos; cada uno entrega a un representante"""
+    cedulas = set()
+    productores = []
+    while len(productores) < cantidad:
+        numero = cedula(aleatorio)
+        if numero in cedulas:
+            continue
+        cedulas.add(numero)
+        productores.append((numero, _nombre(aleatorio), aleatorio.choice(representantes)))
+    return productores
+
+
+def generar(representantes=20, facturas=10000, semilla=0, hasta=None, anios=2, prefijo='SIN'):
+    """Crea representantes y facturas sintéticas y reconstruye el resumen.
+
+    Devuelve (representantes creados, facturas creadas).
+    """
+    aleatorio = random.Random(semilla)
+    hasta = hasta or date.today()
+
+    with transaction.atomic():
+        nuevos = []
+        # Nombres distintos para que la importación pueda resolverlos sin ambigüedad
+        nombres = set(Representante.objects.values_list('nombre_completo', flat=True))
+        for numero in range(representantes):
+            nombre = _nombre(aleatorio)
+            if nombre in nombres:
+                nombre = f'{nombre} {numero}'
+            nombres.add(nombre)
+            nuevos.append(Representante(
+                cedula=f'{prefijo}-{numero:05d}',
+                nombre_completo=nombre,
+                direccion=f'{aleatorio.choice(MUNICIPIOS)}, República Dominicana',
+            ))
+        Representante.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+        ids = list(Representante.objects.filter(cedula__startswith=f'{prefijo}-').values_list('pk', flat=True))
+
+        # Unos diez productores por representante, con entregas repetidas
+        productores = _productores(aleatorio, max(1, min(facturas, len(ids) * 10)), ids)
+        variedades, pesos = zip(*VARIEDADES)
+        fechas = _fechas_de_cosecha(aleatorio, hasta, anios)
+
+        lote = []
+        for numero in range(facturas):
+            numero_cedula, nombre, representante_id = aleatorio.choice(productores)
+            fecha = next(fechas)
+            sacos = max(1, int(aleatorio.lognormvariate(4.3, 0.7)))
+            pagada = (hasta - fecha).days > DIAS_PARA_PAGO and aleatorio.random() < PROBABILIDAD_PAGO
+            precio = Decimal(aleatorio.randint(*map(int, PRECIOS_SACO)))
+            lote.append(Factura(
+                numero_factura=f'{prefijo}{numero:08d}',
+                cedula=numero_cedula,
+                nombre_cliente=nombre,
+                cantidad_sacos=sacos,
+                representante_id=representante_id,
+                fecha=fecha,
+                variedad=aleatorio.choices(variedades, pesos)[0],
+                estado='pagado' if pagada else 'pendiente',
+                monto=precio * sacos if pagada else Decimal('0'),
+                fecha_pago=fecha + timedelta(days=aleatorio.randint(7, DIAS_PARA_PAGO)) if pagada else None,
+            ))
+            if len(lote) >= TAMANO_LOTE:
+                Factura.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            Factura.objects.bulk_create(lote)
+
+        resumen.reconstruir()
+        # Un solo aviso para invalidar cachés y la versión de los datos
+        enviar_despues_de_confirmar(representantes_modificados, Representante, representantes=[])
+        enviar_despues_de_confirmar(facturas_modificadas, Factura, facturas=[], accion='creada')
+
+    return len(nuevos), facturas
+
+
+def libro_excel(ruta, filas, representantes, semilla=0, prefijo='XLS'):
+    """Escribe un libro .xlsx con el formato que acepta la importación.
+
+    ``representantes`` son los nombres que se ponen en la columna Representante.
+    """
+    aleatorio = random.Random(semilla)
+    nombres = list(representantes)
+    fechas = _fechas_de_cosecha(aleatorio, date.today(), 2)
+    variedades, pesos = zip(*VARIEDADES)
+    productores = [(cedula(aleatorio), _nombre(aleatorio)) for _ in range(max(1, filas // 10))]
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Facturas')
+    ws.append(['Nombre', 'Cedula', 'Fecha', 'Factura', 'Representante', 'Cantidad de sacos', 'Variedad'])
+    for numero in range(filas):
+        numero_cedula, nombre = aleatorio.choice(productores)
+        ws.append([
+            nombre, numero_cedula, next(fechas), f'{prefijo}{numero:08d}', aleatorio.choice(nombres),
+            max(1, int(aleatorio.lognormvariate(4.3, 0.7))), aleatorio.choices(variedades, pesos)[0],
+        ])
+    wb.save(ruta)
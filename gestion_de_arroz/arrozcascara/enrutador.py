@@ -0,0 +1,124 @@
+"""Lecturas de las vistas de consulta desde la base de reportes.
+
+Las vistas marcadas con ``@lectura_de_reportes`` (dashboard, detalles,
+facturas_api, exportaciones) leen de la base REPORTES_BASE_DE_DATOS, por
+ejemplo una réplica de MySQL, si está configurada en DATABASES. Las
+escrituras y las demás vistas usan 'default', así las consultas pesadas no
+compiten con las importaciones.
+
+Para que quien acaba de guardar vea sus cambios aunque la réplica vaya
+atrasada, después de una escritura EnrutadorMiddleware deja una cookie con la
+que las lecturas de ese navegador van a 'default' durante
+REPORTES_FIJAR_PRIMARIA segundos (0 lo desactiva).
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+COOKIE = 'arrozcascara_primaria'
+
+
+class _Peticion:
+    """Estado del enrutamiento de la petición en curso"""
+
+    def __init__(self, fijada):
+        # El navegador escribió hace poco: todo se lee de 'default'
+        self.fijada = fijada
+        self.reportes = False
+        self.escribio = False
+
+
+# Objeto mutable en una variable de contexto, como en la bitácora: bajo ASGI
+# process_view puede correr en otro hilo y solo modifica el objeto
+_peticion_actual = ContextVar('peticion_enrutador', default=None)
+
+
+def alias_reportes():
+    """Alias de la base de reportes, o None si no está configurada"""
+    alias = getattr(settings, 'REPORTES_BASE_DE_DATOS', 'reporting')
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def base_de_lectura():
+    """Alias del que leen ahora los modelos de la aplicación; None es 'default'"""
+    peticion = _peticion_actual.get()
+    if peticion is None or not peticion.reportes or peticion.fijada or peticion.escribio:
+        return None
+    return alias_reportes()
+
+
+def lectura_de_reportes(vista):
+    """Marca una vista de solo lectura cuyas consultas pueden ir a la base de reportes"""
+    vista.lectura_de_reportes = True
+    return vista
+
+
+class EnrutadorReportes:
+    """Router de DATABASE_ROUTERS para los modelos de arrozcascara"""
+
+    def db_for_read(self, model, **hints):
+        # Sesiones, usuarios y demás aplicaciones siempre en 'default'
+        if model._meta.app_label != 'arrozcascara':
+            return None
+        return base_de_lectura()
+
+    def db_for_write(self, model, **hints):
+        peticion = _peticion_actual.get()
+        if peticion is not None and model._meta.app_label == 'arrozcascara':
+            peticion.escribio = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambas bases tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema de la base principal
+        if db == alias_reportes():
+            return False
+        return None
+
+
+class EnrutadorMiddleware:
+    """Aplica @lectura_de_reportes y fija el navegador a 'default' después de escribir"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        peticion = _Peticion(COOKIE in request.COOKIES)
+        token = _peticion_actual.set(peticion)
+        try:
+            response = self.get_response(request)
+        finally:
+            _peticion_actual.reset(token)
+        return self._fijar(response, peticion)
+
+    async def __acall__(self, request):
+        peticion = _Peticion(COOKIE in request.COOKIES)
+        token = _peticion_actual.set(peticion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _peticion_actual.reset(token)
+        return self._fijar(response, peticion)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        peticion = _peticion_actual.get()
+        if peticion is not None:
+            peticion.reportes = getattr(view_func, 'lectura_de_reportes', False)
+
+    def _fijar(self, response, peticion):
+        segundos = getattr(settings, 'REPORTES_FIJAR_PRIMARIA', 10)
+        if peticion.escribio and segundos and alias_reportes():
+            response.set_cookie(COOKIE, '1', max_age=segundos, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,63 @@
+"""Estadísticas del dashboard calculadas en la base de datos."""
+from django.utils.timezone import now
+
+from . import cacheo
+from .models import TotalRepresentante
+
+# Colores para los gráficos
+CHART_COLORS = [
+    '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7',
+    '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9'
+]
+
+
+def representantes_con_totales():
+    """Totales por representante leídos de TotalRepresentante, de mayor a menor cantidad de sacos"""
+    # Una fila por representante, sin agregar el resumen diario en cada petición
+    return TotalRepresentante.objects.filter(total_facturas__gt=0).values(
+        'representante', 'representante__nombre_completo', 'representante__cedula', 'representante__direccion',
+        'total_sacos', 'total_facturas',
+    ).order_by('-total_sacos', 'representante__nombre_completo')
+
+
+def estadisticas_dashboard():
+    """Contexto del dashboard obtenido con una sola consulta sobre los totales"""
+    representantes_data = [
+        {
+            'id': fila['representante'],
+            'nombre_completo': fila['representante__nombre_completo'],
+            'cedula': fila['representante__cedula'],
+            'direccion': fila['representante__direccion'],
+            'total_sacos': fila['total_sacos'],
+            'total_facturas': fila['total_facturas'],
+            'color': CHART_COLORS[i % len(CHART_COLORS)],
+        }
+        for i, fila in enumerate(representantes_con_totales())
+    ]
+
+    # Calcular estadísticas generales
+    total_representantes = len(representantes_data)
+    total_facturas = sum(rep['total_facturas'] for rep in representantes_data)
+    total_sacos = sum(rep['total_sacos'] for rep in representantes_data)
+    promedio_sacos = round(total_sacos / total_representantes) if total_representantes > 0 else 0
+
+    return {
+        'total_representantes': total_representantes,
+        'total_facturas': total_facturas,
+        'total_sacos': total_sacos,
+        'promedio_sacos': promedio_sacos,
+        'representantes_data': representantes_data,
+        # Preparar datos para gráficos
+        'chart_labels': [rep['nombre_completo'] for rep in representantes_data],
+        'chart_sacks_data': [rep['total_sacos'] for rep in representantes_data],
+        'chart_invoices_data': [rep['total_facturas'] for rep in representantes_data],
+        'chart_colors': CHART_COLORS,
+        # Obtener hora de actualización
+        'last_update': now().strftime('%H:%M') if representantes_data else '--:--',
+    }
+
+
+def estadisticas_de_version(version):
+    """Estadísticas en caché bajo la versión de los datos guardada en la base"""
+    # La clave es igual en todos los procesos y cambia con cada escritura
+    return cacheo.obtener(f'dashboard:{version}', [], estadisticas_dashboard)
@@ -0,0 +1,205 @@
+"""Cambios del dashboard enviados en vivo con Server-Sent Events.
+
+Cada proceso ASGI tiene un canal en memoria con una cola por conexión. Las
+escrituras hechas en el mismo proceso publican al confirmarse la transacción
+(señales ``facturas_modificadas`` y ``representantes_modificados``); las de
+otros procesos se detectan con una consulta periódica a VersionDatos que
+comparten todas las conexiones del proceso.
+
+Los eventos solo llevan los representantes cuyos totales cambiaron y los
+totales generales, calculados una vez por cambio y no una vez por conexión.
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.dispatch import receiver
+
+from . import versiones
+from .estadisticas import estadisticas_de_version
+from .signals import facturas_modificadas, representantes_modificados
+
+# Eventos que puede acumular una conexión lenta antes de resincronizarla
+MAX_EVENTOS_PENDIENTES = 100
+
+# Facturas que se describen en un evento (una importación envía lotes de miles)
+MAX_FACTURAS_POR_EVENTO = 20
+
+# Espera del navegador antes de reconectar, en milisegundos
+RECONEXION_MS = 5000
+
+TOTALES = ('total_representantes', 'total_facturas', 'total_sacos', 'promedio_sacos')
+
+# Marca que reemplaza la cola de una conexión que no lee a tiempo
+_RESINCRONIZAR = object()
+
+
+def _intervalo():
+    """Segundos entre consultas a VersionDatos para ver cambios de otros procesos"""
+    return getattr(settings, 'DASHBOARD_EVENTOS_INTERVALO', 5)
+
+
+def _keepalive():
+    """Segundos sin eventos tras los que se envía un comentario para mantener la conexión"""
+    return getattr(settings, 'DASHBOARD_EVENTOS_KEEPALIVE', 15)
+
+
+def _sin_color(rep):
+    # El color depende de la posición y la recalcula el navegador
+    return {campo: valor for campo, valor in rep.items() if campo not in ('color', 'direccion')}
+
+
+def diferencias(anteriores, nuevas):
+    """Representantes que cambiaron o desaparecieron entre dos estadísticas"""
+    antes = {rep['id']: _sin_color(rep) for rep in anteriores['representantes_data']} if anteriores else {}
+    despues = {rep['id']: _sin_color(rep) for rep in nuevas['representantes_data']}
+    return {
+        'representantes': [rep for id_rep, rep in despues.items() if antes.get(id_rep) != rep],
+        'eliminados': [id_rep for id_rep in antes if id_rep not in despues],
+        'totales': {campo: nuevas[campo] for campo in TOTALES},
+        'last_update': nuevas['last_update'],
+    }
+
+
+def _describir_facturas(facturas):
+    return [
+        {
+            'numero_factura': factura.numero_factura,
+            'representante_id': factura.representante_id,
+            'cantidad_sacos': factura.cantidad_sacos,
+            'estado': factura.estado,
+        }
+        for factura in facturas[:MAX_FACTURAS_POR_EVENTO]
+    ]
+
+
+def _entregar(cola, evento):
+    """Se ejecuta en el bucle de la conexión"""
+    try:
+        cola.put_nowait(evento)
+    except asyncio.QueueFull:
+        # La conexión recibirá el estado completo en lugar de cada cambio
+        while not cola.empty():
+            cola.get_nowait()
+        cola.put_nowait(_RESINCRONIZAR)
+
+
+class Canal:
+    """Conexiones abiertas del proceso y últimas estadísticas publicadas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = {}  # cola -> bucle de eventos
+        self._vigilantes = {}  # bucle de eventos -> tarea que consulta VersionDatos
+        self.version = None
+        self.estadisticas = None
+
+    def suscribir(self):
+        bucle = asyncio.get_running_loop()
+        cola = asyncio.Queue(MAX_EVENTOS_PENDIENTES)
+        with self._lock:
+            self._suscriptores[cola] = bucle
+            if bucle not in self._vigilantes:
+                self._vigilantes[bucle] = bucle.create_task(self._vigilar(bucle))
+        return cola
+
+    def cancelar(self, cola):
+        with self._lock:
+            self._suscriptores.pop(cola, None)
+
+    def hay_suscriptores(self):
+        return bool(self._suscriptores)
+
+    def publicar(self, version, estadisticas, accion=None, facturas=()):
+        """Envía a todas las conexiones lo que cambió desde la última publicación"""
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return
+            evento = {'version': version, **diferencias(self.estadisticas, estadisticas)}
+            if accion:
+                evento['accion'] = accion
+                evento['cantidad_facturas'] = len(facturas)
+                evento['facturas'] = _describir_facturas(facturas)
+            self.version, self.estadisticas = version, estadisticas
+            destinos = list(self._suscriptores.items())
+
+        for cola, bucle in destinos:
+            bucle.call_soon_threadsafe(_entregar, cola, evento)
+
+    def sincronizar(self):
+        """Publica si la versión en la base es más nueva y devuelve (version, estadisticas)"""
+        version = versiones.actual()[0]
+        if self.version is None or version > self.version:
+            self.publicar(version, estadisticas_de_version(version))
+        with self._lock:
+            return self.version, self.estadisticas
+
+    async def _vigilar(self, bucle):
+        # Una sola consulta por intervalo para todas las conexiones del proceso
+        while True:
+            await asyncio.sleep(_intervalo())
+            with self._lock:
+                if bucle not in self._suscriptores.values():
+                    del self._vigilantes[bucle]
+                    return
+            try:
+                await sync_to_async(_consultar, thread_sensitive=False)(self.sincronizar)
+            except Exception:
+                # Un fallo de la base no debe terminar la vigilancia; se reintenta
+                pass
+
+
+canal = Canal()
+
+
+def _consultar(funcion):
+    """Ejecuta una función con consultas y libera la conexión, porque el flujo dura horas"""
+    try:
+        return funcion()
+    finally:
+        connection.close()
+
+
+def formatear(tipo, datos, version):
+    return f'event: {tipo}\nid: {version}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def flujo(ultimo_id=None):
+    """Cuerpo de la respuesta text/event-stream de una conexión"""
+    cola = canal.suscribir()
+    try:
+        version, estadisticas = await sync_to_async(_consultar, thread_sensitive=False)(canal.sincronizar)
+        yield f'retry: {RECONEXION_MS}\n\n'
+        # Al reconectar con la versión que ya tiene, el navegador no necesita el estado completo
+        if ultimo_id != str(version):
+            yield formatear('estadisticas', estadisticas, version)
+
+        while True:
+            try:
+                evento = await asyncio.wait_for(cola.get(), timeout=_keepalive())
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+
+            if evento is _RESINCRONIZAR:
+                version, estadisticas = await sync_to_async(_consultar, thread_sensitive=False)(canal.sincronizar)
+                yield formatear('estadisticas', estadisticas, version)
+            elif evento['version'] > version:
+                version = evento['version']
+                yield formatear('cambios', evento, version)
+    finally:
+        canal.cancelar(cola)
+
+
+@receiver(facturas_modificadas)
+@receiver(representantes_modificados)
+def _datos_modificados(sender, accion=None, facturas=(), **kwargs):
+    # Sin conexiones abiertas en este proceso no hace falta calcular nada
+    if not canal.hay_suscriptores():
+        return
+    version = versiones.actual()[0]
+    canal.publicar(version, estadisticas_de_version(version), accion, list(facturas))
@@ -0,0 +1,137 @@
+"""Conversión de columnas de fechas de las hojas de Excel.
+
+Las hojas reales repiten unas pocas fechas miles de veces y casi siempre
+escriben todos los textos con el mismo formato. Por eso el formato se detecta
+una vez con una muestra de la columna, los textos ya convertidos se guardan
+en un LRU acotado y los números de serie de Excel se convierten con
+aritmética de ordinales. Una celda que no es una fecha devuelve None para
+que la importación la reporte como error.
+"""
+import re
+from datetime import date, datetime
+from functools import lru_cache
+
+# Textos distintos que se recuerdan ya convertidos
+MAX_FECHAS_EN_MEMORIA = 4096
+
+# Celdas con texto que se usan para detectar el formato de la columna
+TAMANO_MUESTRA = 50
+
+# Excel cuenta los días desde 1899-12-30 (incluye el 29/02/1900 que no existió)
+_ORDINAL_BASE_EXCEL = date(1899, 12, 30).toordinal()
+_MAX_SERIE_EXCEL = date.max.toordinal() - _ORDINAL_BASE_EXCEL
+
+# Hora opcional al final del texto, que se descarta
+_HORA = r'(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?'
+
+# Nombre, expresión y orden de los grupos (a=año, m=mes, d=día). El orden
+# también es la preferencia ante un empate: día primero, como en el país.
+FORMATOS = [
+    ('aaaa-mm-dd', r'(\d{4})-(\d{1,2})-(\d{1,2})', 'amd'),
+    ('dd/mm/aaaa', r'(\d{1,2})/(\d{1,2})/(\d{4})', 'dma'),
+    ('mm/dd/aaaa', r'(\d{1,2})/(\d{1,2})/(\d{4})', 'mda'),
+    ('dd-mm-aaaa', r'(\d{1,2})-(\d{1,2})-(\d{4})', 'dma'),
+    ('dd.mm.aaaa', r'(\d{1,2})\.(\d{1,2})\.(\d{4})', 'dma'),
+    ('aaaa/mm/dd', r'(\d{4})/(\d{1,2})/(\d{1,2})', 'amd'),
+    ('dd/mm/aa', r'(\d{1,2})/(\d{1,2})/(\d{2})', 'dma'),
+    ('mm/dd/aa', r'(\d{1,2})/(\d{1,2})/(\d{2})', 'mda'),
+]
+
+_EXPRESIONES = {nombre: (re.compile(patron + _HORA), orden) for nombre, patron, orden in FORMATOS}
+
+
+def _con_formato(texto, formato):
+    """Fecha del texto con un formato dado, o None si no corresponde"""
+    expresion, orden = _EXPRESIONES[formato]
+    coincidencia = expresion.fullmatch(texto)
+    if coincidencia is None:
+        return None
+    partes = dict(zip(orden, map(int, coincidencia.groups())))
+    anio = partes['a']
+    if anio < 100:
+        anio += 2000 if anio < 70 else 1900
+    try:
+        return date(anio, partes['m'], partes['d'])
+    except ValueError:
+        return None
+
+
+def detectar_formato(textos):
+    """Formato con el que se convierten más textos de la muestra, o None"""
+    muestra = textos[:TAMANO_MUESTRA]
+    mejor, aciertos_mejor = None, 0
+    for nombre, _, _ in FORMATOS:
+        aciertos = sum(1 for texto in muestra if _con_formato(texto, nombre) is not None)
+        if aciertos > aciertos_mejor:
+            mejor, aciertos_mejor = nombre, aciertos
+    return mejor
+
+
+@lru_cache(maxsize=MAX_FECHAS_EN_MEMORIA)
+def convertir_texto(texto, formato=None):
+    """Fecha de un texto; prueba el formato de la columna y luego los demás"""
+    if formato is not None:
+        fecha = _con_formato(texto, formato)
+        if fecha is not None:
+            return fecha
+    for nombre, _, _ in FORMATOS:
+        if nombre != formato:
+            fecha = _con_formato(texto, nombre)
+            if fecha is not None:
+                return fecha
+    return None
+
+
+def convertir_series(series):
+    """Fechas de números de serie de Excel; None fuera del rango válido"""
+    return [
+        date.fromordinal(_ORDINAL_BASE_EXCEL + int(serie)) if 1 <= serie <= _MAX_SERIE_EXCEL else None
+        for serie in series
+    ]
+
+
+class LectorFechas:
+    """Convierte las celdas de una columna de fechas.
+
+    Se crea uno por archivo: el formato de los textos se detecta con el
+    primer bloque que los tenga y se reutiliza en los siguientes.
+    """
+
+    def __init__(self):
+        self.formato = None
+
+    def convertir(self, celdas):
+        fechas = [None] * len(celdas)
+        posiciones_series, series = [], []
+        posiciones_textos, textos = [], []
+
+        for posicion, celda in enumerate(celdas):
+            tipo = type(celda)
+            if tipo is date:
+                fechas[posicion] = celda
+            elif tipo is datetime:
+                fechas[posicion] = celda.date()
+            elif tipo is int or tipo is float:
+                if celda == celda:  # descarta NaN
+                    posiciones_series.append(posicion)
+                    series.append(celda)
+            elif tipo is str:
+                texto = celda.strip()
+                if texto.isdigit():
+                    # Número de serie guardado como texto
+                    posiciones_series.append(posicion)
+                    series.append(int(texto))
+                elif texto:
+                    posiciones_textos.append(posicion)
+                    textos.append(texto)
+
+        for posicion, fecha in zip(posiciones_series, convertir_series(series)):
+            fechas[posicion] = fecha
+
+        if textos:
+            if self.formato is None:
+                self.formato = detectar_formato(textos)
+            formato = self.formato
+            for posicion, texto in zip(posiciones_textos, textos):
+                fechas[posicion] = convertir_texto(texto, formato)
+        return fechas
@@ -0,0 +1,135 @@
+"""Filtros de facturas compartidos por las vistas de consulta."""
+import base64
+import binascii
+import json
+
+from django.db.models import F, Q, Sum, Count
+from django.utils.dateparse import parse_date
+
+from .models import Factura, ResumenSacos, TotalRepresentante
+
+
+CAMPOS_FILTRO = ['representante', 'variedad', 'fecha_desde', 'fecha_hasta', 'estado', 'cedula']
+
+
+def _fecha_iso(valor):
+    """La fecha en formato AAAA-MM-DD, o None si no es una fecha válida"""
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        # Bien escrita pero inexistente, como 2024-02-30
+        return None
+    return fecha.isoformat() if fecha else None
+
+
+def leer_filtros(params, estricto=False):
+    """Obtiene los filtros de una QueryDict; las fechas invertidas se intercambian.
+
+    Una fecha no válida se descarta y se informa en el error; con estricto=True
+    se lanza ValueError para que las APIs respondan 400.
+    """
+    filtros = {campo: (params.get(campo) or '').strip() for campo in CAMPOS_FILTRO}
+
+    fecha_error = None
+    for campo, nombre in (('fecha_desde', 'Desde'), ('fecha_hasta', 'Hasta')):
+        if filtros[campo]:
+            fecha = _fecha_iso(filtros[campo])
+            if fecha is None:
+                fecha_error = f'La fecha "{nombre}" no es válida, use el formato AAAA-MM-DD'
+                if estricto:
+                    raise ValueError(fecha_error)
+            filtros[campo] = fecha or ''
+
+    if filtros['fecha_desde'] and filtros['fecha_hasta'] and filtros['fecha_desde'] > filtros['fecha_hasta']:
+        fecha_error = 'La fecha "Desde" no puede ser mayor que la fecha "Hasta"'
+        filtros['fecha_desde'], filtros['fecha_hasta'] = filtros['fecha_hasta'], filtros['fecha_desde']
+
+    return filtros, fecha_error
+
+
+def filtrar_facturas(facturas, filtros):
+    """Aplica al queryset los filtros que tengan valor.
+
+    También sirve para ResumenSacos, que tiene las mismas columnas salvo la cédula.
+    """
+    if filtros.get('representante'):
+        facturas = facturas.filter(representante_id=filtros['representante'])
+
+    if filtros.get('variedad'):
+        facturas = facturas.filter(variedad__iexact=filtros['variedad'])  # Búsqueda case-insensitive
+
+    if filtros.get('fecha_desde'):
+        facturas = facturas.filter(fecha__gte=filtros['fecha_desde'])
+
+    if filtros.get('fecha_hasta'):
+        facturas = facturas.filter(fecha__lte=filtros['fecha_hasta'])
+
+    if filtros.get('estado'):
+        facturas = facturas.filter(estado=filtros['estado'])
+
+    if filtros.get('cedula'):
+        facturas = facturas.filter(cedula=filtros['cedula'])
+
+    return facturas
+
+
+def totales_por_representante(facturas):
+    """Sacos y cantidad de facturas de cada representante, ordenados por nombre"""
+    return facturas.order_by().values('representante', 'representante__nombre_completo').annotate(
+        sacos=Sum('cantidad_sacos'),
+        facturas=Count('id')
+    ).order_by('representante__nombre_completo', 'representante')
+
+
+def totales_de_detalles(filtros):
+    """Los totales por representante de detalles, leídos de la tabla más chica que los tiene.
+
+    Sin filtros salen de TotalRepresentante; con representante, fechas,
+    variedad o estado, de ResumenSacos, que agrupa por esas columnas. La
+    cédula no está en el resumen, así que con ese filtro se agregan las facturas.
+    """
+    if filtros.get('cedula'):
+        return totales_por_representante(filtrar_facturas(Factura.objects.all(), filtros))
+
+    orden = ('representante__nombre_completo', 'representante')
+    if not any(filtros.values()):
+        return TotalRepresentante.objects.filter(total_facturas__gt=0).values(
+            'representante', 'representante__nombre_completo',
+            sacos=F('total_sacos'), facturas=F('total_facturas'),
+        ).order_by(*orden)
+
+    resumenes = filtrar_facturas(ResumenSacos.objects.all(), filtros)
+    return resumenes.order_by().values('representante', 'representante__nombre_completo').annotate(
+        sacos=Sum('total_sacos'),
+        facturas=Sum('total_facturas')
+    ).order_by(*orden)
+
+
+def codificar_cursor(factura):
+    """Cursor opaco con la clave de orden (fecha, numero_factura) de la última fila"""
+    clave = json.dumps([factura['fecha'].isoformat(), factura['numero_factura']])
+    return base64.urlsafe_b64encode(clave.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        fecha, numero_factura = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError('Cursor no válido')
+
+    fecha = parse_date(fecha) if isinstance(fecha, str) else None
+    if fecha is None or not isinstance(numero_factura, str):
+        raise ValueError('Cursor no válido')
+    return fecha, numero_factura
+
+
+def pagina_despues_de(facturas, cursor):
+    """Filas que siguen al cursor según el orden ['-fecha', 'numero_factura']"""
+    if not cursor:
+        return facturas.order_by('-fecha', 'numero_factura')
+
+    fecha, numero_factura = decodificar_cursor(cursor)
+    return facturas.filter(
+        Q(fecha__lt=fecha) | Q(fecha=fecha, numero_factura__gt=numero_factura)
+    ).order_by('-fecha', 'numero_factura')
+
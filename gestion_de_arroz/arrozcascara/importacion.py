@@ -0,0 +1,352 @@
+"""Motor de importación masiva de facturas desde archivos Excel."""
+import csv
+from dataclasses import dataclass, field
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import transaction
+from openpyxl import load_workbook
+
+from . import resumen
+from .columnas import COLUMNAS_REQUERIDAS, mapear_columnas, convertir_bloque, _texto
+from .fechas import LectorFechas
+from .indice_representantes import IndiceRepresentantes, ErrorRepresentante
+from .models import Factura
+from .signals import facturas_modificadas, enviar_despues_de_confirmar
+
+# Filas por lote, cada uno en su propia transacción; se puede cambiar con
+# settings.IMPORTACION_TAMANO_LOTE
+TAMANO_LOTE = 1000
+
+# Filas del principio del libro en las que se busca el encabezado; las
+# anteriores a él son títulos o notas y se saltan
+FILAS_BUSQUEDA_ENCABEZADO = 20
+
+ENCABEZADOS_REPORTE = ['Fila', 'Factura', 'Resultado', 'Detalle']
+
+# Campos de una factura existente que puede cambiar una nueva carga del libro;
+# el estado y los datos de pago se registran en la aplicación y no se tocan
+CAMPOS_ACTUALIZABLES = ['cedula', 'nombre_cliente', 'variedad', 'cantidad_sacos']
+# Campos opcionales: solo se comparan si la hoja tiene su columna
+CAMPOS_OPCIONALES = {'fecha': 'fecha', 'representante': 'representante_id'}
+
+
+class ErrorImportacion(Exception):
+    """Error que impide procesar el archivo completo"""
+
+
+@dataclass
+class ResultadoImportacion:
+    filas: int = 0
+    creadas: int = 0
+    actualizadas: int = 0
+    sin_cambios: int = 0
+    validas: int = 0
+    errores: list = field(default_factory=list)
+    # Errores de una corrida anterior que no se conservaron en la lista
+    errores_omitidos: int = 0
+
+    @property
+    def total_errores(self):
+        return self.errores_omitidos + len(self.errores)
+
+
+def _leer_encabezados(filas):
+    """Busca el encabezado entre las primeras filas del libro.
+
+    Es la primera fila que reconoce todas las columnas requeridas o, si
+    ninguna lo hace, la que reconoce más; sin columnas reconocidas, la primera
+    con contenido. Devuelve (número de fila, encabezados, filas restantes).
+    """
+    iniciales = list(islice(filas, FILAS_BUSQUEDA_ENCABEZADO))
+    elegida, mejor = None, (0, 0)
+    for posicion, fila in enumerate(iniciales):
+        if not fila or all(celda is None for celda in fila):
+            continue
+        if elegida is None:
+            elegida = posicion
+        indices = mapear_columnas(fila)
+        puntaje = (sum(campo in indices for campo in COLUMNAS_REQUERIDAS), len(indices))
+        if puntaje > mejor:
+            elegida, mejor = posicion, puntaje
+            if puntaje[0] == len(COLUMNAS_REQUERIDAS):
+                break
+    if elegida is None:
+        return None, None, filas
+    return elegida + 1, iniciales[elegida], chain(iniciales[elegida + 1:], filas)
+
+
+def _leer_bloques(filas, primera_fila, tamano_bloque, desde_fila=0, encabezados=None):
+    """Agrupa las filas con contenido en bloques de (números de fila, filas).
+
+    Las filas hasta ``desde_fila`` inclusive se saltan sin convertirse, igual
+    que las que repiten ``encabezados`` (libros con una sección por suplidor).
+    """
+    numeros, bloque = [], []
+    for numero_fila, fila in enumerate(filas, start=primera_fila):
+        if numero_fila <= desde_fila or not fila or all(celda is None for celda in fila) or fila == encabezados:
+            continue
+        numeros.append(numero_fila)
+        bloque.append(fila)
+        if len(bloque) >= tamano_bloque:
+            yield numeros, bloque
+            numeros, bloque = [], []
+    if bloque:
+        yield numeros, bloque
+
+
+def _abrir_hoja(archivo):
+    """Abre el libro y devuelve (libro, filas restantes, número del encabezado, índices)"""
+    wb = load_workbook(archivo, read_only=True, data_only=True)
+    numero_encabezado, encabezados, filas = _leer_encabezados(wb.active.iter_rows(values_only=True))
+    if encabezados is None:
+        wb.close()
+        raise ErrorImportacion('El archivo Excel no contiene datos')
+    return wb, filas, numero_encabezado, encabezados
+
+
+def _guardar_lote(lote, resultado):
+    """Inserta un lote y su aporte al resumen en una transacción corta"""
+    deltas = resumen.nuevos_deltas()
+    for factura in lote:
+        resumen.acumular(deltas, factura)
+
+    with transaction.atomic():
+        Factura.objects.bulk_create(lote)
+        resumen.aplicar(deltas)
+        # bulk_create no dispara post_save
+        enviar_despues_de_confirmar(facturas_modificadas, Factura, facturas=lote, accion='creada')
+    resultado.creadas += len(lote)
+
+
+def _guardar_lote_actualizando(lote, campos, resultado):
+    """Inserta las facturas nuevas del lote y actualiza las existentes que cambiaron.
+
+    Las existentes se leen bloqueadas dentro de la transacción, así el diff y
+    los deltas del resumen parten de los valores vigentes aunque alguien las
+    haya pagado o editado durante la importación. Las que no cambian no se
+    escriben.
+    """
+    with transaction.atomic():
+        existentes = {
+            factura.numero_factura: factura
+            for factura in Factura.objects.select_for_update().filter(
+                numero_factura__in=[factura.numero_factura for factura in lote]
+            )
+        }
+        deltas = resumen.nuevos_deltas()
+        nuevas, modificadas = [], []
+
+        for factura in lote:
+            actual = existentes.get(factura.numero_factura)
+            if actual is None:
+                resumen.acumular(deltas, factura)
+                nuevas.append(factura)
+                continue
+
+            cambios = {
+                campo: getattr(factura, campo) for campo in campos
+                if getattr(actual, campo) != getattr(factura, campo)
+            }
+            if not cambios:
+                resultado.sin_cambios += 1
+                continue
+            resumen.acumular(deltas, actual, -1)
+            for campo, valor in cambios.items():
+                setattr(actual, campo, valor)
+            resumen.acumular(deltas, actual)
+            modificadas.append(actual)
+
+        if nuevas:
+            Factura.objects.bulk_create(nuevas)
+            enviar_despues_de_confirmar(facturas_modificadas, Factura, facturas=nuevas, accion='creada')
+        if modificadas:
+            Factura.objects.bulk_update(modificadas, campos)
+            enviar_despues_de_confirmar(facturas_modificadas, Factura, facturas=modificadas, accion='modificada')
+        resumen.aplicar(deltas)
+
+    resultado.creadas += len(nuevas)
+    resultado.actualizadas += len(modificadas)
+
+
+def _revisar_filas(archivo, tamano_lote, actualizar=False, desde_fila=0, variedad=None):
+    """Lee el libro y revisa cada fila sin escribir en la base.
+
+    Produce cada ``tamano_lote`` filas un par (campos que trae la hoja,
+    bloque), donde el bloque tiene (número de fila, número de factura,
+    factura sin guardar o None, error) por fila. Los duplicados se buscan
+    con una consulta por bloque contra los números ya registrados y contra
+    los vistos en el archivo. Con ``actualizar`` un número ya registrado no
+    es error. ``variedad`` es la de las filas que no la traen.
+    """
+    wb, filas, numero_encabezado, encabezados = _abrir_hoja(archivo)
+    try:
+        indices = mapear_columnas(encabezados)
+        faltantes = [
+            campo for campo in COLUMNAS_REQUERIDAS
+            if campo not in indices and not (campo == 'variedad' and variedad)
+        ]
+        if faltantes:
+            raise ErrorImportacion(f'Faltan columnas requeridas: {", ".join(faltantes)}')
+
+        campos = CAMPOS_ACTUALIZABLES + [
+            campo_factura for campo, campo_factura in CAMPOS_OPCIONALES.items() if campo in indices
+        ]
+        representantes = IndiceRepresentantes()
+        vistas = {}  # número de factura -> fila donde apareció primero
+        fechas = LectorFechas()
+
+        for numeros, bloque in _leer_bloques(filas, numero_encabezado + 1, tamano_lote, desde_fila, encabezados):
+            valores, errores = convertir_bloque(bloque, indices, fechas, variedad)
+            # Solo los números del bloque: la memoria no crece con la cantidad de facturas registradas
+            existentes = set() if actualizar else set(Factura.objects.filter(
+                numero_factura__in=[valores['numero_factura'][posicion] for posicion in range(len(numeros))
+                                    if posicion not in errores]
+            ).values_list('numero_factura', flat=True))
+            revisadas = []
+            for posicion, numero_fila in enumerate(numeros):
+                error = errores.get(posicion)
+                numero_factura = valores['numero_factura'][posicion]
+                representante_id = None
+                if error is None:
+                    try:
+                        representante_id = representantes.resolver(valores['representante'][posicion])
+                    except ErrorRepresentante as e:
+                        error = str(e)
+                    else:
+                        if numero_factura in vistas:
+                            error = f'La factura {numero_factura} está repetida en el archivo (fila {vistas[numero_factura]})'
+                        elif numero_factura in existentes:
+                            error = f'La factura {numero_factura} ya existe'
+                if error:
+                    revisadas.append((numero_fila, numero_factura, None, error))
+                    continue
+
+                vistas[numero_factura] = numero_fila
+                revisadas.append((numero_fila, numero_factura, Factura(
+                    numero_factura=numero_factura,
+                    cedula=valores['cedula'][posicion],
+                    nombre_cliente=valores['nombre'][posicion],
+                    variedad=valores['variedad'][posicion],
+                    cantidad_sacos=valores['sacos'][posicion],
+                    fecha=valores['fecha'][posicion],
+                    representante_id=representante_id,
+                    estado='pendiente',
+                ), None))
+            yield campos, revisadas
+    finally:
+        wb.close()
+
+
+def importar_facturas(archivo, tamano_lote=None, progreso=None, actualizar=False,
+                      desde_fila=0, resultado=None, punto_control=None, variedad=None):
+    """Importa las facturas de un libro Excel con una cantidad constante de consultas.
+
+    Las filas se leen en streaming y se convierten por bloques columna por
+    columna; los representantes y los números de factura existentes se
+    cargan una sola vez y las facturas válidas se insertan con bulk_create
+    por lotes. Si se indica, ``progreso`` recibe el resultado parcial cada
+    ``tamano_lote`` filas.
+
+    Con ``actualizar`` las facturas cuyo número ya existe se actualizan en
+    lugar de reportarse como error, y las que no cambiaron se omiten; volver
+    a cargar el mismo libro no escribe nada.
+
+    Cada lote se confirma en su propia transacción, junto con la llamada a
+    ``punto_control(resultado, última fila del lote)``. Para reanudar una
+    importación interrumpida se pasan la última fila confirmada en
+    ``desde_fila`` y los totales ya guardados en ``resultado``.
+
+    ``variedad`` se asigna a las filas sin variedad; con ella la columna deja
+    de ser requerida.
+    """
+    tamano_lote = tamano_lote or getattr(settings, 'IMPORTACION_TAMANO_LOTE', TAMANO_LOTE)
+    resultado = resultado or ResultadoImportacion()
+    for campos, revisadas in _revisar_filas(archivo, tamano_lote, actualizar, desde_fila, variedad):
+        lote = []
+        for numero_fila, _, factura, error in revisadas:
+            if error:
+                resultado.errores.append(f'Fila {numero_fila}: {error}')
+            else:
+                lote.append(factura)
+
+        resultado.filas += len(revisadas)
+        with transaction.atomic():
+            if lote and actualizar:
+                _guardar_lote_actualizando(lote, campos, resultado)
+            elif lote:
+                _guardar_lote(lote, resultado)
+            if punto_control:
+                punto_control(resultado, revisadas[-1][0])
+        if progreso:
+            progreso(resultado)
+
+    if resultado.filas == 0:
+        raise ErrorImportacion('El archivo Excel no contiene datos')
+    return resultado
+
+
+def validar_facturas(archivo, reporte, tamano_lote=None, progreso=None, variedad=None):
+    """Revisa el libro completo sin guardar nada y escribe un reporte CSV por fila.
+
+    ``reporte`` es un archivo de texto abierto; recibe una línea por cada fila
+    con datos, válida o no, para que el archivo se pueda corregir de una vez.
+    """
+    tamano_lote = tamano_lote or getattr(settings, 'IMPORTACION_TAMANO_LOTE', TAMANO_LOTE)
+    resultado = ResultadoImportacion()
+    escritor = csv.writer(reporte)
+    # La marca BOM hace que Excel abra el archivo como UTF-8
+    reporte.write('\ufeff')
+    escritor.writerow(ENCABEZADOS_REPORTE)
+
+    for _, revisadas in _revisar_filas(archivo, tamano_lote, variedad=variedad):
+        for numero_fila, numero_factura, factura, error in revisadas:
+            if error:
+                resultado.errores.append(f'Fila {numero_fila}: {error}')
+                escritor.writerow([numero_fila, numero_factura, 'error', error])
+            else:
+                resultado.validas += 1
+                escritor.writerow([numero_fila, numero_factura, 'válida', ''])
+
+        resultado.filas += len(revisadas)
+        if progreso:
+            progreso(resultado)
+
+    if resultado.filas == 0:
+        raise ErrorImportacion('El archivo Excel no contiene datos')
+    return resultado
+
+
+def vista_previa(archivo, limite=5):
+    """Primeras filas del libro convertidas igual que en la importación, sin guardar nada"""
+    wb, filas, numero_encabezado, encabezados = _abrir_hoja(archivo)
+    try:
+        indices = mapear_columnas(encabezados)
+        # Se lee una fila de más para saber si el archivo continúa
+        numeros, bloque = next(_leer_bloques(filas, numero_encabezado + 1, limite + 1, encabezados=encabezados), ([], []))
+        hay_mas = len(bloque) > limite
+        numeros, bloque = numeros[:limite], bloque[:limite]
+
+        filas_previa = []
+        if bloque and indices:
+            valores, errores = convertir_bloque(bloque, indices)
+            representantes = IndiceRepresentantes()
+            for posicion, numero_fila in enumerate(numeros):
+                fila = {campo: columna[posicion] for campo, columna in valores.items()}
+                error = errores.get(posicion)
+                # Se muestra el representante al que quedaría asignada la factura
+                try:
+                    fila['representante'] = representantes.nombres[representantes.resolver(fila['representante'])]
+                except ErrorRepresentante as e:
+                    error = error or str(e)
+                filas_previa.append({'fila': numero_fila, 'valores': fila, 'error': error})
+
+        return {
+            'encabezados': [_texto(encabezado) for encabezado in encabezados],
+            'columnas': {campo: _texto(encabezados[i]) for campo, i in indices.items()},
+            'faltantes': [campo for campo in COLUMNAS_REQUERIDAS if campo not in indices],
+            'filas': filas_previa,
+            'hay_mas': hay_mas,
+        }
+    finally:
+        wb.close()
@@ -0,0 +1,142 @@
+"""Búsqueda en memoria de representantes para la importación.
+
+El índice se arma con una sola consulta por archivo y resuelve cada valor de
+la columna de representante sin tocar la base, en este orden: id, cédula,
+nombre normalizado (sin tildes, mayúsculas ni espacios de más), parte del
+nombre y, por último, coincidencia aproximada por palabras. Si varios
+representantes coinciden igual de bien la fila se reporta como ambigua en
+lugar de asignarse al primero.
+"""
+import difflib
+import re
+import unicodedata
+from collections import defaultdict
+
+from .columnas import _texto
+from .models import Representante
+
+# Parecido mínimo entre dos palabras para considerarlas la misma (errores de tipeo)
+PARECIDO_PALABRA = 0.8
+
+# Proporción mínima de palabras en común para aceptar una coincidencia aproximada
+PARECIDO_NOMBRE = 0.5
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    """Minúsculas sin tildes y con un solo espacio entre palabras"""
+    sin_tildes = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_NO_ALFANUMERICO.split(sin_tildes.lower())).strip()
+
+
+def _solo_digitos(texto):
+    return ''.join(c for c in texto if c.isdigit())
+
+
+class ErrorRepresentante(Exception):
+    """El valor no identifica a un único representante"""
+
+
+class IndiceRepresentantes:
+    """Representantes cargados una vez y resultados memorizados por valor.
+
+    Cada valor distinto se busca una sola vez; las filas siguientes con el
+    mismo valor se resuelven con una consulta al diccionario de resultados.
+    """
+
+    def __init__(self, representantes=None):
+        if representantes is None:
+            representantes = Representante.objects.order_by('pk').values_list('pk', 'cedula', 'nombre_completo')
+        self.nombres = {}
+        self.por_cedula = {}
+        self.por_nombre = defaultdict(list)
+        self.por_palabra = defaultdict(set)
+        self.palabras = {}
+
+        for pk, cedula, nombre in representantes:
+            self.nombres[pk] = nombre
+            digitos = _solo_digitos(cedula)
+            if digitos:
+                self.por_cedula[digitos] = pk
+            normalizado = normalizar(nombre)
+            self.por_nombre[normalizado].append(pk)
+            palabras = set(normalizado.split())
+            self.palabras[pk] = palabras
+            for palabra in palabras:
+                self.por_palabra[palabra].add(pk)
+
+        # Sin columna de representante las facturas quedan con el primero, como antes
+        self.por_defecto = next(iter(self.nombres), None)
+        self._vocabulario = list(self.por_palabra)
+        self._resultados = {}
+
+    def resolver(self, valor):
+        """Id del representante; lanza ErrorRepresentante si no hay uno solo"""
+        texto = _texto(valor)
+        if texto not in self._resultados:
+            try:
+                self._resultados[texto] = (self._buscar(texto), None)
+            except ErrorRepresentante as e:
+                self._resultados[texto] = (None, str(e))
+        pk, error = self._resultados[texto]
+        if error:
+            raise ErrorRepresentante(error)
+        return pk
+
+    def _buscar(self, texto):
+        if not self.nombres:
+            raise ErrorRepresentante('No hay representantes registrados')
+        if not texto:
+            return self.por_defecto
+
+        if texto.isdigit() and int(texto) in self.nombres:
+            return int(texto)
+        if not any(c.isalpha() for c in texto):
+            # Cédula con o sin guiones
+            pk = self.por_cedula.get(_solo_digitos(texto))
+            if pk is not None:
+                return pk
+
+        normalizado = normalizar(texto)
+        if not normalizado:
+            raise ErrorRepresentante(f'Representante no encontrado: {texto}')
+        exactos = self.por_nombre.get(normalizado, [])
+        if exactos:
+            return self._unico(texto, exactos)
+
+        # Parte del nombre, como el icontains anterior
+        contienen = [pk for nombre, pks in self.por_nombre.items() if normalizado in nombre for pk in pks]
+        if contienen:
+            return self._unico(texto, contienen)
+
+        return self._aproximado(texto, normalizado)
+
+    def _aproximado(self, texto, normalizado):
+        """Coincidencia por palabras en común, tolerando errores de tipeo"""
+        palabras = set()
+        for palabra in normalizado.split():
+            if palabra in self.por_palabra:
+                palabras.add(palabra)
+            else:
+                palabras.update(difflib.get_close_matches(palabra, self._vocabulario, n=1, cutoff=PARECIDO_PALABRA))
+
+        candidatos = set()
+        for palabra in palabras:
+            candidatos |= self.por_palabra[palabra]
+
+        puntajes = {}
+        for pk in candidatos:
+            propias = self.palabras[pk]
+            puntajes[pk] = len(palabras & propias) / len(palabras | propias)
+        mejores = [pk for pk, puntaje in puntajes.items() if puntaje >= PARECIDO_NOMBRE]
+        if not mejores:
+            raise ErrorRepresentante(f'Representante no encontrado: {texto}')
+        maximo = max(puntajes[pk] for pk in mejores)
+        return self._unico(texto, [pk for pk in mejores if puntajes[pk] == maximo])
+
+    def _unico(self, texto, pks):
+        if len(pks) == 1:
+            return pks[0]
+        nombres = ', '.join(sorted(self.nombres[pk] for pk in pks))
+        raise ErrorRepresentante(f'Representante ambiguo "{texto}": coincide con {nombres}')
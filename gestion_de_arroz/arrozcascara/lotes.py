@@ -0,0 +1,365 @@
+"""Operaciones sobre muchas facturas en una sola petición.
+
+Las facturas se eligen con una lista de ids o con los mismos filtros de
+detalles, se validan con una sola consulta y se escriben en una transacción.
+Igual que las vistas de una sola factura, mantienen ResumenSacos y envían
+``facturas_modificadas`` al confirmarse.
+"""
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from . import resumen
+from .filtros import CAMPOS_FILTRO, leer_filtros, filtrar_facturas
+from .models import Factura, Representante
+from .signals import facturas_modificadas, enviar_despues_de_confirmar, envio_agrupado
+
+# Máximo de facturas que puede tocar una petición
+MAX_FACTURAS_POR_LOTE = 5000
+
+# Facturas por cada UPDATE de bulk_update
+TAMANO_LOTE = 1000
+
+CAMPOS_PAGO = ['monto', 'estado', 'fecha_pago']
+
+# Campos que se pueden cambiar en lote (los mismos de editar_factura)
+CAMPOS_EDITABLES = [
+    'numero_factura', 'cedula', 'nombre_cliente', 'cantidad_sacos', 'representante_id', 'fecha', 'variedad'
+]
+
+CENTAVOS = Decimal('0.01')
+
+
+def _leer_ids(valores):
+    if not isinstance(valores, list) or not valores:
+        raise ValueError('ids debe ser una lista con al menos una factura')
+    try:
+        ids = [int(valor) for valor in valores]
+    except (TypeError, ValueError):
+        raise ValueError('Los ids deben ser números enteros')
+    # Sin repetidos y en el orden recibido, para reportar los resultados igual
+    return list(dict.fromkeys(ids))
+
+
+def seleccionar(datos):
+    """Devuelve (queryset, ids pedidos) a partir de 'ids' o 'filtros'; ids es None con filtros"""
+    if datos.get('ids') is not None:
+        ids = _leer_ids(datos['ids'])
+        if len(ids) > MAX_FACTURAS_POR_LOTE:
+            raise ValueError(f'Se pueden procesar hasta {MAX_FACTURAS_POR_LOTE} facturas por petición')
+        return Factura.objects.filter(pk__in=ids), ids
+
+    if isinstance(datos.get('filtros'), dict):
+        filtros, _ = leer_filtros({
+            campo: str(valor) for campo, valor in datos['filtros'].items()
+            if campo in CAMPOS_FILTRO and valor is not None
+        }, estricto=True)
+        # Un filtro vacío tocaría todas las facturas del sistema
+        if not any(filtros.values()):
+            raise ValueError('Indique al menos un filtro')
+        if filtros['representante'] and not filtros['representante'].isdigit():
+            raise ValueError('Representante no válido')
+        return filtrar_facturas(Factura.objects.all(), filtros), None
+
+    raise ValueError('Indique las facturas con "ids" o "filtros"')
+
+
+def _bloquear(facturas):
+    """Lee y bloquea las facturas elegidas con una sola consulta"""
+    filas = list(facturas.select_for_update().order_by('pk')[:MAX_FACTURAS_POR_LOTE + 1])
+    if len(filas) > MAX_FACTURAS_POR_LOTE:
+        raise ValueError(
+            f'El filtro incluye más de {MAX_FACTURAS_POR_LOTE} facturas; use un rango de fechas más corto'
+        )
+    return filas
+
+
+def _en_orden(facturas, ids, resultados):
+    """Resultados en el orden de los ids pedidos, con los que no existen"""
+    if ids is None:
+        return [resultados[factura.pk] for factura in facturas]
+    return [resultados.get(pk, {'id': pk, 'resultado': 'no_encontrada'}) for pk in ids]
+
+
+def _leer_monto(valor, campo='monto'):
+    try:
+        monto = Decimal(str(valor))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f'El valor de {campo} no es válido: {valor}')
+    if not monto.is_finite() or monto <= 0:
+        raise ValueError(f'El valor de {campo} debe ser mayor a 0')
+    return monto
+
+
+def _ajustar_monto(monto):
+    monto = monto.quantize(CENTAVOS)
+    limite = Factura._meta.get_field('monto')
+    if monto.adjusted() >= limite.max_digits - limite.decimal_places:
+        raise ValueError(f'El monto {monto} es demasiado grande')
+    return monto
+
+
+def pagar_facturas(datos):
+    """Registra el pago de muchas facturas.
+
+    ``datos`` lleva ``ids`` o ``filtros``, ``fecha_pago`` y el monto de cada
+    factura: ``montos`` ({id: monto}) tiene prioridad sobre ``monto`` (igual
+    para todas) o ``precio_saco`` (monto = sacos x precio). Las facturas ya
+    pagadas o sin monto válido se omiten y se informan en los resultados.
+    Devuelve (cantidad pagada, resultados por factura).
+    """
+    try:
+        fecha_pago = parse_date(str(datos.get('fecha_pago') or '').strip())
+    except ValueError:
+        fecha_pago = None
+    if fecha_pago is None:
+        raise ValueError('Fecha de pago requerida (AAAA-MM-DD)')
+
+    monto = _leer_monto(datos['monto']) if datos.get('monto') not in (None, '') else None
+    precio_saco = _leer_monto(datos['precio_saco'], 'precio_saco') if datos.get('precio_saco') not in (None, '') else None
+    if monto is not None and precio_saco is not None:
+        raise ValueError('Use monto o precio_saco, no ambos')
+
+    montos = datos.get('montos') or {}
+    if not isinstance(montos, dict):
+        raise ValueError('montos debe ser un objeto {id: monto}')
+    try:
+        montos = {int(pk): valor for pk, valor in montos.items()}
+    except ValueError:
+        raise ValueError('Las claves de montos deben ser ids de facturas')
+
+    seleccion, ids = seleccionar(datos)
+
+    with transaction.atomic():
+        facturas = _bloquear(seleccion)
+        deltas = resumen.nuevos_deltas()
+        pagadas = []
+        resultados = {}
+
+        for factura in facturas:
+            resultado = {'id': factura.pk, 'numero_factura': factura.numero_factura}
+            resultados[factura.pk] = resultado
+            if factura.estado == 'pagado':
+                resultado['resultado'] = 'ya_pagada'
+                continue
+
+            try:
+                if factura.pk in montos:
+                    nuevo_monto = _leer_monto(montos[factura.pk])
+                elif precio_saco is not None:
+                    nuevo_monto = precio_saco * factura.cantidad_sacos
+                elif monto is not None:
+                    nuevo_monto = monto
+                else:
+                    raise ValueError('Falta el monto de la factura')
+                nuevo_monto = _ajustar_monto(nuevo_monto)
+            except ValueError as e:
+                resultado.update(resultado='error', error=str(e))
+                continue
+
+            resumen.acumular(deltas, factura, -1)
+            factura.monto = nuevo_monto
+            factura.estado = 'pagado'
+            factura.fecha_pago = fecha_pago
+            resumen.acumular(deltas, factura)
+            pagadas.append(factura)
+            resultado.update(resultado='pagada', monto=str(nuevo_monto))
+
+        if pagadas:
+            Factura.objects.bulk_update(pagadas, CAMPOS_PAGO, batch_size=TAMANO_LOTE)
+            resumen.aplicar(deltas)
+            # bulk_update no dispara post_save
+            enviar_despues_de_confirmar(facturas_modificadas, Factura, facturas=pagadas, accion='pagada')
+
+    return len(pagadas), _en_orden(facturas, ids, resultados)
+
+
+def _validar_cambios(cambios):
+    """Convierte los valores de {campo: valor}; ValueError con el primer problema"""
+    if not isinstance(cambios, dict):
+        raise ValueError('Los cambios deben ser un objeto {campo: valor}')
+    desconocidos = set(cambios) - set(CAMPOS_EDITABLES) - {'id'}
+    if desconocidos:
+        raise ValueError(f'Campos no editables: {", ".join(sorted(desconocidos))}')
+
+    validos = {}
+    for campo, valor in cambios.items():
+        if campo == 'id':
+            continue
+        if campo == 'cantidad_sacos':
+            try:
+                valor = int(valor)
+            except (TypeError, ValueError):
+                raise ValueError('La cantidad de sacos debe ser un número válido')
+            if valor <= 0:
+                raise ValueError('La cantidad de sacos debe ser mayor a 0')
+        elif campo == 'representante_id':
+            try:
+                valor = int(valor)
+            except (TypeError, ValueError):
+                raise ValueError('Representante no válido')
+        elif campo == 'fecha':
+            try:
+                fecha = parse_date(str(valor or '').strip())
+            except ValueError:
+                fecha = None
+            if fecha is None:
+                raise ValueError(f'Fecha no válida: {valor}')
+            valor = fecha
+        else:
+            valor = str(valor if valor is not None else '').strip()
+            if not valor:
+                raise ValueError(f'El campo {campo} está vacío')
+            limite = Factura._meta.get_field(campo).max_length
+            if len(valor) > limite:
+                raise ValueError(f'El campo {campo} supera {limite} caracteres')
+        validos[campo] = valor
+    return validos
+
+
+def _leer_cambios_por_factura(lista):
+    """Ids en el orden recibido, {id: cambios} y {id: error} de la lista 'facturas'"""
+    if not isinstance(lista, list) or not lista:
+        raise ValueError('facturas debe ser una lista de objetos con id')
+    ids, individuales, errores = [], {}, {}
+    for cambio in lista:
+        if not isinstance(cambio, dict) or 'id' not in cambio:
+            raise ValueError('Cada elemento de facturas debe tener un id')
+        try:
+            pk = int(cambio['id'])
+        except (TypeError, ValueError):
+            raise ValueError('Los ids deben ser números enteros')
+        ids.append(pk)
+        try:
+            individuales[pk] = _validar_cambios(cambio)
+        except ValueError as e:
+            errores[pk] = str(e)
+    return ids, individuales, errores
+
+
+def _conflictos_de_numero(individuales):
+    """{id: mensaje} de los números de factura nuevos que quedarían repetidos"""
+    nuevos = {pk: cambios['numero_factura'] for pk, cambios in individuales.items() if 'numero_factura' in cambios}
+    if not nuevos:
+        return {}
+
+    repetidos = {numero for numero, cuenta in Counter(nuevos.values()).items() if cuenta > 1}
+    ocupados = dict(
+        Factura.objects.filter(numero_factura__in=set(nuevos.values())).values_list('numero_factura', 'pk')
+    )
+    conflictos = {}
+    for pk, numero in nuevos.items():
+        if numero in repetidos:
+            conflictos[pk] = f'El número {numero} se repite en el lote'
+        elif ocupados.get(numero, pk) != pk:
+            # También cubre los intercambios entre facturas del lote, que la
+            # restricción única rechazaría fila por fila
+            conflictos[pk] = f'El número {numero} ya pertenece a la factura {ocupados[numero]}'
+    return conflictos
+
+
+def editar_facturas(datos):
+    """Cambia campos de muchas facturas.
+
+    ``cambios`` ({campo: valor}) se aplica a las facturas de ``ids`` o
+    ``filtros`` con un solo UPDATE. ``facturas`` ([{id, campo: valor}]) da
+    valores distintos por factura, se combina con ``cambios`` y se guarda
+    con bulk_update; en ese caso las facturas son las de la lista. El número
+    de factura solo se cambia por factura y los que quedarían repetidos se
+    informan como conflicto. Devuelve (cantidad actualizada, resultados).
+    """
+    comunes = _validar_cambios(datos.get('cambios') or {})
+    if 'numero_factura' in comunes:
+        raise ValueError('El número de factura es único: cámbielo factura por factura en "facturas"')
+
+    individuales, errores = {}, {}
+    if datos.get('facturas') is not None:
+        ids, individuales, errores = _leer_cambios_por_factura(datos['facturas'])
+        datos = dict(datos, ids=ids)
+    if not comunes and not individuales:
+        raise ValueError('No hay cambios para aplicar')
+
+    representantes = {
+        cambios['representante_id'] for cambios in [comunes, *individuales.values()] if 'representante_id' in cambios
+    }
+    existentes = set(Representante.objects.filter(pk__in=representantes).values_list('pk', flat=True))
+    if 'representante_id' in comunes and comunes['representante_id'] not in existentes:
+        raise ValueError('Representante no encontrado')
+
+    seleccion, ids = seleccionar(datos)
+
+    with transaction.atomic():
+        facturas = _bloquear(seleccion)
+        conflictos = _conflictos_de_numero(individuales)
+        deltas = resumen.nuevos_deltas()
+        modificadas = []
+        campos = set()
+        resultados = {}
+
+        for factura in facturas:
+            resultado = {'id': factura.pk, 'numero_factura': factura.numero_factura}
+            resultados[factura.pk] = resultado
+            if factura.pk in errores:
+                resultado.update(resultado='error', error=errores[factura.pk])
+                continue
+            if factura.pk in conflictos:
+                resultado.update(resultado='conflicto', error=conflictos[factura.pk])
+                continue
+
+            cambios = {
+                campo: valor for campo, valor in {**comunes, **individuales.get(factura.pk, {})}.items()
+                if getattr(factura, campo) != valor
+            }
+            if 'representante_id' in cambios and cambios['representante_id'] not in existentes:
+                resultado.update(resultado='error', error='Representante no encontrado')
+                continue
+            if not cambios:
+                resultado['resultado'] = 'sin_cambios'
+                continue
+
+            resumen.acumular(deltas, factura, -1)
+            for campo, valor in cambios.items():
+                setattr(factura, campo, valor)
+            resumen.acumular(deltas, factura)
+            modificadas.append(factura)
+            campos.update(cambios)
+            resultado.update(resultado='actualizada', campos=sorted(cambios))
+
+        if modificadas:
+            if individuales:
+                Factura.objects.bulk_update(modificadas, sorted(campos), batch_size=TAMANO_LOTE)
+            else:
+                # Los mismos valores para todas: un solo UPDATE
+                Factura.objects.filter(pk__in=[factura.pk for factura in modificadas]).update(**comunes)
+            resumen.aplicar(deltas)
+            enviar_despues_de_confirmar(facturas_modificadas, Factura, facturas=modificadas, accion='modificada')
+
+    return len(modificadas), _en_orden(facturas, ids, resultados)
+
+
+def eliminar_facturas(datos):
+    """Elimina las facturas de ``ids`` o ``filtros`` con un solo DELETE.
+
+    Devuelve (cantidad eliminada, resultados por factura).
+    """
+    seleccion, ids = seleccionar(datos)
+
+    with transaction.atomic():
+        facturas = _bloquear(seleccion)
+        eliminadas = 0
+        if facturas:
+            deltas = resumen.nuevos_deltas()
+            for factura in facturas:
+                resumen.acumular(deltas, factura, -1)
+            with envio_agrupado():
+                eliminadas = Factura.objects.filter(pk__in=[factura.pk for factura in facturas]).delete()[0]
+            resumen.aplicar(deltas)
+            enviar_despues_de_confirmar(facturas_modificadas, Factura, facturas=facturas, accion='eliminada')
+
+    resultados = {
+        factura.pk: {'id': factura.pk, 'numero_factura': factura.numero_factura, 'resultado': 'eliminada'}
+        for factura in facturas
+    }
+    return eliminadas, _en_orden(facturas, ids, resultados)
@@ -0,0 +1,36 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from arrozcascara.enrutador import alias_reportes
+from arrozcascara.motores import pool
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia la base principal SQLite a la base de reportes, como haría la replicación; '
+        'sirve para probar el enrutamiento de lecturas con dos archivos SQLite'
+    )
+
+    def handle(self, *args, **options):
+        alias = alias_reportes()
+        if alias is None:
+            raise CommandError('No hay base de reportes configurada (DB_REPORTES_NOMBRE)')
+        principal, reportes = connections['default'], connections[alias]
+        if principal.vendor != 'sqlite' or reportes.vendor != 'sqlite':
+            raise CommandError('Solo para SQLite; con MySQL la réplica se mantiene con la replicación del servidor')
+        if principal.settings_dict['NAME'] == reportes.settings_dict['NAME']:
+            raise CommandError('La base de reportes es el mismo archivo que la principal')
+
+        reportes.close()
+        pool.descartar(alias)
+        principal.ensure_connection()
+        destino = sqlite3.connect(reportes.settings_dict['NAME'])
+        try:
+            principal.connection.backup(destino)
+        finally:
+            destino.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'{principal.settings_dict["NAME"]} copiada a {reportes.settings_dict["NAME"]}'
+        ))
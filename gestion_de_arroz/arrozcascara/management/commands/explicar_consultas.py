@@ -0,0 +1,123 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from arrozcascara.estadisticas import representantes_con_totales
+from arrozcascara.filtros import filtrar_facturas, totales_de_detalles, pagina_despues_de, codificar_cursor
+from arrozcascara.models import Factura, Representante
+
+# Recorridos completos deliberados, que no cuentan como error en --estricto.
+# TotalRepresentante guarda una fila por representante y el dashboard y
+# detalles sin filtros las leen todas (filtra total_facturas > 0, que no es selectivo), así que un índice no
+# evitaría leer la tabla entera
+RECORRIDOS_ESPERADOS = {
+    'dashboard: totales por representante',
+    'detalles: totales sin filtros',
+}
+
+
+def _valores_de_ejemplo():
+    """Toma valores reales de la base para que el plan sea representativo"""
+    factura = Factura.objects.order_by().values(
+        'representante', 'variedad', 'estado', 'cedula', 'fecha', 'numero_factura'
+    ).first() or {
+        'representante': 1, 'variedad': 'Puita', 'estado': 'pendiente', 'cedula': '00000000',
+        'fecha': None, 'numero_factura': '0',
+    }
+    return factura
+
+
+def consultas_de_las_vistas():
+    """Consultas que ejecutan las vistas, con un nombre para el reporte"""
+    ejemplo = _valores_de_ejemplo()
+    facturas = Factura.objects.all()
+    cursor = codificar_cursor(ejemplo) if ejemplo['fecha'] else None
+
+    consultas = [
+        ('dashboard: totales por representante', representantes_con_totales()),
+        ('representantes ordenados por nombre', Representante.objects.order_by('nombre_completo')),
+        ('detalles: totales sin filtros', totales_de_detalles({})),
+    ]
+
+    filtros_individuales = [
+        ('representante', {'representante': ejemplo['representante']}),
+        ('variedad', {'variedad': ejemplo['variedad']}),
+        ('estado', {'estado': ejemplo['estado']}),
+        ('cedula', {'cedula': ejemplo['cedula']}),
+        ('rango de fechas', {'fecha_desde': '2025-01-01', 'fecha_hasta': '2025-12-31'}),
+    ]
+    for nombre, filtros in filtros_individuales:
+        filtradas = filtrar_facturas(facturas, filtros)
+        consultas.append((f'detalles: totales por {nombre}', totales_de_detalles(filtros)))
+        consultas.append((f'facturas_api: primera página por {nombre}', pagina_despues_de(filtradas, None)[:51]))
+        if cursor:
+            consultas.append((f'facturas_api: página siguiente por {nombre}', pagina_despues_de(filtradas, cursor)[:51]))
+
+    return consultas
+
+
+def _plan_sqlite(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    pasos = [fila[-1] for fila in cursor.fetchall()]
+    # "SCAN tabla" sin "USING ... INDEX" recorre la tabla completa
+    completos = [p for p in pasos if p.startswith('SCAN ') and ' USING ' not in p]
+    ordenamientos = [p for p in pasos if 'TEMP B-TREE' in p]
+    return pasos, completos, ordenamientos
+
+
+def _plan_mysql(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    columnas = [c[0].lower() for c in cursor.description]
+    filas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+    pasos = [f"{f['table']}: type={f['type']} key={f['key']} rows={f['rows']} {f.get('extra') or ''}".strip() for f in filas]
+    completos = [p for p, f in zip(pasos, filas) if f['type'] == 'ALL']
+    ordenamientos = [p for p, f in zip(pasos, filas) if 'filesort' in (f.get('extra') or '')]
+    return pasos, completos, ordenamientos
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas de las vistas y reporta los recorridos completos de tablas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias de la base de datos a analizar')
+        parser.add_argument('--estricto', action='store_true',
+                            help='Termina con error si alguna consulta recorre una tabla completa')
+        parser.add_argument('--detalle', action='store_true', help='Muestra el plan completo de cada consulta')
+
+    def handle(self, *args, **options):
+        conexion = connections[options['database']]
+        if conexion.vendor == 'sqlite':
+            analizar = _plan_sqlite
+        elif conexion.vendor == 'mysql':
+            analizar = _plan_mysql
+        else:
+            raise CommandError(f'Motor no soportado: {conexion.vendor}')
+
+        con_recorrido_completo = []
+        with conexion.cursor() as cursor:
+            for nombre, queryset in consultas_de_las_vistas():
+                sql, params = queryset.using(options['database']).query.sql_with_params()
+                pasos, completos, ordenamientos = analizar(cursor, sql, params)
+
+                esperado = bool(completos) and nombre in RECORRIDOS_ESPERADOS
+                if esperado:
+                    estado = self.style.WARNING('recorrido completo esperado')
+                elif completos:
+                    estado = self.style.ERROR('RECORRIDO COMPLETO')
+                    con_recorrido_completo.append(nombre)
+                elif ordenamientos:
+                    estado = self.style.WARNING('ordenamiento en memoria')
+                else:
+                    estado = self.style.SUCCESS('ok')
+                self.stdout.write(f'{nombre}: {estado}')
+
+                if options['detalle'] or (completos and not esperado):
+                    for paso in pasos:
+                        self.stdout.write(f'    {paso}')
+
+        if con_recorrido_completo:
+            mensaje = f'{len(con_recorrido_completo)} consultas recorren tablas completas'
+            if options['estricto']:
+                raise CommandError(mensaje)
+            self.stdout.write(self.style.WARNING(mensaje))
+        else:
+            self.stdout.write(self.style.SUCCESS('Ninguna consulta recorre tablas completas'))
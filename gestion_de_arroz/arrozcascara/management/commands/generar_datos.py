@@ -0,0 +1,54 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from arrozcascara import datos_sinteticos
+from arrozcascara.models import Representante
+
+
+class Command(BaseCommand):
+    help = 'Genera representantes y facturas sintéticas, o un libro Excel para probar la importación'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--representantes', type=int, default=20, help='Representantes a crear')
+        parser.add_argument('--facturas', type=int, default=10000, help='Facturas a crear')
+        parser.add_argument('--semilla', type=int, default=0, help='Con la misma semilla se generan los mismos datos')
+        parser.add_argument('--anios', type=int, default=2, help='Años de cosechas hacia atrás')
+        parser.add_argument('--prefijo', default='SIN',
+                            help='Prefijo de los números de factura y cédulas de representante')
+        parser.add_argument('--excel', default=None,
+                            help='En lugar de guardar en la base escribe un libro .xlsx con --facturas filas')
+
+    def handle(self, *args, **options):
+        if options['representantes'] < 1:
+            raise CommandError('Se necesita al menos un representante')
+        if options['facturas'] < 0:
+            raise CommandError('La cantidad de facturas no puede ser negativa')
+        inicio = time.monotonic()
+
+        if options['excel']:
+            nombres = list(Representante.objects.values_list('nombre_completo', flat=True))
+            if not nombres:
+                raise CommandError('No hay representantes; genere datos primero')
+            datos_sinteticos.libro_excel(
+                Path(options['excel']), options['facturas'], nombres,
+                semilla=options['semilla'], prefijo=options['prefijo'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{options["excel"]}: {options["facturas"]} filas en {time.monotonic() - inicio:.1f} s'
+            ))
+            return
+
+        if Representante.objects.filter(cedula__startswith=f'{options["prefijo"]}-').exists():
+            raise CommandError(f'Ya hay datos con el prefijo {options["prefijo"]}; use otro --prefijo')
+        representantes, facturas = datos_sinteticos.generar(
+            representantes=options['representantes'],
+            facturas=options['facturas'],
+            semilla=options['semilla'],
+            anios=options['anios'],
+            prefijo=options['prefijo'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{representantes} representantes y {facturas} facturas en {time.monotonic() - inicio:.1f} s'
+        ))
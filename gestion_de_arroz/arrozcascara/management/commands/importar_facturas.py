@@ -0,0 +1,199 @@
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from arrozcascara.importacion import importar_facturas, validar_facturas, ErrorImportacion
+
+# Errores de ejemplo y tipos de error que se muestran por archivo
+MAX_ERRORES_MOSTRADOS = 5
+MAX_TIPOS_DE_ERROR = 10
+
+_PREFIJO_FILA = re.compile(r'^Fila \d+: ')
+_VALOR_VARIABLE = re.compile(r'"[^"]*"|\S*\d\S*')
+
+
+def _tipo_de_error(error):
+    """Mensaje sin la fila ni los valores concretos, para agrupar errores iguales"""
+    return _VALOR_VARIABLE.sub('…', _PREFIJO_FILA.sub('', error))
+
+
+def _archivos(rutas):
+    """Expande directorios a los libros .xlsx que contienen"""
+    archivos = []
+    for ruta in map(Path, rutas):
+        if ruta.is_dir():
+            archivos.extend(sorted(p for p in ruta.glob('*.xlsx') if not p.name.startswith('~$')))
+        elif ruta.is_file():
+            archivos.append(ruta)
+        else:
+            raise CommandError(f'No existe el archivo {ruta}')
+    return archivos
+
+
+def _iniciar_proceso():
+    # Cada proceso del pool abre sus propias conexiones
+    django.setup()
+
+
+def importar_archivo(ruta, modo='importar', tamano_lote=None, desde_fila=0, carpeta_reportes=None, progreso=None,
+                     variedad=None):
+    """Importa o valida un libro; devuelve un resumen que se puede enviar entre procesos"""
+    ruta = Path(ruta)
+    confirmada = {'fila': desde_fila}
+    inicio = time.monotonic()
+    resumen = {'archivo': str(ruta), 'fallo': None, 'ultima_fila': desde_fila}
+
+    def punto_control(_, ultima_fila):
+        confirmada['fila'] = ultima_fila
+
+    try:
+        if modo == 'validar':
+            carpeta = Path(carpeta_reportes) if carpeta_reportes else ruta.parent
+            resumen['reporte'] = str(carpeta / f'{ruta.stem}_validacion.csv')
+            with open(resumen['reporte'], 'w', encoding='utf-8', newline='') as reporte:
+                resultado = validar_facturas(
+                    ruta, reporte, tamano_lote=tamano_lote, progreso=progreso, variedad=variedad
+                )
+        else:
+            resultado = importar_facturas(
+                ruta, tamano_lote=tamano_lote, progreso=progreso, actualizar=modo == 'actualizar',
+                desde_fila=desde_fila, punto_control=punto_control, variedad=variedad,
+            )
+    except Exception as e:
+        resumen.update(fallo=str(e) if isinstance(e, ErrorImportacion) else f'{type(e).__name__}: {e}')
+        resultado = None
+    finally:
+        resumen['segundos'] = time.monotonic() - inicio
+        resumen['ultima_fila'] = confirmada['fila']
+        connections.close_all()
+
+    if resultado is not None:
+        resumen.update(
+            filas=resultado.filas,
+            creadas=resultado.creadas,
+            actualizadas=resultado.actualizadas,
+            sin_cambios=resultado.sin_cambios,
+            validas=resultado.validas,
+            total_errores=resultado.total_errores,
+            errores=resultado.errores[:MAX_ERRORES_MOSTRADOS],
+            tipos_de_error=Counter(map(_tipo_de_error, resultado.errores)).most_common(MAX_TIPOS_DE_ERROR),
+        )
+    return resumen
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa facturas desde uno o varios libros Excel con el mismo motor que el formulario web, '
+        'sin pasar por la subida de archivos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivos', nargs='+',
+                            help='Libros .xlsx o directorios que los contienen')
+        parser.add_argument('--modo', choices=['importar', 'actualizar', 'validar'], default='importar',
+                            help='actualizar modifica las facturas existentes; validar solo genera el reporte')
+        parser.add_argument('--procesos', type=int, default=1,
+                            help='Archivos procesados en paralelo (conviene con MySQL; SQLite admite un solo escritor)')
+        parser.add_argument('--tamano-lote', type=int, default=None,
+                            help='Filas por transacción (por defecto IMPORTACION_TAMANO_LOTE)')
+        parser.add_argument('--desde-fila', type=int, default=0,
+                            help='Continúa después de esta fila del libro (la última confirmada de una corrida anterior)')
+        parser.add_argument('--reportes', default=None,
+                            help='Directorio de los reportes de validación (por defecto junto a cada libro)')
+        parser.add_argument('--variedad', default=None,
+                            help='Variedad de las filas que no la traen, o de todas si el libro no tiene esa columna')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        archivos = _archivos(options['archivos'])
+        if not archivos:
+            raise CommandError('No se encontraron libros .xlsx')
+        if options['desde_fila'] and len(archivos) > 1:
+            raise CommandError('--desde-fila solo se puede usar con un archivo')
+
+        parametros = {
+            'modo': options['modo'],
+            'tamano_lote': options['tamano_lote'],
+            'desde_fila': options['desde_fila'],
+            'carpeta_reportes': options['reportes'],
+            'variedad': options['variedad'],
+        }
+        procesos = max(1, min(options['procesos'], len(archivos)))
+        inicio = time.monotonic()
+        resumenes = []
+
+        if procesos == 1:
+            for ruta in archivos:
+                resumen = importar_archivo(ruta, progreso=self._progreso(ruta), **parametros)
+                self._mostrar(resumen)
+                resumenes.append(resumen)
+        else:
+            # Los procesos hijos no deben heredar conexiones abiertas
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso) as pool:
+                pendientes = [pool.submit(importar_archivo, str(ruta), **parametros) for ruta in archivos]
+                for futuro in as_completed(pendientes):
+                    resumen = futuro.result()
+                    self._mostrar(resumen)
+                    resumenes.append(resumen)
+
+        self._mostrar_totales(resumenes, time.monotonic() - inicio)
+        fallidos = [resumen for resumen in resumenes if resumen['fallo']]
+        if fallidos:
+            raise CommandError(f'{len(fallidos)} de {len(resumenes)} archivos no se pudieron procesar')
+
+    def _progreso(self, ruta):
+        if self.verbosity < 2:
+            return None
+        inicio = time.monotonic()
+
+        def progreso(resultado):
+            segundos = time.monotonic() - inicio
+            velocidad = resultado.filas / segundos if segundos else 0
+            self.stdout.write(f'  {ruta.name}: {resultado.filas} filas ({velocidad:.0f} filas/s)')
+        return progreso
+
+    def _mostrar(self, resumen):
+        nombre = os.path.basename(resumen['archivo'])
+        if resumen['fallo']:
+            continuar = (
+                f' (última fila confirmada: {resumen["ultima_fila"]}, continúe con --desde-fila)'
+                if resumen['ultima_fila'] else ''
+            )
+            self.stderr.write(self.style.ERROR(f'{nombre}: {resumen["fallo"]}{continuar}'))
+            return
+
+        velocidad = resumen['filas'] / resumen['segundos'] if resumen['segundos'] else 0
+        if 'reporte' in resumen:
+            detalle = f'{resumen["validas"]} válidas, reporte en {resumen["reporte"]}'
+        else:
+            detalle = f'{resumen["creadas"]} creadas'
+            if resumen['actualizadas'] or resumen['sin_cambios']:
+                detalle += f', {resumen["actualizadas"]} actualizadas, {resumen["sin_cambios"]} sin cambios'
+        self.stdout.write(
+            f'{nombre}: {resumen["filas"]} filas, {detalle}, {resumen["total_errores"]} errores '
+            f'en {resumen["segundos"]:.1f} s ({velocidad:.0f} filas/s)'
+        )
+        if resumen['total_errores']:
+            for tipo, cantidad in resumen['tipos_de_error']:
+                self.stdout.write(f'  {cantidad} × {tipo}')
+            for error in resumen['errores']:
+                self.stdout.write(f'    {error}')
+
+    def _mostrar_totales(self, resumenes, segundos):
+        completos = [resumen for resumen in resumenes if not resumen['fallo']]
+        filas = sum(resumen['filas'] for resumen in completos)
+        creadas = sum(resumen['creadas'] for resumen in completos)
+        errores = sum(resumen['total_errores'] for resumen in completos)
+        velocidad = filas / segundos if segundos else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Total: {len(completos)} de {len(resumenes)} archivos, {filas} filas, {creadas} creadas, '
+            f'{errores} errores en {segundos:.1f} s ({velocidad:.0f} filas/s)'
+        ))
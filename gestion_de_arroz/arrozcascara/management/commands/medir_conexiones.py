@@ -0,0 +1,193 @@
+import asyncio
+import io
+import logging
+import statistics
+import sys
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from arrozcascara.motores import pool
+
+# Motores de Django y su versión con pool
+CON_POOL = {
+    'django.db.backends.mysql': 'arrozcascara.motores.mysql',
+    'django.db.backends.sqlite3': 'arrozcascara.motores.sqlite3',
+}
+SIN_POOL = {con_pool: sin_pool for sin_pool, con_pool in CON_POOL.items()}
+
+
+def _entorno_wsgi(ruta, consulta):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': ruta,
+        'QUERY_STRING': consulta,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+
+
+def _alcance_asgi(ruta, consulta):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': ruta,
+        'raw_path': ruta.encode(),
+        'query_string': consulta.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide cuántas conexiones a la base abren las peticiones con y sin reutilización '
+        '(CONN_MAX_AGE con WSGI, pool con ASGI) y cuánto tarda cada petición'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=300, help='Peticiones por modo')
+        parser.add_argument('--database', default='default', help='Alias de la base de datos')
+        parser.add_argument('--conn-max-age', type=int, default=None,
+                            help='Segundos de las conexiones persistentes (por defecto DB_CONN_MAX_AGE o 60)')
+        parser.add_argument('--tamano-pool', type=int, default=None,
+                            help='Conexiones libres del pool (por defecto DB_POOL o 4)')
+
+    def handle(self, *args, **options):
+        self.alias = options['database']
+        self.configuracion = connections.settings[self.alias]
+        motor = SIN_POOL.get(self.configuracion['ENGINE'], self.configuracion['ENGINE'])
+        if motor not in CON_POOL:
+            raise CommandError(f'Motor no soportado: {self.configuracion["ENGINE"]}')
+        conn_max_age = options['conn_max_age'] or getattr(settings, 'DB_CONN_MAX_AGE', 0) or 60
+        tamano_pool = options['tamano_pool'] or getattr(settings, 'DB_POOL', 0) or 4
+        peticiones = options['peticiones']
+
+        modos = [
+            ('WSGI sin reutilizar (CONN_MAX_AGE=0)', self._wsgi, motor, 0, None),
+            (f'WSGI persistentes (CONN_MAX_AGE={conn_max_age})', self._wsgi, motor, conn_max_age, None),
+            ('ASGI sin pool', self._asgi, motor, 0, None),
+            (f'ASGI con pool de {tamano_pool}', self._asgi, CON_POOL[motor], 0, {'tamano': tamano_pool}),
+        ]
+        original = {clave: self.configuracion[clave] for clave in ('ENGINE', 'CONN_MAX_AGE', 'OPTIONS')}
+        resultados = {}
+        # Sin los eventos de cada petición en la bitácora ni el perfilado
+        bitacora = logging.getLogger('arrozcascara')
+        nivel = bitacora.level
+        bitacora.setLevel(logging.WARNING)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], PERFILADO_MUESTREO=0):
+                for nombre, medir, engine, max_age, opciones_pool in modos:
+                    self._configurar(engine, max_age, opciones_pool)
+                    resultados[nombre] = self._medir(medir, peticiones)
+        finally:
+            bitacora.setLevel(nivel)
+            self.configuracion.update(original)
+            self._reiniciar_conexion()
+
+        ancho = max(map(len, resultados))
+        for nombre, (abiertas, tiempos) in resultados.items():
+            self.stdout.write(
+                f'{nombre:<{ancho}}  {abiertas:>5} conexiones en {peticiones} peticiones  '
+                f'{statistics.median(tiempos):.2f} ms mediana  {statistics.mean(tiempos):.2f} ms promedio'
+            )
+
+        # Con reutilización no debe abrirse más de una conexión por hilo o por lugar del pool
+        abiertas = [resultado[0] for resultado in resultados.values()]
+        if abiertas[1] > 1 or abiertas[3] > tamano_pool:
+            raise CommandError('Las conexiones no se están reutilizando')
+        self.stdout.write(self.style.SUCCESS('Las conexiones se reutilizan entre peticiones'))
+
+    def _configurar(self, engine, max_age, opciones_pool):
+        opciones = {clave: valor for clave, valor in self.configuracion['OPTIONS'].items() if clave != 'pool'}
+        if opciones_pool:
+            opciones['pool'] = opciones_pool
+        self.configuracion.update(ENGINE=engine, CONN_MAX_AGE=max_age, OPTIONS=opciones)
+        self._reiniciar_conexion()
+
+    def _reiniciar_conexion(self):
+        # La próxima vez que se use el alias se crea otro DatabaseWrapper con el motor configurado
+        connections[self.alias].close()
+        del connections[self.alias]
+        pool.descartar(self.alias)
+
+    def _medir(self, medir, peticiones):
+        """(conexiones físicas abiertas, milisegundos por petición)"""
+        abiertas = {}
+
+        def registrar(sender, connection, **kwargs):
+            if connection.alias == self.alias:
+                # Se conserva la conexión para que su id no se repita
+                abiertas[id(connection.connection)] = connection.connection
+
+        connection_created.connect(registrar, weak=False)
+        try:
+            tiempos = medir(peticiones, reverse('facturas_api'), 'page_size=1')
+        finally:
+            connection_created.disconnect(registrar)
+        return len(abiertas), tiempos
+
+    def _wsgi(self, peticiones, ruta, consulta):
+        # Como un servidor WSGI con hilos: las peticiones llegan siempre al mismo hilo
+        handler = WSGIHandler()
+        tiempos = []
+
+        def start_response(estado, encabezados):
+            if not estado.startswith('200'):
+                raise CommandError(f'{ruta}: {estado}')
+
+        for _ in range(peticiones):
+            inicio = time.perf_counter()
+            response = handler(_entorno_wsgi(ruta, consulta), start_response)
+            b''.join(response)
+            # Envía request_finished, que cierra las conexiones que no se reutilizan
+            response.close()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos
+
+    def _asgi(self, peticiones, ruta, consulta):
+        return asyncio.run(self._asgi_async(peticiones, ruta, consulta))
+
+    async def _asgi_async(self, peticiones, ruta, consulta):
+        handler = ASGIHandler()
+        tiempos = []
+        for _ in range(peticiones):
+            recibidos = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            terminada = asyncio.Event()
+
+            async def receive():
+                if recibidos:
+                    return recibidos.pop()
+                # El cliente no se desconecta antes de recibir la respuesta
+                await terminada.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(mensaje):
+                if mensaje['type'] == 'http.response.start' and mensaje['status'] != 200:
+                    raise CommandError(f'{ruta}: {mensaje["status"]}')
+                if mensaje['type'] == 'http.response.body' and not mensaje.get('more_body'):
+                    terminada.set()
+
+            inicio = time.perf_counter()
+            await handler(_alcance_asgi(ruta, consulta), receive, send)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos
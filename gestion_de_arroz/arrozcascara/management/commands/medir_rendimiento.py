@@ -0,0 +1,292 @@
+import json
+import statistics
+import tempfile
+import time
+from itertools import combinations
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from arrozcascara import datos_sinteticos
+from arrozcascara.models import Factura, Importacion, Representante
+
+LINEA_BASE = Path(settings.BASE_DIR) / 'benchmarks' / 'linea_base.json'
+
+# Los milisegundos dependen de la máquina, así que solo las consultas hacen
+# fallar la comparación. Los tiempos solo se informan: cada vista se compara con
+# la mediana de las demás en la misma corrida y se avisa si pasa de este factor
+AVISO_RELATIVO = 1.5
+
+# Espera máxima por cada importación de Excel
+ESPERA_IMPORTACION = 1800
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def _consumir(response):
+    # Las exportaciones se generan mientras se leen
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _combinaciones_de_filtros(ejemplo):
+    """Todas las combinaciones de los filtros de detalles; las dos fechas van juntas"""
+    valores = {
+        'representante': {'representante': ejemplo['representante']},
+        'variedad': {'variedad': ejemplo['variedad']},
+        'fechas': {'fecha_desde': ejemplo['fecha'].replace(month=1, day=1).isoformat(),
+                   'fecha_hasta': ejemplo['fecha'].replace(month=12, day=31).isoformat()},
+        'estado': {'estado': ejemplo['estado']},
+        'cedula': {'cedula': ejemplo['cedula']},
+    }
+    for cantidad in range(len(valores) + 1):
+        for nombres in combinations(valores, cantidad):
+            parametros = {}
+            for nombre in nombres:
+                parametros.update(valores[nombre])
+            yield '+'.join(nombres) or 'sin filtros', parametros
+
+
+def casos_de_lectura():
+    """(nombre, url, parámetros) de las vistas de consulta, con valores reales de la base"""
+    ejemplo = Factura.objects.order_by('-fecha').values(
+        'id', 'representante', 'variedad', 'fecha', 'estado', 'cedula'
+    ).first()
+    if ejemplo is None:
+        raise CommandError('No hay facturas para medir')
+
+    casos = [
+        ('dashboard', reverse('dashboard'), {}),
+        ('estadisticas_json', reverse('estadisticas_json'), {}),
+        ('facturas_api', reverse('facturas_api'), {}),
+        ('facturas_api[representante]', reverse('facturas_api'), {'representante': ejemplo['representante']}),
+        ('obtener_factura', reverse('obtener_factura', args=[ejemplo['id']]), {}),
+        ('get_representante', reverse('get_representante', args=[ejemplo['representante']]), {}),
+        ('exportar_facturas[representante]', reverse('exportar_facturas'), {'representante': ejemplo['representante']}),
+    ]
+    for nombre, parametros in _combinaciones_de_filtros(ejemplo):
+        casos.append((f'detalles[{nombre}]', reverse('detalles'), parametros))
+    return casos
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el tiempo y las consultas de las vistas con datos sintéticos y compara con la línea base; '
+        'termina con error si alguna vista hace más consultas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--representantes', type=int, default=50, help='Representantes de los datos sintéticos')
+        parser.add_argument('--facturas', type=int, default=50000, help='Facturas de los datos sintéticos')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Mediciones por vista, después de una de calentamiento')
+        parser.add_argument('--filas-excel', type=int, nargs='*', default=[1000, 10000, 100000],
+                            help='Tamaños de los libros que se suben a registrar-factura (ninguno para omitirlos)')
+        parser.add_argument('--solo', default=None, help='Solo mide los casos cuyo nombre contiene este texto')
+        parser.add_argument('--con-cache', action='store_true',
+                            help='No vacía la caché antes de cada medición (mide las respuestas ya calculadas)')
+        parser.add_argument('--base-actual', action='store_true',
+                            help='Mide con los datos de la base configurada en lugar de una base de prueba '
+                                 '(no sube libros Excel)')
+        parser.add_argument('--linea-base', default=str(LINEA_BASE), help='Archivo JSON con la línea base')
+        parser.add_argument('--guardar-linea-base', action='store_true',
+                            help='Guarda estas mediciones como la nueva línea base')
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['repeticiones'] < 1:
+            raise CommandError('Se necesita al menos una repetición')
+
+        # Las mediciones no deben incluir el perfilado por muestreo
+        with override_settings(PERFILADO_MUESTREO=0, ALLOWED_HOSTS=['testserver']):
+            if options['base_actual']:
+                resultados = self._medir_lecturas()
+            else:
+                resultados = self._medir_en_base_de_prueba()
+
+        self._mostrar(resultados)
+        if options['guardar_linea_base']:
+            self._guardar(resultados)
+            return
+        self._comparar(resultados)
+
+    def _medir_en_base_de_prueba(self):
+        """Crea una base vacía, genera los datos, mide y la destruye"""
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as temporal:
+            if connection.vendor == 'sqlite':
+                # En un archivo y no en memoria, para que el trabajador de la
+                # importación pueda leer y escribir mientras se consulta el estado
+                connection.settings_dict['TEST']['NAME'] = str(Path(temporal) / 'rendimiento.sqlite3')
+            nombre_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                # Todas las lecturas van a la base de prueba, aunque haya base de reportes
+                with override_settings(MEDIA_ROOT=temporal, REPORTES_BASE_DE_DATOS=None):
+                    inicio = time.monotonic()
+                    datos_sinteticos.generar(
+                        representantes=self.options['representantes'], facturas=self.options['facturas']
+                    )
+                    self.stdout.write(
+                        f'Datos: {self.options["representantes"]} representantes, '
+                        f'{self.options["facturas"]} facturas en {time.monotonic() - inicio:.1f} s'
+                    )
+                    resultados = self._medir_lecturas()
+                    resultados.update(self._medir_importaciones(Path(temporal)))
+            finally:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+                teardown_test_environment()
+        return resultados
+
+    def _seleccionado(self, nombre):
+        return not self.options['solo'] or self.options['solo'] in nombre
+
+    def _medir_lecturas(self):
+        client = Client()
+        resultados = {}
+        for nombre, url, parametros in casos_de_lectura():
+            if not self._seleccionado(nombre):
+                continue
+            tiempos = []
+            consultas = 0
+            # La primera petición calienta plantillas y conexiones y no se cuenta
+            for repeticion in range(self.options['repeticiones'] + 1):
+                if not self.options['con_cache']:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    response = _consumir(client.get(url, parametros))
+                    segundos = time.perf_counter() - inicio
+                if response.status_code != 200:
+                    raise CommandError(f'{nombre}: respuesta {response.status_code}')
+                if repeticion:
+                    tiempos.append(segundos * 1000)
+                    consultas = max(consultas, len(capturadas))
+            resultados[nombre] = {
+                'mediana_ms': round(statistics.median(tiempos), 1),
+                'p90_ms': round(_percentil(tiempos, 90), 1),
+                'consultas': consultas,
+            }
+        return resultados
+
+    def _medir_importaciones(self, carpeta):
+        """Sube cada libro como el formulario y espera a que termine la importación"""
+        client = Client()
+        nombres = list(Representante.objects.values_list('nombre_completo', flat=True))
+        resultados = {}
+        for filas in self.options['filas_excel'] or []:
+            nombre = f'registrar_factura[excel {filas} filas]'
+            if not self._seleccionado(nombre):
+                continue
+            ruta = carpeta / f'facturas_{filas}.xlsx'
+            datos_sinteticos.libro_excel(ruta, filas, nombres, semilla=filas, prefijo=f'X{filas}-')
+
+            with open(ruta, 'rb') as archivo, CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                response = client.post(reverse('registrar_factura'), {'form_type': 'excel', 'excel-file': archivo})
+            if response.status_code != 202:
+                raise CommandError(f'{nombre}: respuesta {response.status_code} {response.content[:200]!r}')
+
+            importacion = self._esperar(response.json()['importacion_id'])
+            segundos = time.perf_counter() - inicio
+            if importacion.estado != 'completado' or importacion.facturas_creadas != filas:
+                raise CommandError(
+                    f'{nombre}: {importacion.estado}, {importacion.facturas_creadas} creadas, '
+                    f'{importacion.total_errores} errores {importacion.mensaje}'
+                )
+            # Una sola medición: cada subida crea facturas nuevas
+            resultados[nombre] = {
+                'mediana_ms': round(segundos * 1000, 1),
+                'p90_ms': round(segundos * 1000, 1),
+                'consultas': len(capturadas),
+                'filas_por_segundo': round(filas / segundos),
+            }
+        return resultados
+
+    def _esperar(self, importacion_id):
+        limite = time.monotonic() + ESPERA_IMPORTACION
+        while time.monotonic() < limite:
+            importacion = Importacion.objects.get(pk=importacion_id)
+            if importacion.estado in ('completado', 'fallido'):
+                return importacion
+            time.sleep(0.05)
+        raise CommandError(f'La importación {importacion_id} no terminó en {ESPERA_IMPORTACION} s')
+
+    def _mostrar(self, resultados):
+        ancho = max(map(len, resultados), default=0)
+        for nombre, medicion in resultados.items():
+            extra = f'  {medicion["filas_por_segundo"]} filas/s' if 'filas_por_segundo' in medicion else ''
+            self.stdout.write(
+                f'{nombre:<{ancho}}  {medicion["mediana_ms"]:>9.1f} ms  p90 {medicion["p90_ms"]:>9.1f} ms  '
+                f'{medicion["consultas"]:>3} consultas{extra}'
+            )
+
+    def _guardar(self, resultados):
+        ruta = Path(self.options['linea_base'])
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        contenido = {
+            'parametros': {
+                'representantes': self.options['representantes'],
+                'facturas': self.options['facturas'],
+                'base_actual': self.options['base_actual'],
+                'motor': connection.vendor,
+            },
+            'vistas': resultados,
+        }
+        ruta.write_text(json.dumps(contenido, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {ruta}'))
+
+    def _comparar(self, resultados):
+        ruta = Path(self.options['linea_base'])
+        if not ruta.exists():
+            self.stdout.write(self.style.WARNING(f'No hay línea base en {ruta}; use --guardar-linea-base'))
+            return
+        linea_base = json.loads(ruta.read_text(encoding='utf-8'))
+        parametros = linea_base.get('parametros', {})
+        if (parametros.get('facturas'), parametros.get('base_actual', False)) != (
+                self.options['facturas'], self.options['base_actual']):
+            self.stdout.write(self.style.WARNING('La línea base se midió con otros datos; la comparación es aproximada'))
+
+        regresiones = []
+        escala = self._escala(resultados, linea_base['vistas'])
+        for nombre, medicion in resultados.items():
+            anterior = linea_base['vistas'].get(nombre)
+            if anterior is None:
+                continue
+            if medicion['consultas'] > anterior['consultas']:
+                regresiones.append(f'{nombre}: {medicion["consultas"]} consultas (antes {anterior["consultas"]})')
+            if escala and anterior['mediana_ms']:
+                relativo = medicion['mediana_ms'] / (anterior['mediana_ms'] * escala)
+                if relativo > AVISO_RELATIVO:
+                    self.stdout.write(self.style.WARNING(
+                        f'{nombre}: {relativo:.1f} veces más lenta que el resto de las vistas respecto a la '
+                        f'línea base ({medicion["mediana_ms"]} ms, antes {anterior["mediana_ms"]} ms)'
+                    ))
+
+        if regresiones:
+            for regresion in regresiones:
+                self.stderr.write(self.style.ERROR(regresion))
+            raise CommandError(f'{len(regresiones)} regresiones respecto a la línea base')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones respecto a la línea base'))
+
+    def _escala(self, resultados, vistas):
+        """Cuánto más lenta es esta corrida que la línea base: la mediana de los cocientes de todas las vistas"""
+        cocientes = [
+            medicion['mediana_ms'] / vistas[nombre]['mediana_ms']
+            for nombre, medicion in resultados.items()
+            if vistas.get(nombre, {}).get('mediana_ms')
+        ]
+        if len(cocientes) < 3:
+            self.stdout.write('Muy pocas vistas en común con la línea base; los tiempos no se comparan')
+            return None
+        return statistics.median(cocientes)
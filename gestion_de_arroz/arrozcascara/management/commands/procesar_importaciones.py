@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from arrozcascara.models import Importacion
+from arrozcascara.tareas import procesar_importacion, reanudar_importacion
+
+
+class Command(BaseCommand):
+    help = 'Procesa las importaciones de Excel que quedaron pendientes (por ejemplo tras reiniciar el servidor)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reanudar', action='store_true',
+                            help='También continúa desde su punto de control las importaciones fallidas o que '
+                                 'quedaron en proceso por una caída (usar sin trabajadores en ejecución)')
+
+    def handle(self, *args, **options):
+        if options['reanudar']:
+            interrumpidas = Importacion.objects.filter(
+                estado__in=['procesando', 'fallido'], ultima_fila__gt=0
+            ).exclude(modo='validar').values_list('pk', flat=True)
+            for importacion_id in interrumpidas:
+                reanudar_importacion(importacion_id, estados=('procesando', 'fallido'), encolar=False)
+
+        pendientes = list(Importacion.objects.filter(estado='pendiente').order_by('fecha_creacion').values_list('pk', flat=True))
+        if not pendientes:
+            self.stdout.write('No hay importaciones pendientes')
+            return
+
+        for importacion_id in pendientes:
+            if not procesar_importacion(importacion_id):
+                continue
+            importacion = Importacion.objects.get(pk=importacion_id)
+            self.stdout.write(
+                f'{importacion.nombre_archivo}: {importacion.estado} - '
+                f'{importacion.facturas_creadas} creadas, {importacion.total_errores} errores, '
+                f'{importacion.filas_por_segundo} filas/s'
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from arrozcascara import resumen
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye las tablas ResumenSacos y TotalRepresentante desde las facturas y verifica que coincidan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo compara el resumen con las facturas, sin modificarlo')
+
+    def handle(self, *args, **options):
+        if not options['verificar']:
+            creados = resumen.reconstruir()
+            self.stdout.write(f'Resumen reconstruido: {creados} filas')
+
+        diferencias = resumen.diferencias()
+        if diferencias:
+            for clave, esperado, actual in diferencias[:20]:
+                self.stdout.write(f'  {clave}: esperado {esperado}, actual {actual}')
+            raise CommandError(f'{len(diferencias)} claves del resumen no coinciden con las facturas')
+
+        self.stdout.write(self.style.SUCCESS('El resumen coincide con las facturas'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arrozcascara', '0003_importacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['-fecha', 'numero_factura'], name='factura_fecha_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['representante', '-fecha', 'numero_factura'], name='factura_rep_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['variedad', '-fecha', 'numero_factura'], name='factura_variedad_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['estado', '-fecha', 'numero_factura'], name='factura_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['cedula', '-fecha', 'numero_factura'], name='factura_cedula_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['representante', 'cantidad_sacos'], name='factura_rep_sacos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='representante',
+            index=models.Index(fields=['nombre_completo'], name='representante_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def llenar_resumen(apps, schema_editor):
+    """Calcula el resumen de las facturas que ya existen"""
+    Factura = apps.get_model('arrozcascara', 'Factura')
+    ResumenSacos = apps.get_model('arrozcascara', 'ResumenSacos')
+    filas = Factura.objects.order_by().values('representante_id', 'fecha', 'variedad', 'estado').annotate(
+        total_sacos=Sum('cantidad_sacos'),
+        total_facturas=Count('id'),
+        monto_total=Sum('monto'),
+    )
+    ResumenSacos.objects.bulk_create((ResumenSacos(**fila) for fila in filas.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arrozcascara', '0004_indices_consultas_factura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenSacos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('variedad', models.CharField(max_length=50)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('pagado', 'Pagado')], max_length=20)),
+                ('total_sacos', models.BigIntegerField(default=0)),
+                ('total_facturas', models.IntegerField(default=0)),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('representante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='arrozcascara.representante')),
+            ],
+            options={
+                'verbose_name': 'Resumen de sacos',
+                'verbose_name_plural': 'Resúmenes de sacos',
+                'constraints': [models.UniqueConstraint(fields=('representante', 'fecha', 'variedad', 'estado'), name='resumen_sacos_clave_unica')],
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
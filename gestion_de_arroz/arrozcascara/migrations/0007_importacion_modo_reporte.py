@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arrozcascara', '0006_versiondatos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacion',
+            name='modo',
+            field=models.CharField(choices=[('importar', 'Importar'), ('validar', 'Solo validar')], default='importar', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='importacion',
+            name='reporte',
+            field=models.FileField(blank=True, upload_to='importaciones/reportes/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arrozcascara', '0007_importacion_modo_reporte'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importacion',
+            name='modo',
+            field=models.CharField(choices=[('importar', 'Importar'), ('actualizar', 'Importar y actualizar existentes'), ('validar', 'Solo validar')], default='importar', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arrozcascara', '0008_importacion_modo_actualizar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacion',
+            name='hash_archivo',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='importacion',
+            name='ultima_fila',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def llenar_totales(apps, schema_editor):
+    """Calcula los totales de las facturas que ya existen"""
+    Factura = apps.get_model('arrozcascara', 'Factura')
+    TotalRepresentante = apps.get_model('arrozcascara', 'TotalRepresentante')
+    filas = Factura.objects.order_by().values('representante_id').annotate(
+        total_sacos=Sum('cantidad_sacos'),
+        total_facturas=Count('id'),
+        monto_total=Sum('monto'),
+    )
+    TotalRepresentante.objects.bulk_create((TotalRepresentante(**fila) for fila in filas.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arrozcascara', '0009_importacion_punto_control'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TotalRepresentante',
+            fields=[
+                ('representante', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='total', serialize=False, to='arrozcascara.representante')),
+                ('total_sacos', models.BigIntegerField(default=0)),
+                ('total_facturas', models.IntegerField(default=0)),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Total por representante',
+                'verbose_name_plural': 'Totales por representante',
+            },
+        ),
+        migrations.RunPython(llenar_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arrozcascara', '0010_totalrepresentante'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacion',
+            name='facturas_actualizadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importacion',
+            name='facturas_sin_cambios',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
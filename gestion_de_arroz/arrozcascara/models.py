@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Representante(models.Model):
     cedula = models.CharField(max_length=20, unique=True)
@@ -13,6 +14,12 @@ class Representante(models.Model):
         """Propiedad para mantener compatibilidad con código existente"""
         return self.nombre_completo
 
+    class Meta:
+        indexes = [
+            # Listados y agrupaciones ordenadas por nombre
+            models.Index(fields=['nombre_completo'], name='representante_nombre_idx'),
+        ]
+
 
 class Factura(models.Model):
     ESTADO_CHOICES = [
@@ -38,4 +45,126 @@ class Factura(models.Model):
     class Meta:
         verbose_name = "Factura"
         verbose_name_plural = "Facturas"
-        ordering = ['-fecha', 'numero_factura']
\ No newline at end of file
+        ordering = ['-fecha', 'numero_factura']
+        indexes = [
+            # Orden por defecto y paginación por cursor de facturas_api
+            models.Index(fields=['-fecha', 'numero_factura'], name='factura_fecha_numero_idx'),
+            # Filtro por representante con el mismo orden (grupos de detalles)
+            models.Index(fields=['representante', '-fecha', 'numero_factura'], name='factura_rep_fecha_idx'),
+            models.Index(fields=['variedad', '-fecha', 'numero_factura'], name='factura_variedad_fecha_idx'),
+            models.Index(fields=['estado', '-fecha', 'numero_factura'], name='factura_estado_fecha_idx'),
+            models.Index(fields=['cedula', '-fecha', 'numero_factura'], name='factura_cedula_fecha_idx'),
+            # Índice de cobertura para los totales de sacos por representante
+            models.Index(fields=['representante', 'cantidad_sacos'], name='factura_rep_sacos_idx'),
+        ]
+
+class Importacion(models.Model):
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    MODO_CHOICES = [
+        ('importar', 'Importar'),
+        ('actualizar', 'Importar y actualizar existentes'),
+        ('validar', 'Solo validar'),
+    ]
+
+    # Cantidad máxima de mensajes de error que se guardan por importación
+    MAX_ERRORES = 500
+
+    archivo = models.FileField(upload_to='importaciones/')
+    nombre_archivo = models.CharField(max_length=255)
+    modo = models.CharField(max_length=20, choices=MODO_CHOICES, default='importar')
+    # Reporte CSV fila por fila de una validación
+    reporte = models.FileField(upload_to='importaciones/reportes/', blank=True)
+    # Punto de control: un archivo con el mismo hash continúa después de la
+    # última fila cuyo lote quedó confirmado
+    hash_archivo = models.CharField(max_length=64, blank=True, db_index=True)
+    ultima_fila = models.PositiveIntegerField(default=0)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    facturas_creadas = models.PositiveIntegerField(default=0)
+    facturas_actualizadas = models.PositiveIntegerField(default=0)
+    facturas_sin_cambios = models.PositiveIntegerField(default=0)
+    # Todos los errores, aunque en errores se guarden solo los primeros MAX_ERRORES
+    total_errores = models.PositiveIntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True)
+    mensaje = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.nombre_archivo} ({self.estado})"
+
+    @property
+    def filas_por_segundo(self):
+        """Velocidad de procesamiento desde que inició la importación"""
+        if not self.fecha_inicio:
+            return 0
+        fin = self.fecha_fin or timezone.now()
+        segundos = (fin - self.fecha_inicio).total_seconds()
+        return round(self.filas_procesadas / segundos, 1) if segundos > 0 else 0
+
+    class Meta:
+        verbose_name = "Importación"
+        verbose_name_plural = "Importaciones"
+        ordering = ['-fecha_creacion']
+
+
+class ResumenSacos(models.Model):
+    """Totales precalculados por representante, día, variedad y estado"""
+    representante = models.ForeignKey(Representante, on_delete=models.CASCADE, related_name='resumenes')
+    fecha = models.DateField()
+    variedad = models.CharField(max_length=50)
+    estado = models.CharField(max_length=20, choices=Factura.ESTADO_CHOICES)
+    total_sacos = models.BigIntegerField(default=0)
+    total_facturas = models.IntegerField(default=0)
+    monto_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.representante_id} {self.fecha} {self.variedad} {self.estado}: {self.total_sacos} sacos"
+
+    class Meta:
+        verbose_name = "Resumen de sacos"
+        verbose_name_plural = "Resúmenes de sacos"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['representante', 'fecha', 'variedad', 'estado'],
+                name='resumen_sacos_clave_unica'
+            ),
+        ]
+
+
+class TotalRepresentante(models.Model):
+    """Totales de todas las facturas de un representante, con los mismos deltas que ResumenSacos"""
+    representante = models.OneToOneField(
+        Representante, on_delete=models.CASCADE, primary_key=True, related_name='total'
+    )
+    total_sacos = models.BigIntegerField(default=0)
+    total_facturas = models.IntegerField(default=0)
+    monto_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.representante_id}: {self.total_sacos} sacos"
+
+    class Meta:
+        verbose_name = "Total por representante"
+        verbose_name_plural = "Totales por representante"
+
+
+class VersionDatos(models.Model):
+    """Contador que aumenta con cada escritura de facturas o representantes"""
+    nombre = models.CharField(max_length=50, unique=True)
+    valor = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
+    class Meta:
+        verbose_name = "Versión de datos"
+        verbose_name_plural = "Versiones de datos"
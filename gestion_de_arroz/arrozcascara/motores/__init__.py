@@ -0,0 +1 @@
+"""Motores de base de datos de Django con pool de conexiones (ver pool.py)."""
@@ -0,0 +1,8 @@
+"""MySQL con pool de conexiones: ENGINE = 'arrozcascara.motores.mysql'."""
+from django.db.backends.mysql import base
+
+from ..pool import ConPool
+
+
+class DatabaseWrapper(ConPool, base.DatabaseWrapper):
+    pass
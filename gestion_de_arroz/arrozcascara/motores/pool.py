@@ -0,0 +1,141 @@
+"""Pool de conexiones para los motores de base de datos bajo ASGI.
+
+Con ASGI cada petición corre su código síncrono en un hilo propio, así que
+las conexiones persistentes de Django (CONN_MAX_AGE), que son por hilo, no se
+reutilizan entre peticiones: cada una abre una conexión nueva. Con estos
+motores, al cerrar la conexión al final de la petición se devuelve a un pool
+del proceso y la siguiente petición la toma de ahí.
+
+Se configura en OPTIONS::
+
+    'OPTIONS': {'pool': {'tamano': 4, 'vida_maxima': 300}}
+
+``tamano`` es la cantidad de conexiones libres que se conservan y
+``vida_maxima`` los segundos que se reutiliza cada una. Se usa con
+CONN_MAX_AGE = 0; con CONN_HEALTH_CHECKS se comprueba cada conexión antes de
+entregarla.
+"""
+import queue
+import threading
+import time
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class Pool:
+    """Conexiones libres de un alias; la última devuelta es la primera que se entrega"""
+
+    def __init__(self, tamano=4, vida_maxima=300):
+        self.tamano = tamano
+        self.vida_maxima = vida_maxima
+        self._libres = queue.LifoQueue()
+        self.creadas = 0
+        self.reutilizadas = 0
+
+    def tomar(self, verificar):
+        """(conexión, momento en que se creó) de una conexión libre que funcione, o (None, None)"""
+        while True:
+            try:
+                conexion, creada = self._libres.get_nowait()
+            except queue.Empty:
+                return None, None
+            if time.monotonic() - creada < self.vida_maxima and (not verificar or _funciona(conexion)):
+                self.reutilizadas += 1
+                return conexion, creada
+            _cerrar(conexion)
+
+    def devolver(self, conexion, creada):
+        """Guarda la conexión si hay lugar; devuelve False si hay que cerrarla"""
+        if self._libres.qsize() >= self.tamano or time.monotonic() - creada >= self.vida_maxima:
+            return False
+        self._libres.put((conexion, creada))
+        return True
+
+    def vaciar(self):
+        while True:
+            try:
+                conexion, _ = self._libres.get_nowait()
+            except queue.Empty:
+                return
+            _cerrar(conexion)
+
+
+def _funciona(conexion):
+    try:
+        cursor = conexion.cursor()
+        try:
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        return True
+    except Exception:
+        _cerrar(conexion)
+        return False
+
+
+def _cerrar(conexion):
+    try:
+        conexion.close()
+    except Exception:
+        pass
+
+
+def pool_de(alias, opciones):
+    with _lock:
+        if alias not in _pools:
+            _pools[alias] = Pool(**opciones)
+        return _pools[alias]
+
+
+def descartar(alias):
+    """Cierra las conexiones libres del alias; el próximo uso crea otro pool con la configuración vigente"""
+    with _lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None:
+        pool.vaciar()
+
+
+class ConPool:
+    """Se combina con el DatabaseWrapper de un motor de Django"""
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # No es un parámetro del conector
+        params.pop('pool', None)
+        return params
+
+    @property
+    def pool(self):
+        opciones = self.settings_dict['OPTIONS'].get('pool')
+        if not opciones:
+            return None
+        return pool_de(self.alias, {} if opciones is True else opciones)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        conexion, self._creada = pool.tomar(self.settings_dict['CONN_HEALTH_CHECKS']) if pool else (None, None)
+        self._reutilizada = conexion is not None
+        if conexion is None:
+            conexion = super().get_new_connection(conn_params)
+            self._creada = time.monotonic()
+            if pool:
+                pool.creadas += 1
+        return conexion
+
+    def init_connection_state(self):
+        # Una conexión del pool ya tiene configurada la sesión
+        if not getattr(self, '_reutilizada', False):
+            super().init_connection_state()
+
+    def _close(self):
+        pool = self.pool
+        # Solo vuelven al pool las conexiones sin transacción abierta ni errores
+        reutilizable = (
+            pool is not None and self.connection is not None and not self.in_atomic_block
+            and self.autocommit and not self.errors_occurred
+        )
+        if reutilizable and pool.devolver(self.connection, self._creada):
+            return
+        super()._close()
@@ -0,0 +1,11 @@
+"""SQLite con pool de conexiones: ENGINE = 'arrozcascara.motores.sqlite3'.
+
+Sirve para desarrollo y para medir el pool sin un servidor MySQL.
+"""
+from django.db.backends.sqlite3 import base
+
+from ..pool import ConPool
+
+
+class DatabaseWrapper(ConPool, base.DatabaseWrapper):
+    pass
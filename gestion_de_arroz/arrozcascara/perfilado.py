@@ -0,0 +1,249 @@
+"""Perfilado de peticiones: tiempo total, consultas SQL y tiempo de plantillas por vista.
+
+PerfiladoMiddleware mide una fracción de las peticiones (PERFILADO_MUESTREO),
+agrega el encabezado Server-Timing a esas respuestas y guarda las mediciones
+en un recolector en memoria por vista, que muestra la página de estadísticas
+para el personal. En las peticiones que no se muestrean solo se agrega una
+comprobación por consulta y por plantilla renderizada desde una vista.
+
+El tiempo de plantillas lo mide el motor PlantillasDjango, configurado en
+TEMPLATES en lugar de DjangoTemplates; no se modifica ninguna clase de Django.
+
+Las estadísticas son del proceso: con varios procesos de servidor cada uno
+tiene las suyas.
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+# Mediciones que se guardan por vista (las más viejas se descartan)
+MAX_MUESTRAS_POR_VISTA = 1000
+
+# Consultas repetidas que se recuerdan por vista
+MAX_HUELLAS_POR_VISTA = 50
+
+PERCENTILES = (50, 90, 99)
+
+_LISTA_DE_PARAMETROS = re.compile(r'\((?:%s, )+%s\)')
+_NUMERO = re.compile(r'\b\d+\b')
+
+
+def muestreo():
+    """Fracción de peticiones que se miden; todas en desarrollo"""
+    return getattr(settings, 'PERFILADO_MUESTREO', 1.0 if settings.DEBUG else 0.05)
+
+
+def huella(sql):
+    """SQL sin valores concretos, para reconocer la misma consulta repetida"""
+    return _NUMERO.sub('N', _LISTA_DE_PARAMETROS.sub('(...)', sql))
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class _Medicion:
+    """Lo que se mide de una petición"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.huellas = Counter()
+        self.tiempo_plantillas = 0.0
+        self.profundidad_plantillas = 0
+
+    def repetidas(self):
+        return {sql: veces for sql, veces in self.huellas.items() if veces > 1}
+
+
+# Medición de la petición en curso. Es una variable de contexto y no de hilo
+# porque bajo ASGI la vista corre en otro hilo que hereda el contexto.
+_medicion_actual = ContextVar('medicion_perfilado', default=None)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper instalado en todas las conexiones; solo mide si hay una medición activa"""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.tiempo_db += time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.huellas[huella(sql)] += 1
+
+
+def _instalar_en_conexion(connection, **kwargs):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+class _PlantillaMedida:
+    """Plantilla del motor que suma su tiempo de render a la medición activa"""
+
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+
+    def __getattr__(self, nombre):
+        return getattr(self.plantilla, nombre)
+
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return self.plantilla.render(context, request)
+
+        # Las incluidas o extendidas cuentan dentro de la externa; la
+        # profundidad evita contar dos veces un render_to_string anidado
+        medicion.profundidad_plantillas += 1
+        inicio = time.perf_counter()
+        try:
+            return self.plantilla.render(context, request)
+        finally:
+            medicion.profundidad_plantillas -= 1
+            if medicion.profundidad_plantillas == 0:
+                medicion.tiempo_plantillas += time.perf_counter() - inicio
+
+
+class PlantillasDjango(DjangoTemplates):
+    """DjangoTemplates cuyas plantillas miden su render en las peticiones muestreadas"""
+
+    def from_string(self, template_code):
+        return _PlantillaMedida(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _PlantillaMedida(super().get_template(template_name))
+
+
+def _instalar_en_todas():
+    """Instala el wrapper en todos los alias; las conexiones que se abran después lo reciben por la señal"""
+    for conexion in connections.all():
+        _instalar_en_conexion(conexion)
+
+
+class Recolector:
+    """Mediciones recientes por vista, compartidas por los hilos del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._muestras = defaultdict(lambda: deque(maxlen=MAX_MUESTRAS_POR_VISTA))
+        self._repetidas = defaultdict(Counter)
+
+    def registrar(self, vista, total, medicion):
+        with self._lock:
+            self._muestras[vista].append(
+                (total, medicion.tiempo_db, medicion.consultas, medicion.tiempo_plantillas)
+            )
+            repetidas = self._repetidas[vista]
+            repetidas.update(medicion.repetidas())
+            if len(repetidas) > MAX_HUELLAS_POR_VISTA:
+                self._repetidas[vista] = Counter(dict(repetidas.most_common(MAX_HUELLAS_POR_VISTA)))
+
+    def reiniciar(self):
+        with self._lock:
+            self._muestras.clear()
+            self._repetidas.clear()
+
+    def estadisticas(self):
+        """Percentiles por vista, de la más lenta (p90) a la más rápida"""
+        with self._lock:
+            copia = {vista: list(muestras) for vista, muestras in self._muestras.items()}
+            repetidas = {vista: contador.most_common(5) for vista, contador in self._repetidas.items()}
+
+        vistas = []
+        for vista, muestras in copia.items():
+            totales, tiempos_db, consultas, plantillas = (sorted(columna) for columna in zip(*muestras))
+            vistas.append({
+                'vista': vista,
+                'muestras': len(muestras),
+                'total_ms': {f'p{p}': round(percentil(totales, p) * 1000, 1) for p in PERCENTILES},
+                'db_ms': {f'p{p}': round(percentil(tiempos_db, p) * 1000, 1) for p in PERCENTILES},
+                'consultas': {f'p{p}': percentil(consultas, p) for p in PERCENTILES},
+                'consultas_max': consultas[-1],
+                'plantillas_ms': {f'p{p}': round(percentil(plantillas, p) * 1000, 1) for p in PERCENTILES},
+                'repetidas': [{'sql': sql, 'veces': veces} for sql, veces in repetidas.get(vista, [])],
+            })
+        vistas.sort(key=lambda v: v['total_ms']['p90'], reverse=True)
+        return vistas
+
+
+recolector = Recolector()
+
+
+def server_timing(total, medicion):
+    return (
+        f'total;dur={total * 1000:.1f}, '
+        f'db;dur={medicion.tiempo_db * 1000:.1f};desc="{medicion.consultas} consultas", '
+        f'tpl;dur={medicion.tiempo_plantillas * 1000:.1f};desc="plantillas"'
+    )
+
+
+class PerfiladoMiddleware:
+    """Mide las peticiones muestreadas y agrega el encabezado Server-Timing.
+
+    Funciona con WSGI y con ASGI. Las respuestas en streaming (eventos del
+    dashboard, exportaciones) no se registran: su duración depende del
+    cliente y no de la vista.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+        connection_created.connect(_instalar_en_conexion, dispatch_uid='perfilado')
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if random.random() >= muestreo():
+            return self.get_response(request)
+
+        _instalar_en_todas()
+        medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, time.perf_counter() - inicio, medicion)
+
+    async def __acall__(self, request):
+        if random.random() >= muestreo():
+            return await self.get_response(request)
+
+        # Solo registra el wrapper en los objetos de conexión, sin consultar la base
+        _instalar_en_todas()
+        medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, time.perf_counter() - inicio, medicion)
+
+    def _registrar(self, request, response, total, medicion):
+        if response.streaming:
+            return response
+        match = getattr(request, 'resolver_match', None)
+        vista = match.view_name if match else request.path
+        recolector.registrar(vista, total, medicion)
+        response['Server-Timing'] = server_timing(total, medicion)
+        return response
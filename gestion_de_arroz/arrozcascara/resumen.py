@@ -0,0 +1,213 @@
+"""Mantenimiento incremental de las tablas ResumenSacos y TotalRepresentante.
+
+Cada ruta que crea, edita, elimina o paga facturas acumula sus cambios con
+``acumular`` y los aplica con ``aplicar`` dentro de la misma transacción. Los
+mismos deltas, sumados por representante, mantienen TotalRepresentante, que
+es lo que lee el dashboard.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction, IntegrityError
+from django.db.models import Sum, Count
+from django.utils.dateparse import parse_date
+
+from .models import Factura, ResumenSacos, TotalRepresentante
+
+CAMPOS_CLAVE = ('representante_id', 'fecha', 'variedad', 'estado')
+
+
+def _valor(factura, campo):
+    """Lee un campo de una instancia de Factura o de un diccionario de values()"""
+    if isinstance(factura, dict):
+        return factura[campo]
+    return getattr(factura, campo)
+
+
+def clave(factura):
+    fecha = _valor(factura, 'fecha')
+    if isinstance(fecha, str):
+        fecha = parse_date(fecha)
+    return (int(_valor(factura, 'representante_id')), fecha, _valor(factura, 'variedad'), _valor(factura, 'estado'))
+
+
+def nuevos_deltas():
+    """Acumulador clave -> [sacos, facturas, monto]"""
+    return defaultdict(lambda: [0, 0, Decimal('0')])
+
+
+def acumular(deltas, factura, signo=1):
+    """Suma (signo=1) o resta (signo=-1) una factura en el acumulador"""
+    delta = deltas[clave(factura)]
+    delta[0] += signo * int(_valor(factura, 'cantidad_sacos'))
+    delta[1] += signo
+    delta[2] += signo * Decimal(str(_valor(factura, 'monto') or 0))
+    return deltas
+
+
+def aplicar(deltas):
+    """Aplica los deltas con una consulta de lectura y escrituras masivas"""
+    deltas = {k: v for k, v in deltas.items() if any(v)}
+    if not deltas:
+        return
+
+    # Un alta concurrente de la misma clave puede chocar con la restricción
+    # única; en ese caso se reintenta leyendo la fila que creó el otro proceso
+    for intento in range(2):
+        try:
+            with transaction.atomic():
+                _aplicar(deltas)
+            return
+        except IntegrityError:
+            if intento:
+                raise
+
+
+def _aplicar(deltas):
+    representantes = {k[0] for k in deltas}
+    fechas = {k[1] for k in deltas}
+    existentes = {
+        (r.representante_id, r.fecha, r.variedad, r.estado): r
+        for r in ResumenSacos.objects.select_for_update().filter(
+            representante_id__in=representantes, fecha__in=fechas
+        )
+    }
+
+    nuevos, modificados, vacios = [], [], []
+    for k, (sacos, facturas, monto) in deltas.items():
+        resumen = existentes.get(k)
+        if resumen is None:
+            nuevos.append(ResumenSacos(
+                **dict(zip(CAMPOS_CLAVE, k)),
+                total_sacos=sacos, total_facturas=facturas, monto_total=monto
+            ))
+            continue
+
+        resumen.total_sacos += sacos
+        resumen.total_facturas += facturas
+        resumen.monto_total += monto
+        if resumen.total_facturas <= 0:
+            vacios.append(resumen.pk)
+        else:
+            modificados.append(resumen)
+
+    if modificados:
+        ResumenSacos.objects.bulk_update(modificados, ['total_sacos', 'total_facturas', 'monto_total'])
+    if vacios:
+        ResumenSacos.objects.filter(pk__in=vacios).delete()
+    if nuevos:
+        ResumenSacos.objects.bulk_create(nuevos)
+
+    por_representante = nuevos_deltas()
+    for k, delta in deltas.items():
+        total = por_representante[k[0]]
+        for i, valor in enumerate(delta):
+            total[i] += valor
+    _aplicar_totales({k: v for k, v in por_representante.items() if any(v)})
+
+
+def _aplicar_totales(deltas):
+    """Suma los deltas por representante a TotalRepresentante"""
+    if not deltas:
+        return
+    existentes = TotalRepresentante.objects.select_for_update().in_bulk(list(deltas))
+
+    nuevos, modificados, vacios = [], [], []
+    for representante_id, (sacos, facturas, monto) in deltas.items():
+        total = existentes.get(representante_id)
+        if total is None:
+            nuevos.append(TotalRepresentante(
+                representante_id=representante_id, total_sacos=sacos, total_facturas=facturas, monto_total=monto
+            ))
+            continue
+
+        total.total_sacos += sacos
+        total.total_facturas += facturas
+        total.monto_total += monto
+        if total.total_facturas <= 0:
+            vacios.append(representante_id)
+        else:
+            modificados.append(total)
+
+    if modificados:
+        TotalRepresentante.objects.bulk_update(modificados, ['total_sacos', 'total_facturas', 'monto_total'])
+    if vacios:
+        TotalRepresentante.objects.filter(pk__in=vacios).delete()
+    if nuevos:
+        TotalRepresentante.objects.bulk_create(nuevos)
+
+
+def registrar_alta(factura):
+    aplicar(acumular(nuevos_deltas(), factura))
+
+
+def registrar_baja(factura):
+    aplicar(acumular(nuevos_deltas(), factura, -1))
+
+
+def registrar_cambio(antes, despues):
+    """Mueve los totales de la clave anterior de una factura a la nueva"""
+    deltas = acumular(nuevos_deltas(), antes, -1)
+    aplicar(acumular(deltas, despues))
+
+
+def valores_clave(factura):
+    """Copia de los campos que afectan al resumen, para comparar tras editar"""
+    return {campo: _valor(factura, campo) for campo in CAMPOS_CLAVE + ('cantidad_sacos', 'monto')}
+
+
+def _totales_desde_facturas(campos=CAMPOS_CLAVE):
+    return Factura.objects.order_by().values(*campos).annotate(
+        total_sacos=Sum('cantidad_sacos'),
+        total_facturas=Count('id'),
+        monto_total=Sum('monto'),
+    )
+
+
+@transaction.atomic
+def reconstruir(tamano_lote=1000):
+    """Vuelve a calcular todo el resumen desde la tabla de facturas"""
+    TotalRepresentante.objects.all().delete()
+    TotalRepresentante.objects.bulk_create(
+        (TotalRepresentante(**fila) for fila in _totales_desde_facturas(['representante_id']).iterator()),
+        batch_size=tamano_lote,
+    )
+    ResumenSacos.objects.all().delete()
+    lote = []
+    creados = 0
+    for fila in _totales_desde_facturas().iterator():
+        lote.append(ResumenSacos(**fila))
+        if len(lote) >= tamano_lote:
+            ResumenSacos.objects.bulk_create(lote)
+            creados += len(lote)
+            lote = []
+    if lote:
+        ResumenSacos.objects.bulk_create(lote)
+        creados += len(lote)
+    return creados
+
+
+def diferencias():
+    """Claves cuyo resumen no coincide con la suma de las facturas"""
+    esperado = {
+        tuple(fila[c] for c in CAMPOS_CLAVE): (fila['total_sacos'], fila['total_facturas'], fila['monto_total'] or 0)
+        for fila in _totales_desde_facturas()
+    }
+    actual = {
+        tuple(fila[c] for c in CAMPOS_CLAVE): (fila['total_sacos'], fila['total_facturas'], fila['monto_total'])
+        for fila in ResumenSacos.objects.values(*CAMPOS_CLAVE, 'total_sacos', 'total_facturas', 'monto_total')
+    }
+    # Los totales por representante, con la clave (representante_id,)
+    esperado.update(
+        ((fila['representante_id'],), (fila['total_sacos'], fila['total_facturas'], fila['monto_total'] or 0))
+        for fila in _totales_desde_facturas(['representante_id'])
+    )
+    actual.update(
+        ((fila['representante_id'],), (fila['total_sacos'], fila['total_facturas'], fila['monto_total']))
+        for fila in TotalRepresentante.objects.values('representante_id', 'total_sacos', 'total_facturas', 'monto_total')
+    )
+    return [
+        (k, esperado.get(k), actual.get(k))
+        for k in esperado.keys() | actual.keys()
+        if esperado.get(k) != actual.get(k)
+    ]
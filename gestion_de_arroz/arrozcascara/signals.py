@@ -0,0 +1,67 @@
+"""Señales que avisan cuando cambian los datos de facturas o representantes.
+
+Las escrituras masivas (bulk_create, bulk_update, update) no disparan
+post_save, por eso quien las hace envía la señal correspondiente con
+``enviar_despues_de_confirmar``; los .delete() de queryset se hacen dentro de
+``envio_agrupado`` por la misma razón. ``facturas_modificadas``
+recibe las facturas afectadas y una ``accion`` ('creada', 'modificada',
+'pagada' o 'eliminada').
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .models import Factura, Representante
+
+facturas_modificadas = Signal()
+representantes_modificados = Signal()
+
+_estado = threading.local()
+
+
+def enviar_despues_de_confirmar(senal, sender, **kwargs):
+    """Envía la señal cuando la transacción actual se confirma"""
+    transaction.on_commit(lambda: senal.send(sender=sender, **kwargs))
+
+
+@contextmanager
+def envio_agrupado():
+    """Dentro del bloque post_save/post_delete no avisan factura por factura.
+
+    Un .delete() de queryset envía post_delete por cada fila; quien hace la
+    operación masiva envía después una sola señal con todas las facturas.
+    """
+    anterior = getattr(_estado, 'agrupado', False)
+    _estado.agrupado = True
+    try:
+        yield
+    finally:
+        _estado.agrupado = anterior
+
+
+def _accion_factura(signal, instance, created=False, update_fields=None, **kwargs):
+    """'creada', 'eliminada', 'pagada' o 'modificada', para los eventos del dashboard"""
+    if signal is post_delete:
+        return 'eliminada'
+    if created:
+        return 'creada'
+    if update_fields and 'estado' in update_fields and instance.estado == 'pagado':
+        return 'pagada'
+    return 'modificada'
+
+
+@receiver([post_save, post_delete], sender=Factura)
+def _factura_guardada(sender, instance, **kwargs):
+    if getattr(_estado, 'agrupado', False):
+        return
+    enviar_despues_de_confirmar(
+        facturas_modificadas, sender, facturas=[instance], accion=_accion_factura(instance=instance, **kwargs)
+    )
+
+
+@receiver([post_save, post_delete], sender=Representante)
+def _representante_guardado(sender, instance, **kwargs):
+    enviar_despues_de_confirmar(representantes_modificados, sender, representantes=[instance])
@@ -0,0 +1,199 @@
+"""Cola local de importaciones de Excel procesadas fuera del hilo de la petición."""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .bitacora import evento
+from .importacion import importar_facturas, validar_facturas, ErrorImportacion, ResultadoImportacion
+from .models import Importacion
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _obtener_executor():
+    """Crea el pool de trabajadores la primera vez que se necesita"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMPORTACION_WORKERS', 2),
+                thread_name_prefix='importacion',
+            )
+        return _executor
+
+
+def _hash_archivo(archivo_subido):
+    sha = hashlib.sha256()
+    for parte in archivo_subido.chunks():
+        sha.update(parte)
+    archivo_subido.seek(0)
+    return sha.hexdigest()
+
+
+def _enviar(importacion_id):
+    # Solo se procesa cuando el registro ya es visible para el trabajador
+    transaction.on_commit(lambda: _obtener_executor().submit(procesar_importacion, importacion_id))
+
+
+def encolar_importacion(archivo_subido, modo='importar'):
+    """Guarda el archivo en disco, registra la importación y la envía al pool.
+
+    Si el mismo archivo ya tuvo una importación fallida con lotes
+    confirmados, se reanuda esa en lugar de empezar de nuevo.
+    """
+    hash_archivo = _hash_archivo(archivo_subido)
+    interrumpida = Importacion.objects.filter(
+        hash_archivo=hash_archivo, modo=modo, estado='fallido', ultima_fila__gt=0
+    ).order_by('-fecha_creacion').first()
+    if interrumpida and reanudar_importacion(interrumpida.pk):
+        interrumpida.refresh_from_db()
+        return interrumpida
+
+    importacion = Importacion(nombre_archivo=archivo_subido.name, modo=modo, hash_archivo=hash_archivo)
+    importacion.archivo.save(archivo_subido.name, archivo_subido, save=False)
+    importacion.save()
+    _enviar(importacion.pk)
+    return importacion
+
+
+def reanudar_importacion(importacion_id, estados=('fallido',), encolar=True):
+    """Deja pendiente una importación interrumpida; continúa desde su punto de control"""
+    reanudada = Importacion.objects.filter(pk=importacion_id, estado__in=estados).update(
+        estado='pendiente', mensaje=''
+    )
+    if reanudada and encolar:
+        _enviar(importacion_id)
+    return bool(reanudada)
+
+
+def _contadores(resultado):
+    """Campos de Importacion con los totales del resultado"""
+    return {
+        'filas_procesadas': resultado.filas,
+        'facturas_creadas': resultado.creadas,
+        'facturas_actualizadas': resultado.actualizadas,
+        'facturas_sin_cambios': resultado.sin_cambios,
+        'total_errores': resultado.total_errores,
+    }
+
+
+def _guardar_progreso(importacion_id, resultado):
+    Importacion.objects.filter(pk=importacion_id).update(**_contadores(resultado))
+
+
+def _validar(importacion, progreso):
+    """Valida sin guardar facturas y adjunta el reporte a la importación"""
+    nombre = f'{os.path.splitext(importacion.nombre_archivo)[0]}_validacion.csv'
+    with tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as reporte:
+        resultado = validar_facturas(importacion.archivo.path, reporte, progreso=progreso)
+        reporte.seek(0)
+        importacion.reporte.save(nombre, File(reporte), save=False)
+    Importacion.objects.filter(pk=importacion.pk).update(reporte=importacion.reporte.name)
+
+    invalidas = resultado.filas - resultado.validas
+    return resultado, (
+        f'Validación terminada: {resultado.validas} filas válidas y {invalidas} con errores. '
+        'No se guardó ninguna factura'
+    )
+
+
+def _guardar_punto_control(importacion_id, resultado, ultima_fila):
+    """Se ejecuta dentro de la transacción del lote, así se confirma con sus facturas"""
+    Importacion.objects.filter(pk=importacion_id).update(
+        **_contadores(resultado),
+        errores=resultado.errores[:Importacion.MAX_ERRORES],
+        ultima_fila=ultima_fila,
+    )
+
+
+def _importar(importacion, progreso):
+    actualizar = importacion.modo == 'actualizar'
+    resultado = None
+    if importacion.ultima_fila:
+        # Reanudación: los totales siguen desde lo que quedó confirmado
+        resultado = ResultadoImportacion(
+            filas=importacion.filas_procesadas,
+            creadas=importacion.facturas_creadas,
+            actualizadas=importacion.facturas_actualizadas,
+            sin_cambios=importacion.facturas_sin_cambios,
+            errores=list(importacion.errores),
+            errores_omitidos=importacion.total_errores - len(importacion.errores),
+        )
+    resultado = importar_facturas(
+        importacion.archivo.path,
+        actualizar=actualizar,
+        desde_fila=importacion.ultima_fila,
+        resultado=resultado,
+        punto_control=lambda parcial, fila: _guardar_punto_control(importacion.pk, parcial, fila),
+    )
+    if actualizar:
+        return resultado, (
+            f'Se importaron {resultado.creadas} facturas nuevas y se actualizaron '
+            f'{resultado.actualizadas}; {resultado.sin_cambios} no tenían cambios'
+        )
+    return resultado, f'Se importaron {resultado.creadas} facturas correctamente'
+
+
+def procesar_importacion(importacion_id):
+    """Procesa una importación pendiente; devuelve False si otro trabajador ya la tomó"""
+    try:
+        tomada = Importacion.objects.filter(pk=importacion_id, estado='pendiente').update(
+            # Al reanudar se conserva el inicio original
+            estado='procesando', fecha_inicio=Coalesce('fecha_inicio', Value(timezone.now())), fecha_fin=None
+        )
+        if not tomada:
+            return False
+
+        importacion = Importacion.objects.get(pk=importacion_id)
+        progreso = lambda parcial: _guardar_progreso(importacion_id, parcial)
+        try:
+            if importacion.modo == 'validar':
+                resultado, mensaje = _validar(importacion, progreso)
+            else:
+                resultado, mensaje = _importar(importacion, progreso)
+        except ErrorImportacion as e:
+            evento(logger, logging.WARNING, 'importacion.rechazada', importacion=importacion_id, motivo=str(e))
+            Importacion.objects.filter(pk=importacion_id).update(
+                estado='fallido', mensaje=str(e), fecha_fin=timezone.now()
+            )
+        except Exception as e:
+            logger.exception('importacion.fallida', extra={'datos': {'importacion': importacion_id}})
+            ultima_fila = Importacion.objects.values_list('ultima_fila', flat=True).get(pk=importacion_id)
+            reanudar = (
+                f'. Al cargar de nuevo el archivo se continuará después de la fila {ultima_fila}'
+                if ultima_fila else ''
+            )
+            Importacion.objects.filter(pk=importacion_id).update(
+                estado='fallido', mensaje=f'Error al procesar el archivo: {str(e)}{reanudar}', fecha_fin=timezone.now()
+            )
+        else:
+            Importacion.objects.filter(pk=importacion_id).update(
+                estado='completado',
+                **_contadores(resultado),
+                errores=resultado.errores[:Importacion.MAX_ERRORES],
+                mensaje=mensaje,
+                fecha_fin=timezone.now(),
+            )
+            evento(
+                logger, logging.INFO, 'importacion.completada',
+                importacion=importacion_id, modo=importacion.modo, filas=resultado.filas,
+                creadas=resultado.creadas, actualizadas=resultado.actualizadas, errores=resultado.total_errores,
+                segundos=round((timezone.now() - importacion.fecha_inicio).total_seconds(), 1),
+            )
+        return True
+    finally:
+        # Los hilos del pool no pasan por el ciclo de petición de Django
+        connection.close()
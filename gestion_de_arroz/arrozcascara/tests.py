@@ -1,3 +1,478 @@
-from django.test import TestCase
+import datetime
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.template.base import Template
+from django.urls import reverse
+
+from . import cacheo, datos_sinteticos, estadisticas, resumen, tareas, versiones
+from .columnas import convertir_bloque, convertir_textos, mapear_columnas
+from .filtros import filtrar_facturas, leer_filtros, totales_por_representante
+from .importacion import ErrorImportacion, importar_facturas
+from .models import Factura, Importacion, Representante
+
+# Template._render al cargar las pruebas; el perfilado no debe reemplazarlo
+_render_de_django = Template._render
+
+
+class FiltrosFechasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.representante = Representante.objects.create(
+            nombre_completo='Juan Pérez', cedula='001-0000001-1'
+        )
+        Factura.objects.create(
+            numero_factura='F-1', cedula='001-0000002-2', nombre_cliente='Pedro Gómez',
+            cantidad_sacos=10, representante=cls.representante,
+            fecha=datetime.date(2024, 3, 1), variedad='Jaragua',
+        )
+        # detalles lee los totales de los resúmenes
+        resumen.reconstruir()
+
+    def setUp(self):
+        # Las versiones de la caché vuelven a empezar con cada prueba
+        cache.clear()
+
+    def test_leer_filtros_normaliza_y_descarta_fechas_no_validas(self):
+        filtros, error = leer_filtros({'fecha_desde': 'abc', 'fecha_hasta': '2024-3-1'})
+        self.assertEqual(filtros['fecha_desde'], '')
+        self.assertEqual(filtros['fecha_hasta'], '2024-03-01')
+        self.assertIn('Desde', error)
+
+    def test_leer_filtros_estricto(self):
+        with self.assertRaises(ValueError):
+            leer_filtros({'fecha_hasta': '2024-02-30'}, estricto=True)
+
+    def test_facturas_api_fecha_no_valida(self):
+        for parametros in ({'fecha_desde': 'abc'}, {'fecha_hasta': '2024-13-01'}):
+            response = self.client.get(reverse('facturas_api'), parametros)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+
+    def test_facturas_api_fechas_validas(self):
+        response = self.client.get(
+            reverse('facturas_api'), {'fecha_desde': '2024-01-01', 'fecha_hasta': '2024-12-31'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([f['numero_factura'] for f in response.json()['facturas']], ['F-1'])
+
+    def test_detalles_fecha_no_valida(self):
+        response = self.client.get(reverse('detalles'), {'fecha_desde': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_facturas'], 1)
+
+    def test_exportar_fecha_no_valida(self):
+        response = self.client.get(reverse('exportar_facturas'), {'fecha_desde': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+
+    def test_exportar_csv(self):
+        response = self.client.get(reverse('exportar_facturas'), {'fecha_hasta': '2024-12-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('F-1', b''.join(response.streaming_content).decode('utf-8-sig'))
+
+
+LIBROS = Path(settings.BASE_DIR).parent
+
+
+class LibrosDelRepositorioTests(TestCase):
+    """Los libros de ejemplo de la raíz del repositorio se importan completos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Representante.objects.create(pk=3, nombre_completo='Rikemi', cedula='001-0000003-3')
+        for numero, nombre in enumerate(['DELIO', 'VICTOR CRUZ', 'FREYCY', 'IVAN VILLALONA'], start=10):
+            Representante.objects.create(nombre_completo=nombre, cedula=f'001-00000{numero}-0')
+
+    def test_libro_sin_variedad(self):
+        resultado = importar_facturas(LIBROS / 'rikemi_nuevo_con_nombre_cedula_fecha.xlsx', variedad='Jaragua')
+        # El libro trae la factura 1536 dos veces
+        self.assertEqual(resultado.errores, ['Fila 46: La factura 1536 está repetida en el archivo (fila 45)'])
+        self.assertEqual(resultado.creadas, 53)
+        factura = Factura.objects.get(numero_factura='1039')
+        self.assertEqual((factura.nombre_cliente, factura.cedula, factura.representante_id, factura.variedad),
+                         ('KATHAERINE ELIANI LIMA', '10100120921', 3, 'Jaragua'))
+
+    def test_libro_sin_variedad_la_requiere(self):
+        with self.assertRaisesMessage(ErrorImportacion, 'variedad'):
+            importar_facturas(LIBROS / 'rikemi_nuevo_con_nombre_cedula_fecha.xlsx')
+
+    def test_libro_con_titulos_y_nombre_con_cedula(self):
+        resultado = importar_facturas(LIBROS / 'todos juntos.xlsx', variedad='Puita')
+        self.assertEqual(resultado.creadas, 180)
+        # Los encabezados repetidos de cada sección no se reportan como filas;
+        # solo quedan las facturas que el libro trae dos veces
+        self.assertEqual(len(resultado.errores), 5)
+        self.assertTrue(all('repetida en el archivo' in error for error in resultado.errores))
+        factura = Factura.objects.get(numero_factura='1022')
+        self.assertEqual((factura.nombre_cliente, factura.cedula, factura.representante.nombre_completo),
+                         ('ANDRES LEOPORDO', '10100023323', 'DELIO'))
+
+
+class CacheoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidar_cambia_la_version_guardada_en_la_base(self):
+        calculos = []
+
+        def calcular():
+            calculos.append(1)
+            return len(calculos)
+
+        self.assertEqual(cacheo.obtener('prueba', [cacheo.FACTURAS], calcular), 1)
+        self.assertEqual(cacheo.obtener('prueba', [cacheo.FACTURAS], calcular), 1)
+        # Otro proceso que incrementa la versión en la base invalida esta caché
+        versiones.incrementar('cache:facturas')
+        self.assertEqual(cacheo.obtener('prueba', [cacheo.FACTURAS], calcular), 2)
+        cacheo.invalidar(cacheo.REPRESENTANTES)
+        self.assertEqual(cacheo.obtener('prueba', [cacheo.FACTURAS], calcular), 2)
+
+
+class TotalRepresentanteTests(TestCase):
+
+    def test_los_totales_siguen_los_deltas_del_resumen(self):
+        juan = Representante.objects.create(nombre_completo='Juan', cedula='1')
+        ana = Representante.objects.create(nombre_completo='Ana', cedula='2')
+        factura = Factura(
+            numero_factura='F-1', cedula='3', nombre_cliente='Pedro', cantidad_sacos=10,
+            representante=juan, fecha=datetime.date(2024, 3, 1), variedad='Puita',
+        )
+        factura.save()
+        resumen.registrar_alta(factura)
+        Factura.objects.create(
+            numero_factura='F-2', cedula='3', nombre_cliente='Pedro', cantidad_sacos=5,
+            representante=ana, fecha=datetime.date(2024, 3, 2), variedad='Puita',
+        )
+        resumen.registrar_alta(Factura.objects.get(numero_factura='F-2'))
+
+        antes = resumen.valores_clave(factura)
+        factura.representante = ana
+        factura.save()
+        resumen.registrar_cambio(antes, factura)
+
+        self.assertEqual(
+            [(fila['representante'], fila['total_sacos'], fila['total_facturas'])
+             for fila in estadisticas.representantes_con_totales()],
+            [(ana.pk, 15, 2)]
+        )
+        self.assertEqual(resumen.diferencias(), [])
+
+
+class FacturaIndividualTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.juan = Representante.objects.create(nombre_completo='Juan', cedula='1')
+        self.ana = Representante.objects.create(nombre_completo='Ana', cedula='2')
+        self.factura = Factura.objects.create(
+            numero_factura='F-1', cedula='3', nombre_cliente='Pedro', cantidad_sacos=10,
+            representante=self.juan, fecha=datetime.date(2024, 3, 1), variedad='Puita',
+        )
+        resumen.reconstruir()
+
+    def test_editar_y_pagar_mantienen_el_resumen(self):
+        response = self.client.post(
+            reverse('editar_factura', args=[self.factura.pk]),
+            {'representante_id': self.ana.pk, 'cantidad_sacos': '12'}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            reverse('pagar_factura', args=[self.factura.pk]), {'monto': '500', 'fecha_pago': '2024-03-05'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(resumen.diferencias(), [])
+
+    def test_eliminar_dos_veces_descuenta_una_sola_vez(self):
+        url = reverse('eliminar_factura', args=[self.factura.pk])
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertEqual(resumen.diferencias(), [])
+
+
+class ExplicarConsultasTests(TestCase):
+
+    def test_el_modo_estricto_pasa_con_la_base_recien_migrada(self):
+        salida = StringIO()
+        call_command('explicar_consultas', estricto=True, stdout=salida)
+        self.assertIn('recorrido completo esperado', salida.getvalue())
+
+
+class TotalesDeDetallesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        juan = Representante.objects.create(nombre_completo='Juan', cedula='1')
+        ana = Representante.objects.create(nombre_completo='Ana', cedula='2')
+        for numero, (representante, cedula, sacos, fecha, variedad, estado) in enumerate([
+            (juan, '3', 10, datetime.date(2024, 3, 1), 'Puita', 'pendiente'),
+            (juan, '4', 5, datetime.date(2024, 4, 1), 'Jaragua', 'pagado'),
+            (ana, '3', 7, datetime.date(2024, 3, 15), 'Puita', 'pendiente'),
+        ]):
+            Factura.objects.create(
+                numero_factura=f'F-{numero}', cedula=cedula, nombre_cliente='Pedro', cantidad_sacos=sacos,
+                representante=representante, fecha=fecha, variedad=variedad, estado=estado,
+            )
+        resumen.reconstruir()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_los_resumenes_dan_los_mismos_totales_que_las_facturas(self):
+        for filtros in ({}, {'representante': str(Representante.objects.get(cedula='1').pk)},
+                        {'variedad': 'puita'}, {'estado': 'pagado'}, {'cedula': '3'},
+                        {'fecha_desde': '2024-03-10', 'fecha_hasta': '2024-04-30'}):
+            response = self.client.get(reverse('detalles'), filtros)
+            filtradas = filtrar_facturas(Factura.objects.all(), leer_filtros(filtros)[0])
+            self.assertEqual(
+                [(grupo['representante']['nombre_completo'], grupo['total_sacos'], grupo['total_facturas'])
+                 for grupo in response.context['facturas_por_representante']],
+                [(fila['representante__nombre_completo'], fila['sacos'], fila['facturas'])
+                 for fila in totales_por_representante(filtradas)],
+                filtros
+            )
+
+
+class LoteTests(TestCase):
+    """Base de las operaciones en lote: dos representantes y cuatro facturas con el resumen al día"""
+
+    def setUp(self):
+        cache.clear()
+        self.juan = Representante.objects.create(nombre_completo='Juan', cedula='1')
+        self.ana = Representante.objects.create(nombre_completo='Ana', cedula='2')
+        self.facturas = [
+            Factura.objects.create(
+                numero_factura=f'F-{numero}', cedula='3', nombre_cliente='Pedro', cantidad_sacos=10 * numero,
+                representante=representante, fecha=fecha, variedad='Puita',
+            )
+            for numero, representante, fecha in [
+                (1, self.juan, datetime.date(2024, 3, 1)),
+                (2, self.juan, datetime.date(2024, 3, 20)),
+                (3, self.juan, datetime.date(2024, 5, 1)),
+                (4, self.ana, datetime.date(2024, 3, 10)),
+            ]
+        ]
+        resumen.reconstruir()
+
+    def enviar(self, nombre, datos):
+        return self.client.post(reverse(nombre), json.dumps(datos), content_type='application/json')
+
+    def estados(self):
+        return dict(Factura.objects.values_list('numero_factura', 'estado'))
+
+
+class PagarFacturasLoteTests(LoteTests):
+
+    def test_paga_por_ids(self):
+        response = self.enviar('pagar_facturas_lote', {
+            'ids': [self.facturas[0].pk, self.facturas[3].pk], 'fecha_pago': '2024-06-01', 'monto': '150',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pagadas'], 2)
+        self.assertEqual(self.estados(), {'F-1': 'pagado', 'F-2': 'pendiente', 'F-3': 'pendiente', 'F-4': 'pagado'})
+        factura = Factura.objects.get(numero_factura='F-4')
+        self.assertEqual((factura.monto, factura.fecha_pago), (Decimal('150.00'), datetime.date(2024, 6, 1)))
+        self.assertEqual(resumen.diferencias(), [])
+
+    def test_paga_por_representante_y_rango_de_fechas(self):
+        response = self.enviar('pagar_facturas_lote', {
+            'filtros': {'representante': self.juan.pk, 'fecha_desde': '2024-03-01', 'fecha_hasta': '2024-03-31'},
+            'fecha_pago': '2024-06-01', 'precio_saco': '2.5',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(r['numero_factura'], r['resultado'], r['monto']) for r in response.json()['resultados']],
+            [('F-1', 'pagada', '25.00'), ('F-2', 'pagada', '50.00')]
+        )
+        self.assertEqual(self.estados(), {'F-1': 'pagado', 'F-2': 'pagado', 'F-3': 'pendiente', 'F-4': 'pendiente'})
+        self.assertEqual(resumen.diferencias(), [])
+
+    def test_rechaza_montos_no_positivos(self):
+        for datos in ({'monto': '0'}, {'monto': '-5'}, {'precio_saco': '0'}):
+            response = self.enviar('pagar_facturas_lote', {
+                'ids': [self.facturas[0].pk], 'fecha_pago': '2024-06-01', **datos,
+            })
+            self.assertEqual(response.status_code, 400, datos)
+            self.assertIn('mayor a 0', response.json()['error'])
+
+        # Un monto por factura no válido solo omite esa factura
+        response = self.enviar('pagar_facturas_lote', {
+            'ids': [self.facturas[0].pk, self.facturas[1].pk], 'fecha_pago': '2024-06-01',
+            'monto': '100', 'montos': {str(self.facturas[1].pk): '0'},
+        })
+        self.assertEqual([r['resultado'] for r in response.json()['resultados']], ['pagada', 'error'])
+        self.assertEqual(self.estados()['F-2'], 'pendiente')
+        self.assertEqual(resumen.diferencias(), [])
+
+    def test_informa_ids_desconocidos_y_facturas_ya_pagadas(self):
+        datos = {'ids': [self.facturas[0].pk], 'fecha_pago': '2024-06-01', 'monto': '100'}
+        self.enviar('pagar_facturas_lote', datos)
+
+        response = self.enviar('pagar_facturas_lote', dict(datos, ids=[999999, self.facturas[0].pk, self.facturas[1].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['pagadas'], response.json()['omitidas']), (1, 2))
+        self.assertEqual(
+            [(r['id'], r['resultado']) for r in response.json()['resultados']],
+            [(999999, 'no_encontrada'), (self.facturas[0].pk, 'ya_pagada'), (self.facturas[1].pk, 'pagada')]
+        )
+        self.assertEqual(resumen.diferencias(), [])
+
+
+class EditarEliminarFacturasLoteTests(LoteTests):
+
+    def numeros(self):
+        return sorted(Factura.objects.values_list('numero_factura', flat=True))
+
+    def test_detecta_numeros_repetidos_en_el_lote_y_en_la_base(self):
+        f1, f2, f3, f4 = self.facturas
+        response = self.enviar('editar_facturas_lote', {'facturas': [
+            {'id': f1.pk, 'numero_factura': 'N-1'},
+            {'id': f2.pk, 'numero_factura': 'N-1'},
+            {'id': f3.pk, 'numero_factura': 'F-4'},
+            {'id': f4.pk, 'numero_factura': 'N-4'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['actualizadas'], response.json()['conflictos']), (1, 3))
+        self.assertEqual(
+            [(r['id'], r['resultado']) for r in response.json()['resultados']],
+            [(f1.pk, 'conflicto'), (f2.pk, 'conflicto'), (f3.pk, 'conflicto'), (f4.pk, 'actualizada')]
+        )
+        self.assertIn('se repite en el lote', response.json()['resultados'][0]['error'])
+        self.assertIn(f'ya pertenece a la factura {f4.pk}', response.json()['resultados'][2]['error'])
+        self.assertEqual(self.numeros(), ['F-1', 'F-2', 'F-3', 'N-4'])
+
+    def test_reasignar_representante_mueve_los_totales(self):
+        response = self.enviar('editar_facturas_lote', {
+            'filtros': {'representante': self.juan.pk, 'fecha_desde': '2024-03-01', 'fecha_hasta': '2024-03-31'},
+            'cambios': {'representante_id': self.ana.pk},
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['actualizadas'], 2)
+        self.assertEqual(resumen.diferencias(), [])
+        self.assertEqual(
+            [(fila['representante'], fila['total_sacos'], fila['total_facturas'])
+             for fila in estadisticas.representantes_con_totales()],
+            [(self.ana.pk, 70, 3), (self.juan.pk, 30, 1)]
+        )
+
+        # Repetir el cambio no toca ninguna factura
+        response = self.enviar('editar_facturas_lote', {
+            'ids': [self.facturas[0].pk], 'cambios': {'representante_id': self.ana.pk},
+        })
+        self.assertEqual((response.json()['actualizadas'], response.json()['resultados'][0]['resultado']),
+                         (0, 'sin_cambios'))
+
+    def test_un_conflicto_en_la_base_deshace_todo_el_lote(self):
+        # Otro usuario toma el número entre la validación y el guardado
+        f1, f2 = self.facturas[:2]
+        with mock.patch('arrozcascara.lotes._conflictos_de_numero', return_value={}):
+            response = self.enviar('editar_facturas_lote', {'facturas': [
+                {'id': f1.pk, 'representante_id': self.ana.pk},
+                {'id': f2.pk, 'numero_factura': 'F-3'},
+            ]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Factura.objects.get(pk=f1.pk).representante_id, self.juan.pk)
+        self.assertEqual(self.numeros(), ['F-1', 'F-2', 'F-3', 'F-4'])
+        self.assertEqual(resumen.diferencias(), [])
+
+    def test_elimina_e_informa_cada_factura(self):
+        response = self.enviar('eliminar_facturas_lote', {'ids': [self.facturas[1].pk, 999999]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['eliminadas'], response.json()['no_encontradas']), (1, 1))
+        self.assertEqual(
+            [r['resultado'] for r in response.json()['resultados']], ['eliminada', 'no_encontrada']
+        )
+        response = self.enviar('eliminar_facturas_lote', {'filtros': {'representante': self.ana.pk}})
+        self.assertEqual(response.json()['eliminadas'], 1)
+        self.assertEqual(self.numeros(), ['F-1', 'F-3'])
+        self.assertEqual(resumen.diferencias(), [])
+
+
+class ReanudarImportacionTests(TestCase):
+
+    def test_la_reanudacion_conserva_todos_los_contadores(self):
+        Representante.objects.create(nombre_completo='Juan', cedula='1')
+        with tempfile.TemporaryDirectory() as carpeta, override_settings(MEDIA_ROOT=carpeta):
+            datos_sinteticos.libro_excel(Path(carpeta) / 'libro.xlsx', 10, ['Juan'])
+            # Una corrida anterior confirmó las filas 2 a 6 con más errores de los que se guardan
+            importacion = Importacion.objects.create(
+                archivo='libro.xlsx', nombre_archivo='libro.xlsx', estado='procesando', ultima_fila=6,
+                filas_procesadas=5, facturas_creadas=2, facturas_actualizadas=3, facturas_sin_cambios=4,
+                total_errores=Importacion.MAX_ERRORES + 300, errores=['Fila 2: error'] * Importacion.MAX_ERRORES,
+            )
+            resultado, _ = tareas._importar(importacion, None)
+
+        self.assertEqual((resultado.filas, resultado.creadas), (10, 7))
+        self.assertEqual((resultado.actualizadas, resultado.sin_cambios), (3, 4))
+        self.assertEqual(resultado.total_errores, Importacion.MAX_ERRORES + 300)
+        importacion.refresh_from_db()
+        self.assertEqual(
+            (importacion.ultima_fila, importacion.facturas_actualizadas, importacion.facturas_sin_cambios,
+             importacion.total_errores),
+            (11, 3, 4, Importacion.MAX_ERRORES + 300)
+        )
+
+
+class ColumnasTests(TestCase):
+
+    def test_los_alias_coinciden_con_palabras_completas(self):
+        indices = mapear_columnas(['Nombre completo', 'No.', 'Cédula', 'Cantidad de sacos', 'Variedad'])
+        self.assertEqual(indices['nombre'], 0)
+        self.assertEqual(indices['numero_factura'], 1)
+        self.assertEqual(indices['sacos'], 3)
+
+    def test_convertir_textos(self):
+        self.assertEqual(convertir_textos([' a ', 1.0, None, ' a ', 25]), ['a', '1', '', 'a', '25'])
+
+    def test_los_sacos_deben_ser_mayores_a_cero(self):
+        indices = mapear_columnas(['Nombre', 'Cédula', 'Factura', 'Representante', 'Sacos', 'Variedad', 'Fecha'])
+        filas = [('Pedro', '001', f'F-{sacos}', 'Juan', sacos, 'Puita', '2024-03-01') for sacos in (5, 0, -2)]
+        _, errores = convertir_bloque(filas, indices)
+        self.assertEqual(errores, dict.fromkeys([1, 2], 'La cantidad de sacos debe ser mayor a 0'))
+
+    def test_sin_columna_de_fecha_usa_el_dia_local(self):
+        indices = mapear_columnas(['Nombre', 'Cédula', 'Factura', 'Representante', 'Sacos', 'Variedad'])
+        with mock.patch('django.utils.timezone.localdate', return_value=datetime.date(2024, 3, 1)):
+            valores, _ = convertir_bloque([('Pedro', '001', 'F-1', 'Juan', 5, 'Puita')], indices)
+        self.assertEqual(valores['fecha'], [datetime.date(2024, 3, 1)])
+
+
+@override_settings(PERFILADO_MUESTREO=1.0)
+class PerfiladoTests(TestCase):
+
+    def test_mide_consultas_y_plantillas_de_las_peticiones_muestreadas(self):
+        response = self.client.get(reverse('detalles'))
+        tiempos = dict(parte.split(';', 1) for parte in response['Server-Timing'].split(', '))
+        self.assertNotIn('"0 consultas"', tiempos['db'])
+        self.assertNotEqual(tiempos['tpl'], 'dur=0.0;desc="plantillas"')
+
+    @override_settings(PERFILADO_MUESTREO=0)
+    def test_no_modifica_las_peticiones_sin_muestrear(self):
+        response = self.client.get(reverse('detalles'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertIs(Template._render, _render_de_django)
+
+    async def test_mide_las_consultas_bajo_asgi(self):
+        response = await self.async_client.get(reverse('facturas_api'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertNotIn('"0 consultas"', response['Server-Timing'])
+
+
+class BitacoraDetallesTests(TestCase):
+
+    def test_sin_depuracion_no_se_arman_los_eventos(self):
+        with mock.patch('arrozcascara.views.activo', return_value=False), \
+                mock.patch('arrozcascara.views.evento') as evento:
+            response = self.client.get(reverse('detalles'))
+        self.assertEqual(response.status_code, 200)
+        evento.assert_not_called()
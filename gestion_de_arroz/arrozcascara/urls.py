@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path("" , views.index, name="index"),
     path("dashboard" , views.dashboard, name="dashboard"),
+    path('dashboard/estadisticas/', views.estadisticas_json, name='estadisticas_json'),
+    path('dashboard/eventos/', views.eventos_dashboard, name='eventos_dashboard'),
     path("detalles" , views.detalles, name="detalles"),
     path("registrodefacturas" , views.registrodefacturas, name="registrodefacturas"),
      path('registrar-factura/', views.registrar_factura, name='registrar_factura'),
@@ -13,10 +15,19 @@ urlpatterns = [
     path('eliminar-representante/<int:id>/', views.eliminar_representante, name='eliminar_representante'),
     path("representantes" , views.representantes, name="representantes"),
     path('registrar-representante/', views.registrar_representante, name='registrar_representante'),
+    path('facturas/api/', views.facturas_api, name='facturas_api'),
+    path('facturas/exportar/', views.exportar_facturas, name='exportar_facturas'),
     path('facturas/obtener/<int:invoice_id>/', views.obtener_factura, name='obtener_factura'),
     path('facturas/editar/<int:invoice_id>/', views.editar_factura, name='editar_factura'),
     path('facturas/eliminar/<int:invoice_id>/', views.eliminar_factura, name='eliminar_factura'),
     path('facturas/pagar/<int:invoice_id>/', views.pagar_factura, name='pagar_factura'),
+    path('facturas/pagar-lote/', views.pagar_facturas_lote, name='pagar_facturas_lote'),
+    path('facturas/editar-lote/', views.editar_facturas_lote, name='editar_facturas_lote'),
+    path('facturas/eliminar-lote/', views.eliminar_facturas_lote, name='eliminar_facturas_lote'),
+    path('importaciones/vista-previa/', views.vista_previa_importacion, name='vista_previa_importacion'),
+    path('importaciones/<int:importacion_id>/estado/', views.estado_importacion, name='estado_importacion'),
+    path('importaciones/<int:importacion_id>/reporte/', views.reporte_importacion, name='reporte_importacion'),
+    path('perfilado/', views.estadisticas_perfilado, name='estadisticas_perfilado'),
     
     
 ]
\ No newline at end of file
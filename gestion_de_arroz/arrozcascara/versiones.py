@@ -0,0 +1,43 @@
+"""Versión de los datos compartida por todos los procesos.
+
+Se guarda en la base de datos para que los ETag del dashboard coincidan sin
+importar qué proceso atienda la petición. Con el mismo modelo se guardan las
+versiones de los grupos de la caché (ver cacheo).
+"""
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import VersionDatos
+from .signals import facturas_modificadas, representantes_modificados
+
+NOMBRE = 'datos'
+
+
+def actual():
+    """Devuelve (valor, actualizado) de la versión de los datos"""
+    version = VersionDatos.objects.filter(nombre=NOMBRE).values_list('valor', 'actualizado').first()
+    if version is None:
+        version = VersionDatos.objects.get_or_create(nombre=NOMBRE)[0]
+        return version.valor, version.actualizado
+    return version
+
+
+def de_grupos(nombres):
+    """{nombre: valor} de varias versiones en una consulta; 0 las que aún no existen"""
+    valores = dict(VersionDatos.objects.filter(nombre__in=nombres).values_list('nombre', 'valor'))
+    return {nombre: valores.get(nombre, 0) for nombre in nombres}
+
+
+def incrementar(nombre=NOMBRE):
+    actualizadas = VersionDatos.objects.filter(nombre=nombre).update(
+        valor=F('valor') + 1, actualizado=timezone.now()
+    )
+    if not actualizadas:
+        VersionDatos.objects.get_or_create(nombre=nombre, defaults={'valor': 1})
+
+
+@receiver(facturas_modificadas)
+@receiver(representantes_modificados)
+def _datos_modificados(sender, **kwargs):
+    incrementar()
@@ -1,20 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.urls import reverse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
+from django.core.handlers.asgi import ASGIRequest
 # Create your views here.
 from django.contrib import messages
-from .models import Representante, Factura
+from django.contrib.admin.views.decorators import staff_member_required
+from .models import Representante, Factura, Importacion
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 import json
-from django.db.models import Sum
-import pandas as pd
-from django.utils.timezone import now
-from django.views.decorators.http import require_http_methods
+import logging
+import time
+from django.views.decorators.http import require_http_methods, condition
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
 from decimal import Decimal, InvalidOperation
-from openpyxl import load_workbook
-from django.utils.dateparse import parse_date
-from datetime import datetime, date
-from django.db import transaction
+from django.db import transaction, IntegrityError
+from . import resumen, cacheo, versiones, eventos, exportacion, lotes, perfilado
+from .bitacora import evento, activo
+from .enrutador import lectura_de_reportes
+from .tareas import encolar_importacion
+from .importacion import vista_previa, ErrorImportacion
+from .estadisticas import estadisticas_de_version
+from .filtros import (
+    leer_filtros, filtrar_facturas, totales_de_detalles, pagina_despues_de, codificar_cursor
+)
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de página por defecto y máximo de facturas_api
+FACTURAS_POR_PAGINA = 50
+MAX_FACTURAS_POR_PAGINA = 500
 
 
 def representantes(request):
@@ -42,179 +58,113 @@ def registrar_representante(request):
 def index(request):
     return render(request, "arrozcascara/index.html")
 
+def _version_datos(request):
+    """Versión de los datos, consultada una sola vez por petición"""
+    if not hasattr(request, '_version_datos'):
+        request._version_datos = versiones.actual()
+    return request._version_datos
+
+
+def _etag_datos(request):
+    return f'datos-{_version_datos(request)[0]}'
+
+
+def _ultima_modificacion(request):
+    return _version_datos(request)[1]
+
+
+def _estadisticas_en_cache(request):
+    return estadisticas_de_version(_version_datos(request)[0])
+
+
+@lectura_de_reportes
 def dashboard(request):
-    # Obtener datos de la base de datos
-    representantes = Representante.objects.all().values('id', 'nombre_completo', 'cedula', 'direccion')
-    facturas = Factura.objects.all().values('representante', 'cantidad_sacos', 'fecha')
-    
-    # Convertir a DataFrames de pandas
-    df_representantes = pd.DataFrame(list(representantes))
-    df_facturas = pd.DataFrame(list(facturas))
-    
-    # Si no hay datos, usar valores por defecto
-    if df_representantes.empty or df_facturas.empty:
-        context = {
-            'total_representantes': 0,
-            'total_facturas': 0,
-            'total_sacos': 0,
-            'promedio_sacos': 0,
-            'representantes_data': [],
-            'chart_labels': [],
-            'chart_sacks_data': [],
-            'chart_invoices_data': [],
-            'chart_colors': [],
-            'last_update': '--:--'
-        }
-        return render(request, "arrozcascara/dashboard.html", context)
-    
-    # Procesar datos con pandas
-    df_facturas['cantidad_sacos'] = pd.to_numeric(df_facturas['cantidad_sacos'])
-    
-    # Agrupar datos por representante
-    df_agrupado = df_facturas.groupby('representante').agg(
-        total_sacos=('cantidad_sacos', 'sum'),
-        total_facturas=('cantidad_sacos', 'count')
-    ).reset_index()
-    
-    # Combinar con datos de representantes
-    df_final = pd.merge(
-        df_representantes, 
-        df_agrupado, 
-        left_on='id', 
-        right_on='representante'
-    )
-    
-    # Ordenar por total de sacos (descendente)
-    df_final = df_final.sort_values('total_sacos', ascending=False)
-    
-    # Calcular estadísticas generales
-    total_representantes = df_final.shape[0]
-    total_facturas = df_final['total_facturas'].sum()
-    total_sacos = df_final['total_sacos'].sum()
-    promedio_sacos = round(total_sacos / total_representantes) if total_representantes > 0 else 0
-    
-    # Preparar datos para gráficos
-    chart_labels = df_final['nombre_completo'].tolist()
-    chart_sacks_data = df_final['total_sacos'].tolist()
-    chart_invoices_data = df_final['total_facturas'].tolist()
-    
-    # Colores para los gráficos
-    chart_colors = [
-        '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', 
-        '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9'
-    ]
-    
-    # Obtener hora de actualización
-    last_update = now().strftime('%H:%M')
-    
-    context = {
-        'total_representantes': total_representantes,
-        'total_facturas': total_facturas,
-        'total_sacos': total_sacos,
-        'promedio_sacos': promedio_sacos,
-        'representantes_data': df_final.to_dict('records'),
-        'chart_labels': chart_labels,
-        'chart_sacks_data': chart_sacks_data,
-        'chart_invoices_data': chart_invoices_data,
-        'chart_colors': chart_colors,
-        'last_update': last_update
-    }
-    
+    # Sumas y conteos por representante, en caché hasta la próxima escritura
+    context = dict(_estadisticas_en_cache(request), etag_datos=_etag_datos(request))
     return render(request, "arrozcascara/dashboard.html", context)
 
 
+@lectura_de_reportes
+@require_http_methods(["GET"])
+@condition(etag_func=_etag_datos, last_modified_func=_ultima_modificacion)
+def estadisticas_json(request):
+    """Estadísticas del dashboard; responde 304 si los datos no cambiaron"""
+    response = JsonResponse({'success': True, 'estadisticas': _estadisticas_en_cache(request)})
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_http_methods(["GET"])
+async def eventos_dashboard(request):
+    """Server-Sent Events con los cambios del dashboard; requiere un servidor ASGI"""
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI cada conexión ocuparía un trabajador; con 204 el navegador no
+        # reconecta y el dashboard sigue consultando estadisticas_json
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        eventos.flujo(request.headers.get('Last-Event-ID')), content_type='text/event-stream'
+    )
+    patch_cache_control(response, no_cache=True)
+    # Evita que nginx retenga los eventos en su búfer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 
+@lectura_de_reportes
 def detalles(request):
     try:
-        # Obtener parámetros de filtrado con valores por defecto
-        representante_id = request.GET.get('representante', '')
-        variedad = request.GET.get('variedad', '')
-        fecha_desde = request.GET.get('fecha_desde', '')
-        fecha_hasta = request.GET.get('fecha_hasta', '')
-        
-        # Debug: Mostrar parámetros recibidos
-        print("\n=== Parámetros de filtrado ===")
-        print(f"Representante: {representante_id}")
-        print(f"Variedad: {variedad}")
-        print(f"Fecha desde: {fecha_desde}")
-        print(f"Fecha hasta: {fecha_hasta}")
-        
-        # Validar fechas si ambas están presentes
-        date_error = None
-        if fecha_desde and fecha_hasta:
-            if fecha_desde > fecha_hasta:
-                date_error = 'La fecha "Desde" no puede ser mayor que la fecha "Hasta"'
-                messages.error(request, date_error)
-                # Intercambiar fechas para corregir automáticamente
-                fecha_desde, fecha_hasta = fecha_hasta, fecha_desde
-        
-        # Inicializar queryset con select_related para optimización
-        facturas = Factura.objects.all().select_related('representante').order_by('representante__nombre_completo', '-fecha')
-        
-        # Aplicar filtros si existen
-        if representante_id:
-            facturas = facturas.filter(representante_id=representante_id)
+        # Obtener parámetros de filtrado (las fechas invertidas se corrigen automáticamente)
+        filtros, date_error = leer_filtros(request.GET)
+        if date_error:
+            messages.error(request, date_error)
         
-        if variedad:
-            facturas = facturas.filter(variedad__iexact=variedad)  # Búsqueda case-insensitive
-        
-        if fecha_desde:
-            facturas = facturas.filter(fecha__gte=fecha_desde)
-        
-        if fecha_hasta:
-            facturas = facturas.filter(fecha__lte=fecha_hasta)
+        # Los eventos de depuración y sus tiempos solo se calculan si se van a registrar
+        depurar = activo(logger, logging.DEBUG)
+        if depurar:
+            evento(logger, logging.DEBUG, 'detalles.filtros', filtros={campo: valor for campo, valor in filtros.items() if valor})
         
         # Obtener todos los representantes (para el dropdown de filtros)
-        representantes = Representante.objects.all().order_by('nombre_completo')
-        
-        # Agrupar facturas por representante con total de sacos
-        facturas_por_representante = []
-        representantes_con_facturas = set(facturas.values_list('representante_id', flat=True))
-        
-        for rep in representantes:
-            if rep.id in representantes_con_facturas:
-                facturas_rep = facturas.filter(representante=rep)
-                total_sacos_rep = facturas_rep.aggregate(total=Sum('cantidad_sacos'))['total'] or 0
-                
-                facturas_por_representante.append({
-                    'representante': rep,
-                    'facturas': facturas_rep,
-                    'total_sacos': total_sacos_rep
-                })
+        representantes = cacheo.lista_representantes()
+        
+        # Totales por representante en una sola consulta agregada sobre los
+        # resúmenes; las filas de cada grupo las carga la página por partes desde facturas_api
+        inicio = time.perf_counter() if depurar else None
+        facturas_por_representante = cacheo.obtener(
+            f'detalles:{cacheo.huella(filtros)}', [cacheo.FACTURAS, cacheo.REPRESENTANTES],
+            lambda: [
+                {
+                    'representante': {'id': fila['representante'], 'nombre_completo': fila['representante__nombre_completo']},
+                    'total_sacos': fila['sacos'] or 0,
+                    'total_facturas': fila['facturas'],
+                }
+                for fila in totales_de_detalles(filtros)
+            ]
+        )
         
         # Calcular totales generales
         total_representantes = len(facturas_por_representante)
-        total_facturas = facturas.count()
-        total_sacos = facturas.aggregate(total=Sum('cantidad_sacos'))['total'] or 0
-        
-        # Debug: Mostrar resultados del filtrado
-        print("\n=== Resultados del filtrado ===")
-        print(f"Total representantes con facturas: {total_representantes}")
-        print(f"Total facturas: {total_facturas}")
-        print(f"Total sacos: {total_sacos}")
-        
-        for grupo in facturas_por_representante:
-            print(f"\nRepresentante: {grupo['representante'].nombre_completo}")
-            print(f"Total sacos: {grupo['total_sacos']}")
-            print(f"Facturas: {grupo['facturas'].count()}")
-            for factura in grupo['facturas']:
-                print(f"  - Factura: {factura.numero_factura} | Cliente: {factura.nombre_cliente} | Sacos: {factura.cantidad_sacos} | Fecha: {factura.fecha}")
+        total_facturas = sum(grupo['total_facturas'] for grupo in facturas_por_representante)
+        total_sacos = sum(grupo['total_sacos'] for grupo in facturas_por_representante)
+        
+        if depurar:
+            evento(
+                logger, logging.DEBUG, 'detalles.totales',
+                representantes=total_representantes, facturas=total_facturas, sacos=total_sacos,
+                duracion_ms=round((time.perf_counter() - inicio) * 1000, 1),
+            )
         
         # Preparar contexto
         context = {
             'representantes': representantes,
-            'facturas': facturas,
             'facturas_por_representante': facturas_por_representante,
             'total_representantes': total_representantes,
             'total_facturas': total_facturas,
             'total_sacos': total_sacos,
             'request': request,  # Para acceder a los parámetros GET en el template
-            'filtros_aplicados': {
-                'representante': representante_id,
-                'variedad': variedad,
-                'fecha_desde': fecha_desde,
-                'fecha_hasta': fecha_hasta
-            },
+            'filtros_aplicados': filtros,
+            'estados': Factura.ESTADO_CHOICES,
             'date_error': date_error
         }
         
@@ -222,22 +172,117 @@ def detalles(request):
     
     except Exception as e:
         error_msg = f"Error al cargar los datos: {str(e)}"
-        print(f"\n=== ERROR en vista detalles ===\n{error_msg}\n")
+        logger.exception('detalles.error')
         messages.error(request, error_msg)
         
         # Retornar contexto básico en caso de error
         return render(request, "arrozcascara/detalles.html", {
-            'representantes': Representante.objects.all().order_by('nombre_completo'),
+            'representantes': cacheo.lista_representantes(),
             'facturas_por_representante': [],
             'total_representantes': 0,
             'total_facturas': 0,
             'total_sacos': 0,
             'request': request,
             'filtros_aplicados': {},
+            'estados': Factura.ESTADO_CHOICES,
             'error': error_msg
         })
 
 
+@lectura_de_reportes
+@require_http_methods(["GET"])
+def facturas_api(request):
+    """Facturas filtradas en páginas por cursor según el orden ['-fecha', 'numero_factura']"""
+    try:
+        filtros, _ = leer_filtros(request.GET, estricto=True)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    try:
+        page_size = int(request.GET.get('page_size') or FACTURAS_POR_PAGINA)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'page_size debe ser un número'}, status=400)
+    page_size = max(1, min(page_size, MAX_FACTURAS_POR_PAGINA))
+
+    if filtros['representante'] and not filtros['representante'].isdigit():
+        return JsonResponse({'success': False, 'error': 'Representante no válido'}, status=400)
+
+    try:
+        facturas = pagina_despues_de(
+            filtrar_facturas(Factura.objects.all(), filtros),
+            request.GET.get('cursor')
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    # Se pide una fila extra para saber si hay otra página
+    filas = list(facturas.values(
+        'id', 'numero_factura', 'cedula', 'nombre_cliente', 'cantidad_sacos',
+        'representante_id', 'representante__nombre_completo', 'fecha',
+        'variedad', 'monto', 'estado', 'fecha_pago'
+    )[:page_size + 1])
+    hay_mas = len(filas) > page_size
+    filas = filas[:page_size]
+
+    return JsonResponse({
+        'success': True,
+        'facturas': [
+            {
+                'id': fila['id'],
+                'numero_factura': fila['numero_factura'],
+                'cedula': fila['cedula'],
+                'nombre_cliente': fila['nombre_cliente'],
+                'cantidad_sacos': fila['cantidad_sacos'],
+                'representante_id': fila['representante_id'],
+                'representante': fila['representante__nombre_completo'],
+                'fecha': fila['fecha'].strftime('%Y-%m-%d'),
+                'variedad': fila['variedad'],
+                'monto': str(fila['monto']),
+                'estado': fila['estado'],
+                'fecha_pago': fila['fecha_pago'].strftime('%Y-%m-%d') if fila['fecha_pago'] else None,
+            }
+            for fila in filas
+        ],
+        'siguiente_cursor': codificar_cursor(filas[-1]) if hay_mas else None,
+        'hay_mas': hay_mas,
+    })
+
+
+
+@lectura_de_reportes
+@require_http_methods(["GET"])
+def exportar_facturas(request):
+    """Descarga las facturas con los filtros de detalles, en CSV (formato=csv) o XLSX (formato=xlsx)"""
+    # Los filtros se validan antes de empezar la respuesta en streaming
+    try:
+        filtros, _ = leer_filtros(request.GET, estricto=True)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    formato = request.GET.get('formato') or 'csv'
+    if formato not in ('csv', 'xlsx'):
+        return JsonResponse({'success': False, 'error': 'Formato no válido, use csv o xlsx'}, status=400)
+
+    if filtros['representante'] and not filtros['representante'].isdigit():
+        return JsonResponse({'success': False, 'error': 'Representante no válido'}, status=400)
+
+    facturas = filtrar_facturas(Factura.objects.all(), filtros)
+    # La base se elige ahora: el CSV se lee después de que la vista termina
+    facturas = facturas.using(facturas.db)
+    nombre_archivo = f'facturas_{timezone.localdate():%Y%m%d}.{formato}'
+
+    if formato == 'xlsx':
+        return FileResponse(
+            exportacion.xlsx_en_archivo(facturas),
+            as_attachment=True,
+            filename=nombre_archivo,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    # El CSV empieza a descargarse con el primer bloque de filas
+    response = StreamingHttpResponse(exportacion.csv_en_streaming(facturas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
 
 @require_http_methods(["GET"])
 def obtener_factura(request, invoice_id):
@@ -264,8 +309,6 @@ def obtener_factura(request, invoice_id):
 @require_http_methods(["POST"])
 def editar_factura(request, invoice_id):
     try:
-        factura = Factura.objects.get(id=invoice_id)
-        
         # Leer datos del FormData (no JSON)
         numero_factura = request.POST.get('numero_factura')
         cedula = request.POST.get('cedula')
@@ -290,23 +333,30 @@ def editar_factura(request, invoice_id):
             except Representante.DoesNotExist:
                 return JsonResponse({'success': False, 'error': 'Representante no encontrado'}, status=400)
         
-        # Actualización de campos
-        if numero_factura:
-            factura.numero_factura = numero_factura
-        if cedula:
-            factura.cedula = cedula
-        if nombre_cliente:
-            factura.nombre_cliente = nombre_cliente
-        if cantidad_sacos:
-            factura.cantidad_sacos = cantidad_sacos
-        if representante_id:
-            factura.representante_id = representante_id
-        if fecha:
-            factura.fecha = fecha
-        if variedad:
-            factura.variedad = variedad
-        
-        factura.save()
+        with transaction.atomic():
+            # Leída bloqueada: una edición o un pago simultáneo espera, así el
+            # resumen resta los valores vigentes una sola vez
+            factura = Factura.objects.select_for_update().get(id=invoice_id)
+            antes = resumen.valores_clave(factura)
+
+            # Actualización de campos
+            if numero_factura:
+                factura.numero_factura = numero_factura
+            if cedula:
+                factura.cedula = cedula
+            if nombre_cliente:
+                factura.nombre_cliente = nombre_cliente
+            if cantidad_sacos:
+                factura.cantidad_sacos = cantidad_sacos
+            if representante_id:
+                factura.representante_id = representante_id
+            if fecha:
+                factura.fecha = fecha
+            if variedad:
+                factura.variedad = variedad
+
+            factura.save()
+            resumen.registrar_cambio(antes, factura)
         
         return JsonResponse({'success': True, 'message': 'Factura actualizada correctamente'})
         
@@ -320,8 +370,13 @@ def editar_factura(request, invoice_id):
 @require_http_methods(["POST"])
 def eliminar_factura(request, invoice_id):
     try:
-        factura = Factura.objects.get(id=invoice_id)
-        factura.delete()
+        with transaction.atomic():
+            factura = Factura.objects.select_for_update().get(id=invoice_id)
+            _, eliminadas = Factura.objects.filter(pk=factura.pk).delete()
+            # Si otra petición ya la eliminó, el resumen no se descuenta otra vez
+            if not eliminadas.get(Factura._meta.label):
+                raise Factura.DoesNotExist
+            resumen.registrar_baja(factura)
         return JsonResponse({'success': True})
     except Factura.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Factura no encontrada'}, status=404)
@@ -333,8 +388,6 @@ def eliminar_factura(request, invoice_id):
 @require_http_methods(["POST"])
 def pagar_factura(request, invoice_id):
     try:
-        factura = Factura.objects.get(id=invoice_id)
-        
         # Validar y convertir monto
         try:
             monto = Decimal(request.POST.get('monto', '0'))
@@ -348,11 +401,15 @@ def pagar_factura(request, invoice_id):
         if not fecha_pago:
             return JsonResponse({'success': False, 'error': 'Fecha de pago requerida'}, status=400)
         
-        # Actualizar factura
-        factura.monto = monto
-        factura.estado = 'pagado'
-        factura.fecha_pago = fecha_pago
-        factura.save()
+        # Actualizar factura, leída bloqueada para que dos pagos no resten dos veces del resumen
+        with transaction.atomic():
+            factura = Factura.objects.select_for_update().get(id=invoice_id)
+            antes = resumen.valores_clave(factura)
+            factura.monto = monto
+            factura.estado = 'pagado'
+            factura.fecha_pago = fecha_pago
+            factura.save(update_fields=['monto', 'estado', 'fecha_pago'])
+            resumen.registrar_cambio(antes, factura)
         
         return JsonResponse({
             'success': True,
@@ -367,8 +424,89 @@ def pagar_factura(request, invoice_id):
 
 
 
+def _leer_json(request):
+    """Cuerpo JSON de una petición; debe ser un objeto"""
+    try:
+        datos = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError('El cuerpo de la petición debe ser JSON válido')
+    if not isinstance(datos, dict):
+        raise ValueError('El cuerpo de la petición debe ser un objeto JSON')
+    return datos
+
+
+@require_http_methods(["POST"])
+def pagar_facturas_lote(request):
+    """Paga muchas facturas en una transacción.
+
+    Cuerpo JSON: ``ids`` o ``filtros`` (los de detalles), ``fecha_pago`` y
+    ``monto``, ``precio_saco`` o ``montos`` ({id: monto}).
+    """
+    try:
+        pagadas, resultados = lotes.pagar_facturas(_leer_json(request))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Error interno: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'message': f'Se registró el pago de {pagadas} factura{"s" if pagadas != 1 else ""}',
+        'pagadas': pagadas,
+        'omitidas': len(resultados) - pagadas,
+        'resultados': resultados,
+    })
+
+
+@require_http_methods(["POST"])
+def editar_facturas_lote(request):
+    """Cambia campos de muchas facturas.
+
+    Cuerpo JSON: ``ids`` o ``filtros`` con ``cambios`` ({campo: valor}) iguales
+    para todas, o ``facturas`` ([{id, campo: valor}]) con valores por factura.
+    """
+    try:
+        actualizadas, resultados = lotes.editar_facturas(_leer_json(request))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except IntegrityError:
+        # Otro usuario tomó uno de los números de factura durante la operación
+        return JsonResponse({'success': False, 'error': 'Un número de factura ya está en uso, intente de nuevo'}, status=409)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Error interno: {str(e)}'}, status=500)
+
+    conflictos = sum(1 for resultado in resultados if resultado['resultado'] == 'conflicto')
+    return JsonResponse({
+        'success': True,
+        'message': f'Se actualizaron {actualizadas} factura{"s" if actualizadas != 1 else ""}',
+        'actualizadas': actualizadas,
+        'conflictos': conflictos,
+        'omitidas': len(resultados) - actualizadas,
+        'resultados': resultados,
+    })
+
+
+@require_http_methods(["POST"])
+def eliminar_facturas_lote(request):
+    """Elimina muchas facturas; cuerpo JSON con ``ids`` o ``filtros``"""
+    try:
+        eliminadas, resultados = lotes.eliminar_facturas(_leer_json(request))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Error interno: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'message': f'Se eliminaron {eliminadas} factura{"s" if eliminadas != 1 else ""}',
+        'eliminadas': eliminadas,
+        'no_encontradas': len(resultados) - eliminadas,
+        'resultados': resultados,
+    })
+
+
 def registrodefacturas(request):
-    representantes = Representante.objects.all().order_by('nombre_completo')
+    representantes = cacheo.lista_representantes()
     return render(request, "arrozcascara/registrodefacturas.html", {
         'representantes': representantes
     })
@@ -377,7 +515,7 @@ def registrodefacturas(request):
 
 @require_http_methods(["GET", "POST"])
 def registro_facturas(request):
-    representantes = Representante.objects.all().order_by('nombre_completo')
+    representantes = cacheo.lista_representantes()
     
     if request.method == 'GET':
         return render(request, "arrozcascara/registrodefacturas.html", {
@@ -414,100 +552,88 @@ def registrar_factura(request):
 
 
 def handle_excel_upload(request):
+    excel_file = request.FILES.get('excel-file')
+    if not excel_file:
+        return JsonResponse({'success': False, 'error': 'Debe seleccionar un archivo Excel'}, status=400)
+
+    # 'actualizar' también modifica las facturas que ya existen; 'validar' revisa
+    # todo el archivo y genera un reporte sin guardar facturas
+    modo = request.POST.get('modo') or 'importar'
+    if modo not in dict(Importacion.MODO_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Modo de importación no válido'}, status=400)
+
+    # El archivo se guarda en disco y se procesa en segundo plano
     try:
-        excel_file = request.FILES['excel-file']
-        
-        # Usar with para asegurar que el archivo se cierre correctamente
-        with transaction.atomic():  # Usar transacción atómica
-            wb = load_workbook(excel_file, read_only=True)
-            sheet = wb.active
-            
-            # Validar estructura del archivo
-            if sheet.max_row < 2:
-                messages.error(request, 'El archivo Excel no contiene datos')
-                return redirect('registro_facturas')
-            
-            # Obtener encabezados
-            headers = [cell.value for cell in sheet[1]]
-            
-            # Mapeo de columnas mejorado
-            column_indices = {
-                'numero_factura': next((i for i, h in enumerate(headers) 
-                                      if h and any(x in str(h).lower() 
-                                      for x in ['factura', 'numero', 'n°', 'no'])), None),
-                'cedula': next((i for i, h in enumerate(headers) 
-                              if h and any(x in str(h).lower() 
-                              for x in ['cedula', 'cédula', 'id'])), None),
-                # ... agregar mapeos para los demás campos
-            }
-            
-            # Verificar campos obligatorios
-            required = ['numero_factura', 'cedula', 'nombre', 'sacos', 'variedad']
-            missing = [field for field in required if column_indices.get(field) is None]
-            
-            if missing:
-                messages.error(request, f'Faltan columnas requeridas: {", ".join(missing)}')
-                return redirect('registro_facturas')
-            
-            # Procesar filas
-            success_count = 0
-            errors = []
-            
-            for row_idx in range(2, sheet.max_row + 1):
-                row = [cell.value for cell in sheet[row_idx]]
-                try:
-                    # Extraer datos
-                    factura_data = {
-                        'numero_factura': str(row[column_indices['numero_factura']]).strip(),
-                        'cedula': str(row[column_indices['cedula']]).strip(),
-                        'nombre_cliente': str(row[column_indices['nombre']]).strip(),
-                        'cantidad_sacos': int(float(row[column_indices['sacos']])),
-                        'variedad': str(row[column_indices['variedad']]).strip(),
-                        'fecha': parse_excel_date(row[column_indices.get('fecha')]),
-                        'estado': 'pendiente'
-                    }
-                    
-                    # Obtener representante
-                    rep_col = column_indices.get('representante')
-                    if rep_col is not None and row[rep_col]:
-                        try:
-                            factura_data['representante'] = Representante.objects.get(
-                                nombre_completo__icontains=str(row[rep_col]).strip()
-                            )
-                        except (Representante.DoesNotExist, Representante.MultipleObjectsReturned):
-                            factura_data['representante'] = Representante.objects.first()
-                    else:
-                        factura_data['representante'] = Representante.objects.first()
-                    
-                    # Validar unicidad de número de factura
-                    if Factura.objects.filter(numero_factura=factura_data['numero_factura']).exists():
-                        raise ValueError(f"La factura {factura_data['numero_factura']} ya existe")
-                    
-                    # Crear y guardar la factura
-                    Factura.objects.create(**factura_data)
-                    success_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Fila {row_idx}: {str(e)}")
-                    continue
-            
-            # Resultados
-            if success_count > 0:
-                messages.success(request, f'Se importaron {success_count} facturas correctamente')
-            
-            if errors:
-                error_msg = f"Errores en {len(errors)} filas"
-                if len(errors) <= 5:
-                    error_msg += ": " + " | ".join(errors)
-                else:
-                    error_msg += f". Primeros errores: {' | '.join(errors[:5])}... (+{len(errors)-5} más)"
-                messages.warning(request, error_msg)
-            
-            return redirect('registro_facturas')
-    
+        importacion = encolar_importacion(excel_file, modo)
     except Exception as e:
-        messages.error(request, f'Error al procesar el archivo: {str(e)}')
-        return redirect('registro_facturas')
+        return JsonResponse({'success': False, 'error': f'Error al guardar el archivo: {str(e)}'}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'message': 'Archivo recibido, la validación está en proceso' if modo == 'validar'
+                   else 'Archivo recibido, la importación está en proceso',
+        'importacion_id': importacion.id,
+        'estado_url': reverse('estado_importacion', args=[importacion.id]),
+    }, status=202)
+
+
+@require_http_methods(["POST"])
+def vista_previa_importacion(request):
+    """Primeras filas del archivo como las leería la importación"""
+    excel_file = request.FILES.get('excel-file')
+    if not excel_file:
+        return JsonResponse({'success': False, 'error': 'Debe seleccionar un archivo Excel'}, status=400)
+
+    try:
+        previa = vista_previa(excel_file)
+    except ErrorImportacion as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'No se pudo leer el archivo: {str(e)}'}, status=400)
+
+    return JsonResponse({'success': True, 'vista_previa': previa})
+
+
+@require_http_methods(["GET"])
+def estado_importacion(request, importacion_id):
+    try:
+        importacion = Importacion.objects.get(id=importacion_id)
+    except Importacion.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Importación no encontrada'}, status=404)
+
+    return JsonResponse({
+        'success': True,
+        'importacion': {
+            'id': importacion.id,
+            'nombre_archivo': importacion.nombre_archivo,
+            'modo': importacion.modo,
+            'estado': importacion.estado,
+            'filas_procesadas': importacion.filas_procesadas,
+            'facturas_creadas': importacion.facturas_creadas,
+            'facturas_actualizadas': importacion.facturas_actualizadas,
+            'facturas_sin_cambios': importacion.facturas_sin_cambios,
+            'total_errores': importacion.total_errores,
+            'errores': importacion.errores[:50],
+            'filas_por_segundo': importacion.filas_por_segundo,
+            'mensaje': importacion.mensaje,
+            'terminada': importacion.estado in ('completado', 'fallido'),
+            'reporte_url': reverse('reporte_importacion', args=[importacion.id]) if importacion.reporte else None,
+        }
+    })
+
+
+@require_http_methods(["GET"])
+def reporte_importacion(request, importacion_id):
+    """Descarga el reporte CSV de una validación"""
+    importacion = get_object_or_404(Importacion, id=importacion_id)
+    if not importacion.reporte:
+        return JsonResponse({'success': False, 'error': 'La importación no tiene reporte'}, status=404)
+    return FileResponse(
+        importacion.reporte.open('rb'),
+        as_attachment=True,
+        filename=importacion.reporte.name.rsplit('/', 1)[-1],
+        content_type='text/csv; charset=utf-8',
+    )
 
 
 
@@ -533,16 +659,18 @@ def handle_manual_form(request):
         
         representante = Representante.objects.get(id=representante_id)
 
-        Factura.objects.create(
-            numero_factura=numero_factura,
-            cedula=cedula,
-            nombre_cliente=nombre_cliente,
-            cantidad_sacos=int(cantidad_sacos),
-            representante=representante,
-            fecha=fecha,
-            variedad=variedad,
-            estado='pendiente'
-        )
+        with transaction.atomic():
+            factura = Factura.objects.create(
+                numero_factura=numero_factura,
+                cedula=cedula,
+                nombre_cliente=nombre_cliente,
+                cantidad_sacos=int(cantidad_sacos),
+                representante=representante,
+                fecha=fecha,
+                variedad=variedad,
+                estado='pendiente'
+            )
+            resumen.registrar_alta(factura)
         
         messages.success(request, 'Factura registrada exitosamente')
         return redirect('registrodefacturas')
@@ -570,48 +698,8 @@ def get_cell_value(row, column_index):
     # Convertir a string y limpiar espacios
     return str(value).strip()
 
-def parse_excel_date(excel_date):
-    """Convierte fechas de Excel a formato Python"""
-    if excel_date is None:
-        return date.today()
-    
-    try:
-        # Si es un número (fecha de Excel)
-        if isinstance(excel_date, (int, float)):
-            from datetime import timedelta
-            return (datetime(1899, 12, 30) + timedelta(days=excel_date)).date()
-        
-        # Si es una fecha datetime
-        elif hasattr(excel_date, 'date'):
-            return excel_date.date()
-        
-        # Si es un string, intentar parsearlo
-        elif isinstance(excel_date, str):
-            excel_date = excel_date.strip()
-            
-            # Intentar diferentes formatos
-            formats = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']
-            for fmt in formats:
-                try:
-                    return datetime.strptime(excel_date, fmt).date()
-                except ValueError:
-                    continue
-            
-            # Último intento con el parser de Django
-            parsed_date = parse_date(excel_date)
-            if parsed_date:
-                return parsed_date
-        
-        # Si no se puede parsear, usar fecha actual
-        return date.today()
-    
-    except Exception:
-        return date.today()
-
-
-
 def gestionderepresentantes(request):
-    representantes = Representante.objects.all().order_by('nombre_completo')
+    representantes = cacheo.lista_representantes()
     return render(request, "arrozcascara/gestionderepresentantes.html", {
         'representantes': representantes
     })
@@ -667,38 +755,18 @@ def eliminar_representante(request, id):
         }, status=500)
 
 
-
-
-
-
-
-
-
-
-from datetime import datetime, date, timedelta
-from django.utils.dateparse import parse_date
-
-def parse_excel_date(excel_date):
-    """Convierte varios formatos de fecha de Excel a objeto date"""
-    if excel_date is None:
-        return date.today()
-    
-    # Si es número de Excel (días desde 1900-01-01)
-    if isinstance(excel_date, (int, float)):
-        try:
-            return (datetime(1899, 12, 30) + timedelta(days=excel_date)).date()
-        except:
-            return date.today()
-    
-    # Si ya es un objeto datetime
-    if isinstance(excel_date, datetime):
-        return excel_date.date()
-    
-    # Si es string, intentar parsear
-    if isinstance(excel_date, str):
-        try:
-            return parse_date(excel_date.strip())
-        except (ValueError, TypeError):
-            pass
-    
-    return date.today()
\ No newline at end of file
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def estadisticas_perfilado(request):
+    """Percentiles de tiempo y consultas por vista medidos por PerfiladoMiddleware"""
+    if request.method == 'POST':
+        perfilado.recolector.reiniciar()
+        return redirect('estadisticas_perfilado')
+
+    vistas = perfilado.recolector.estadisticas()
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({'success': True, 'muestreo': perfilado.muestreo(), 'vistas': vistas})
+    return render(request, "arrozcascara/perfilado.html", {
+        'vistas': vistas,
+        'muestreo': perfilado.muestreo() * 100,
+    })
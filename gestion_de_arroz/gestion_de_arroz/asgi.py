@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_de_arroz.settings')
+# Con ASGI la configuración usa un pool de conexiones en lugar de CONN_MAX_AGE
+os.environ.setdefault('SERVIDOR_ASGI', '1')
 
 application = get_asgi_application()
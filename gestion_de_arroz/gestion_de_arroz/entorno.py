@@ -0,0 +1,26 @@
+"""Lectura de la configuración desde variables de entorno, con valores por defecto."""
+import os
+
+
+def texto(nombre, defecto=''):
+    return os.environ.get(nombre, defecto)
+
+
+def entero(nombre, defecto):
+    valor = os.environ.get(nombre)
+    return defecto if valor in (None, '') else int(valor)
+
+
+def booleano(nombre, defecto):
+    valor = os.environ.get(nombre)
+    if valor in (None, ''):
+        return defecto
+    return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'on')
+
+
+def lista(nombre, defecto=()):
+    """Valores separados por comas"""
+    valor = os.environ.get(nombre)
+    if valor is None:
+        return list(defecto)
+    return [parte.strip() for parte in valor.split(',') if parte.strip()]
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from .entorno import texto, entero, booleano, lista
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -21,12 +23,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-r*@pv*g!frmth)4(g@@=j*qmvypl_h$yr$g9l84$^k#qk4&9k('
+SECRET_KEY = texto('DJANGO_SECRET_KEY', 'django-insecure-r*@pv*g!frmth)4(g@@=j*qmvypl_h$yr$g9l84$^k#qk4&9k(')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = booleano('DJANGO_DEBUG', True)
 
-ALLOWED_HOSTS = []
+# Separados por comas, por ejemplo DJANGO_ALLOWED_HOSTS=arrocera.example.com,localhost
+ALLOWED_HOSTS = lista('DJANGO_ALLOWED_HOSTS')
 
 
 # Application definition
@@ -42,6 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo medido incluya al resto de los middlewares
+    'arrozcascara.perfilado.PerfiladoMiddleware',
+    'arrozcascara.bitacora.BitacoraMiddleware',
+    'arrozcascara.enrutador.EnrutadorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +62,8 @@ ROOT_URLCONF = 'gestion_de_arroz.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates con la medición del perfilado (arrozcascara.perfilado)
+        'BACKEND': 'arrozcascara.perfilado.PlantillasDjango',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,20 +82,105 @@ WSGI_APPLICATION = 'gestion_de_arroz.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
+# La configuración se lee del entorno: DB_MOTOR (mysql o sqlite3), DB_NOMBRE,
+# DB_USUARIO, DB_CLAVE, DB_HOST y DB_PUERTO.
+DB_MOTOR = texto('DB_MOTOR', 'mysql')
+
+# Servidor ASGI (uvicorn, daphne): lo indica asgi.py
+SERVIDOR_ASGI = booleano('SERVIDOR_ASGI', False)
+
+# Con WSGI cada hilo conserva su conexión durante DB_CONN_MAX_AGE segundos en
+# lugar de abrir una por petición (0 la cierra al terminar cada petición).
+# Con ASGI cada petición corre en otro hilo y esas conexiones no se
+# reutilizarían, así que se usa un pool de DB_POOL conexiones libres por proceso.
+DB_CONN_MAX_AGE = entero('DB_CONN_MAX_AGE', 60)
+DB_POOL = entero('DB_POOL', 4 if SERVIDOR_ASGI else 0)
+DB_POOL_VIDA_MAXIMA = entero('DB_POOL_VIDA_MAXIMA', 300)
+
+# Comprueba que una conexión reutilizada siga viva antes de usarla (por
+# ejemplo tras un reinicio de MySQL o al superar wait_timeout)
+DB_CONN_HEALTH_CHECKS = booleano('DB_CONN_HEALTH_CHECKS', True)
+
+if DB_MOTOR == 'sqlite3':
+    _base_de_datos = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": texto('DB_NOMBRE', str(BASE_DIR / 'db.sqlite3')),
+        "OPTIONS": {},
+    }
+else:
+    _base_de_datos = {
         "ENGINE": "django.db.backends.mysql",
-        "NAME": "arroceradb",
-        "USER": "root",
-        "PASSWORD": "",
-        "HOST": "localhost",
-        "PORT": "3306",
+        "NAME": texto('DB_NOMBRE', 'arroceradb'),
+        "USER": texto('DB_USUARIO', 'root'),
+        "PASSWORD": texto('DB_CLAVE', ''),
+        "HOST": texto('DB_HOST', 'localhost'),
+        "PORT": texto('DB_PUERTO', '3306'),
         "OPTIONS": {
             "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
         }
     }
+
+if DB_POOL:
+    _base_de_datos["ENGINE"] = f"arrozcascara.motores.{DB_MOTOR}"
+    _base_de_datos["OPTIONS"]["pool"] = {"tamano": DB_POOL, "vida_maxima": DB_POOL_VIDA_MAXIMA}
+
+DATABASES = {
+    "default": {
+        **_base_de_datos,
+        "CONN_MAX_AGE": 0 if DB_POOL else DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+    }
+}
+
+# Base de reportes (réplica de solo lectura) para el dashboard, detalles y las
+# exportaciones; ver arrozcascara/enrutador.py. Se activa con DB_REPORTES_HOST
+# o DB_REPORTES_NOMBRE y toma el resto de la configuración de la principal.
+# Para probarla con dos archivos SQLite: DB_MOTOR=sqlite3,
+# DB_REPORTES_NOMBRE=reportes.sqlite3 y "manage.py copiar_a_reportes".
+if texto('DB_REPORTES_HOST') or texto('DB_REPORTES_NOMBRE'):
+    DATABASES["reporting"] = {
+        **DATABASES["default"],
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "NAME": texto('DB_REPORTES_NOMBRE', DATABASES["default"]["NAME"]),
+        # En las pruebas se lee de la base de prueba principal
+        "TEST": {"MIRROR": "default"},
+    }
+    if DB_MOTOR != 'sqlite3':
+        DATABASES["reporting"].update(
+            HOST=texto('DB_REPORTES_HOST', DATABASES["default"]["HOST"]),
+            PORT=texto('DB_REPORTES_PUERTO', DATABASES["default"]["PORT"]),
+            USER=texto('DB_REPORTES_USUARIO', DATABASES["default"]["USER"]),
+            PASSWORD=texto('DB_REPORTES_CLAVE', DATABASES["default"]["PASSWORD"]),
+        )
+
+DATABASE_ROUTERS = ['arrozcascara.enrutador.EnrutadorReportes']
+
+# Alias de DATABASES del que leen las vistas de consulta (si existe)
+REPORTES_BASE_DE_DATOS = 'reporting'
+
+# Segundos que las lecturas de un navegador van a la base principal después
+# de que guardó algo, para que vea sus cambios aunque la réplica vaya
+# atrasada (0 lo desactiva)
+REPORTES_FIJAR_PRIMARIA = entero('DB_REPORTES_FIJAR_PRIMARIA', 10)
+
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Las versiones de las claves están en la base de datos, así que al escribir
+# se invalida la caché de todos los procesos aunque cada uno tenga la suya;
+# un backend compartido (por ejemplo FileBasedCache) evita calcular lo mismo
+# una vez por proceso
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "arrozcascara",
+    }
 }
 
+# Segundos que se conservan las consultas en caché (se invalidan antes al escribir)
+ARROZCASCARA_CACHE_TIMEOUT = 300
 
 
 # Password validation
@@ -126,6 +219,63 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos subidos (las importaciones de Excel se guardan aquí antes de procesarse)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Cantidad de hilos que procesan importaciones de Excel en segundo plano
+IMPORTACION_WORKERS = 2
+
+# Fracción de peticiones que mide el perfilado (encabezado Server-Timing y la
+# página /perfilado/); en producción conviene un valor bajo
+PERFILADO_MUESTREO = 1.0 if DEBUG else 0.05
+
+# Bitácora en JSON (arrozcascara.bitacora): una línea por evento en stderr,
+# escrita por un hilo aparte. Con DEBUG se registran también los eventos de
+# depuración, como los filtros y totales de cada consulta de detalles.
+BITACORA_NIVEL = texto('BITACORA_NIVEL', 'DEBUG' if DEBUG else 'INFO')
+
+# Fracción de peticiones de cada vista (por nombre de URL) cuyos eventos
+# informativos se registran; '*' es el valor de las demás vistas. Las
+# advertencias y errores se registran siempre.
+BITACORA_MUESTREO = {
+    '*': 1.0 if DEBUG else 0.1,
+    # El dashboard la consulta periódicamente
+    'estadisticas_json': 1.0 if DEBUG else 0.01,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'contexto': {'()': 'arrozcascara.bitacora.FiltroContexto'},
+    },
+    'formatters': {
+        'json': {'()': 'arrozcascara.bitacora.FormatoJSON'},
+    },
+    'handlers': {
+        'cola': {
+            '()': 'arrozcascara.bitacora.ManejadorEnCola',
+            'filters': ['contexto'],
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'arrozcascara': {'handlers': ['cola'], 'level': BITACORA_NIVEL, 'propagate': False},
+        'django.request': {'handlers': ['cola'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# Filas de Excel por transacción; cada lote confirmado es un punto de control
+# desde el que se reanuda una importación interrumpida
+IMPORTACION_TAMANO_LOTE = 1000
+
+# Eventos en vivo del dashboard (solo bajo ASGI, por ejemplo
+# "uvicorn gestion_de_arroz.asgi:application"): segundos entre consultas de
+# cambios hechos por otros procesos y entre mensajes para mantener la conexión
+DASHBOARD_EVENTOS_INTERVALO = 5
+DASHBOARD_EVENTOS_KEEPALIVE = 15
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 